@@ -1,9 +1,11 @@
 from flask import Flask
+from flask import Response
+from flask import jsonify
 from flask import request
 from flask import render_template
+from flask import stream_with_context
 from sassutils import builder
-from search import search
-import json
+from search import search_page, search_stream, search_batch, parse_bom, RESULTS_PER_PAGE
 
 app = Flask(__name__)
 compiled = builder.build_directory(
@@ -23,19 +25,22 @@ def index():
     :return: rendered Page
     """
     query = request.args.get('q')
+    page = request.args.get('page', 1, type=int)
 
     print(query)
 
     if query is not None:
-        return search_component(query)
+        return search_component(query, page)
     else:
         return render_template('index.html')
 
 
-def search_component(query):
+def search_component(query, page=1):
     """
     Index page w/ search results
 
+    :param query: the search query
+    :param page: page of the results to show (starting at 1)
     :return: rendered Page
     """
     # text = request.form['search_text']
@@ -45,10 +50,62 @@ def search_component(query):
     # WARNING: no text sanitation done here. Expected to be done in search!
     # !!!!!!
 
-    search_results = search(text)
-    json_results = json.loads(search_results)
+    page = max(1, page)
+    search_results = search_page(text, limit=RESULTS_PER_PAGE, offset=(page - 1) * RESULTS_PER_PAGE)
 
-    return render_template('index.html', searchResult=json_results, searchComponent=text)
+    return render_template('index.html', searchResult=search_results, searchComponent=text, page=page,
+                           resultsPerPage=RESULTS_PER_PAGE)
+
+
+@app.route('/api/search', methods=['GET'])
+def api_search():
+    """
+    JSON API returning one page of search results.
+
+    Parameters: q (query), limit (repositories per page), offset or cursor (from the previous page)
+
+    :return: JSON response
+    """
+    query = request.args.get('q', '')
+    limit = request.args.get('limit', RESULTS_PER_PAGE, type=int)
+    offset = request.args.get('offset', 0, type=int)
+    cursor = request.args.get('cursor')
+
+    return jsonify(search_page(query, limit=limit, offset=offset, cursor=cursor))
+
+
+@app.route('/api/search/stream', methods=['GET'])
+def api_search_stream():
+    """
+    JSON API returning all search results, streamed repository by repository.
+
+    :return: streamed JSON response
+    """
+    query = request.args.get('q', '')
+
+    return Response(stream_with_context(search_stream(query)), mimetype='application/json')
+
+
+@app.route('/api/bom', methods=['POST'])
+def api_bom():
+    """
+    JSON API for searching all parts of a BOM at once. The BOM can be uploaded as file (form field 'bom'), sent as
+    form field 'bom' or as the plain request body. One part per line or CSV with a part number column.
+
+    Parameters: limit (repositories per part)
+
+    :return: JSON response with one result group per part
+    """
+    if 'bom' in request.files:
+        bom = request.files['bom'].read().decode('utf-8', errors='replace')
+    elif 'bom' in request.form:
+        bom = request.form['bom']
+    else:
+        bom = request.get_data(as_text=True)
+
+    limit = request.args.get('limit', RESULTS_PER_PAGE, type=int)
+
+    return jsonify(search_batch(parse_bom(bom), limit=max(1, limit)))
 
 
 if __name__ == "__main__":
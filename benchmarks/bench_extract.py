@@ -0,0 +1,43 @@
+"""
+Benchmark of reading the modules of large KiCad boards with the full object model (KicadPCB) and with the fast module
+extractor. Reports the throughput in MB/s for synthetic boards of increasing size, most of which are tracks.
+
+    python -m benchmarks.bench_extract --modules 200 1000 --segments 20000 100000
+"""
+
+import argparse
+import time
+from benchmarks.synthetic import build_board
+from libs.realthunder_kicad_parser import scan_modules
+import kicad_parser
+
+
+def measure(function, contents, repetitions):
+    """
+    Runs the function repeatedly and returns the best time in seconds.
+    """
+    best = None
+    for _ in range(repetitions):
+        start = time.perf_counter()
+        function(contents)
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmarks reading the modules of KiCad boards.')
+    parser.add_argument('--modules', type=int, nargs="+", default=[200, 1000], help='modules per board')
+    parser.add_argument('--segments', type=int, nargs="+", default=[20000, 100000], help='track segments per board')
+    parser.add_argument('--repetitions', type=int, default=3, help='runs per board')
+    args = parser.parse_args()
+
+    for num_modules, num_segments in zip(args.modules, args.segments):
+        contents = build_board(num_modules, num_segments=num_segments)
+        assert scan_modules(contents) == kicad_parser.load_modules(contents)
+
+        size = len(contents) / 1024 / 1024
+        full = measure(kicad_parser.load_modules, contents, args.repetitions)
+        fast = measure(scan_modules, contents, args.repetitions)
+        print(f"{size:6.1f} MB ({num_modules} modules, {num_segments} segments): "
+              f"KicadPCB {size / full:6.2f} MB/s   extractor {size / fast:7.2f} MB/s   speedup {full / fast:5.1f}x")
@@ -0,0 +1,70 @@
+"""
+Benchmark of removing duplicate and common modules (kicad_parser.deduplicate and clean_data) for boards with several
+thousand modules. Compares the original implementation (list based deduplication, patterns and excluded values
+prepared for every module) with the ModuleFilter.
+
+    python -m benchmarks.bench_filter --modules 1000 5000 10000
+"""
+
+import argparse
+import os
+import re
+from benchmarks.bench_extract import measure
+from benchmarks.synthetic import build_board
+from libs.ModuleFilter import ModuleFilter, EXCLUDED_SYMBOLS, COMMON_COMPONENTS
+from libs.realthunder_kicad_parser import scan_modules
+
+EXCLUDED_VALUES_FILE = os.path.join(os.path.dirname(__file__), os.pardir, "excluded_values.txt")
+
+
+def legacy_deduplicate(modules):
+    seen = []
+    reduced = []
+
+    for module in modules:
+        if (module['module'], module['value']) not in seen:
+            reduced.append(module)
+            seen.append((module['module'], module['value']))
+
+    return reduced
+
+
+def legacy_clean_data(modules):
+    common_comp_regex = "(" + ")|(".join(COMMON_COMPONENTS) + ")"
+
+    with open(EXCLUDED_VALUES_FILE, 'r') as f:
+        excluded_values = f.read().splitlines()
+
+    pattern = r"^["
+    for symbol in EXCLUDED_SYMBOLS:
+        pattern += symbol.upper()
+        pattern += symbol.lower()
+    pattern += r"]{1,3}[\d:\*]+$"
+
+    cleaned_modules = [module for module in modules if not re.match(pattern, module["reference"])
+                       and not re.match(common_comp_regex, module['value'], re.IGNORECASE)]
+
+    return [module for module in cleaned_modules if
+            isinstance(module["value"], str) and not module['value'].upper() in
+            (value.upper() for value in excluded_values)]
+
+
+def legacy(modules):
+    return legacy_clean_data(legacy_deduplicate(modules))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmarks removing duplicate and common modules.')
+    parser.add_argument('--modules', type=int, nargs="+", default=[1000, 5000, 10000], help='modules per board')
+    parser.add_argument('--repetitions', type=int, default=3, help='runs per board')
+    args = parser.parse_args()
+
+    module_filter = ModuleFilter(EXCLUDED_VALUES_FILE)
+    for num_modules in args.modules:
+        modules = scan_modules(build_board(num_modules, num_segments=0))
+        assert module_filter(modules) == legacy(modules)
+
+        old = measure(legacy, modules, args.repetitions)
+        new = measure(module_filter, modules, args.repetitions)
+        print(f"{num_modules:6d} modules: legacy {old * 1000:8.1f} ms   ModuleFilter {new * 1000:6.1f} ms   "
+              f"speedup {old / new:6.1f}x")
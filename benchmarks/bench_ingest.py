@@ -0,0 +1,123 @@
+"""
+Benchmark of the database writes of the parser. Stores synthetic repos with the bulk path of parse_repos (write_jobs,
+one transaction per batch of repos) and with the previous path (one commit per file and per item) and reports the
+throughput in rows per second.
+
+    python -m benchmarks.bench_ingest --repos 200
+"""
+
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+import uuid
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from benchmarks.synthetic import random_value
+from libs.search_index import create_search_index
+from models.base import Base
+from models.files import File
+from models.items import Item
+from models.repos import Repo
+import kicad_parser
+
+
+def synthetic_repos(num_repos, files_per_repo, items_per_file, seed=42):
+    """
+    Generates repos as they come out of the parse stage.
+
+    :return: list of (repo, list of (file url, module tuples, content hash))
+    """
+    rnd = random.Random(seed)
+    repos = []
+    for i in range(num_repos):
+        repo = {"repo_url": f"https://github.com/user{i}/board{i}", "repo_description": "Board", "repo_name": "board",
+                "repo_readme": "Readme", "repo_readme_url": "", "repo_license": "MIT", "repo_license_url": "",
+                "forks": 1, "stars": 2}
+        files = [(f"https://raw.githubusercontent.com/user{i}/board{i}/master/board{f}.kicad_pcb",
+                  [("Package_QFP:LQFP-48", '"LQFP, 48 Pin"', '"QFP 0.5"', f"U{n}", random_value(rnd))
+                   for n in range(items_per_file)], None) for f in range(files_per_repo)]
+        repos.append((repo, files))
+    return repos
+
+
+def store_legacy(session_factory, repo, list_of_results):
+    """
+    The previous write path: commits the repo, every file and every item separately.
+    """
+    session = session_factory()
+    repo_new = Repo(repo_url=repo['repo_url'], repo_uuid=str(uuid.uuid4()), description=repo['repo_description'],
+                    name=repo['repo_name'], readme=repo['repo_readme'], readme_url=repo['repo_readme_url'],
+                    license=repo['repo_license'], license_url=repo['repo_license_url'], forks=int(repo['forks']),
+                    stars=int(repo['stars']))
+    session.add(repo_new)
+    session.commit()
+
+    for file_url, modules, _ in list_of_results:
+        file = File(url=file_url, uuid=str(uuid.uuid4()), repo_id=repo_new.id)
+        session.add(file)
+        session.commit()
+
+        for item in kicad_parser.build_items(modules):
+            item.file_id = file.id
+            session.add(item)
+            session.commit()
+    session.close()
+
+
+def repo_job(sequence, repo, list_of_results):
+    """
+    A parsed repo as it leaves the pipeline of parse_repos.
+
+    :return: RepoJob
+    """
+    job = kicad_parser.RepoJob(sequence, sequence + 1, repo, [file_url for file_url, _, _ in list_of_results], None)
+    job.results = [(file_url, modules, None, digest) for file_url, modules, digest in list_of_results]
+    return job
+
+
+def measure(path, repos, legacy):
+    """
+    Stores all repos in a new database.
+
+    :return: rows per second
+    """
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    create_search_index(engine)
+    session_factory = sessionmaker(bind=engine)
+    kicad_parser.Session = session_factory
+
+    start = time.perf_counter()
+    if legacy:
+        for repo, list_of_results in repos:
+            store_legacy(session_factory, repo, list_of_results)
+    else:
+        jobs = [repo_job(sequence, repo, list_of_results) for sequence, (repo, list_of_results) in enumerate(repos)]
+        for i in range(0, len(jobs), kicad_parser.WRITE_BATCH):
+            kicad_parser.write_jobs(jobs[i:i + kicad_parser.WRITE_BATCH])
+    seconds = time.perf_counter() - start
+
+    session = session_factory()
+    rows = session.query(Repo).count() + session.query(File).count() + session.query(Item).count()
+    session.close()
+    return rows / seconds
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmarks the database writes of the parser.')
+    parser.add_argument('--repos', type=int, default=50, help='number of synthetic repos')
+    parser.add_argument('--files', type=int, default=3, help='files per repo')
+    parser.add_argument('--items', type=int, default=40, help='items per file')
+    args = parser.parse_args()
+
+    repos = synthetic_repos(args.repos, args.files, args.items)
+    workdir = tempfile.mkdtemp()
+    try:
+        for name, legacy in (("per-row commits", True), ("bulk", False)):
+            rate = measure(os.path.join(workdir, f"{name}.sqlite"), repos, legacy)
+            print(f"{name:16s} {rate:10.0f} rows/s")
+    finally:
+        shutil.rmtree(workdir)
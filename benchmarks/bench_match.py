@@ -0,0 +1,61 @@
+"""
+Benchmark of ranking the candidate parts of item values (validator.match_parts) on realistic MPN families: the STM32
+series with all of their package, pin count, flash size and temperature range variants, as returned by the index of
+the parts for values like "STM32F103" (hundreds of siblings). Compares scoring every candidate (the original
+implementation) with the pruned ranking of libs/part_matching.py.
+
+    python -m benchmarks.bench_match --repetitions 5
+"""
+
+import argparse
+import itertools
+import jellyfish
+from benchmarks.bench_extract import measure
+from libs.part_matching import rank_parts
+
+SERIES = ["F030", "F042", "F072", "F103", "F107", "F205", "F303", "F401", "F405", "F407", "F411", "F446", "F746",
+          "G030", "G071", "G431", "H743", "L031", "L052", "L073", "L151", "L432", "L476", "WB55"]
+PINS = "FGKTCRVZI"
+FLASH = "468BCDEFGHI"
+PACKAGES = "PHUTY"
+TEMPERATURES = "367"
+
+VALUES = ["STM32F103C8T6", "STM32F103", "stm32f103c8", "STM32F4", "STM32", "STM32L476RG", "F407VGT6"]
+
+
+def stm32_parts():
+    """
+    MPNs of the STM32 family, e.g. STM32F103C8T6.
+
+    :return: list of (id, mpn)
+    """
+    mpns = (f"STM32{series}{pins}{flash}{package}{temperature}" for series, pins, flash, package, temperature in
+            itertools.product(SERIES, PINS, FLASH, PACKAGES, TEMPERATURES))
+    return list(enumerate(mpns, 1))
+
+
+def legacy_match_parts(value, related_parts):
+    best = {"part": None, "dist": None}
+    for part_id, mpn in related_parts:
+        dist = jellyfish.levenshtein_distance(value, mpn)
+        if best["dist"] is None or dist < best["dist"]:
+            best["part"] = part_id
+            best["dist"] = dist
+    return best["part"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmarks ranking the candidate parts of item values.')
+    parser.add_argument('--repetitions', type=int, default=5, help='runs per value')
+    args = parser.parse_args()
+
+    parts = stm32_parts()
+    print(f"{len(parts)} parts")
+    for value in VALUES:
+        # the candidates found by the index: all parts containing the value
+        related = [(part_id, mpn) for part_id, mpn in parts if value.lower() in mpn.lower()]
+        old = measure(lambda candidates: legacy_match_parts(value, candidates), related, args.repetitions)
+        new = measure(lambda candidates: rank_parts(value, candidates), related, args.repetitions)
+        part_id, confidence = rank_parts(value, related)
+        print(f"{value:>14}: {len(related):6d} candidates   legacy {old * 1000:8.2f} ms   ranked {new * 1000:8.2f} ms  "
+              f" speedup {old / new:6.1f}x   match {dict(parts)[part_id]} ({confidence:.2f})")
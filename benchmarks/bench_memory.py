@@ -0,0 +1,122 @@
+"""
+Benchmark of the peak memory (max. RSS) of tokenizing a large KiCad board. Every variant runs in its own process, as the
+max. RSS of a process never goes down:
+
+- legacy: reading the file into a str, splitting it into lines and joining them again (the original parseSexp)
+- str: reading the file into a str and tokenizing it in place
+- mmap: memory-mapping the file and tokenizing the bytes (KicadPCB.load)
+- stream: memory-mapping the file and building the forms of the board one by one, dropping each one right away
+  (kicad_parser.load_modules)
+
+and of reading its modules with kicad_parser.read_modules (the fast path, see scan_modules), measured against a
+baseline that has imported the parser as well:
+
+- modules-bytes: reading the file into bytes, as downloaded
+- modules-mmap: memory-mapping the file, as read from a local repo or the download cache
+
+    python -m benchmarks.bench_memory --size 50
+"""
+
+import argparse
+import mmap
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+from benchmarks.synthetic import build_board
+
+VARIANTS = ("legacy", "str", "mmap", "stream")
+
+MODULE_VARIANTS = ("modules-bytes", "modules-mmap")
+
+# bytes per track segment of a synthetic board, roughly
+SEGMENT_SIZE = 128
+
+
+def tokenize(variant, path):
+    """
+    Tokenizes the board with the given variant.
+    """
+    from libs.realthunder_kicad_parser.sexp_parser import parseSexp, parseSexpLines, iterSexp, SexpBuilder
+
+    if variant in MODULE_VARIANTS:
+        import kicad_parser
+        with open(path, "rb") as board:
+            if variant == "modules-bytes":
+                return kicad_parser.read_modules(board.read())
+            with mmap.mmap(board.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                return kicad_parser.read_modules(data)
+    if variant == "legacy":
+        with open(path, "r") as board:
+            return parseSexpLines(board.read().splitlines(False))
+    if variant == "str":
+        with open(path, "r") as board:
+            return parseSexp(board.read())
+    with open(path, "rb") as board, mmap.mmap(board.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        if variant == "mmap":
+            return parseSexp(data)
+        for _ in SexpBuilder(depth=1).iterBuild(iterSexp(data)):
+            pass
+
+
+def max_rss():
+    """
+    Max. RSS of this process in MB (ru_maxrss is in KB on Linux).
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run(*arguments):
+    """
+    Runs this script with the given (hidden) arguments in a new process. The max. RSS is inherited by a new process, so
+    this process has to stay small.
+
+    :return: output of the process
+    """
+    return subprocess.run([sys.executable, "-m", "benchmarks.bench_memory"] + list(arguments),
+                          check=True, stdout=subprocess.PIPE, universal_newlines=True).stdout
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmarks the peak memory of tokenizing a large board.')
+    parser.add_argument('--size', type=int, default=50, help='size of the synthetic board in MB')
+    parser.add_argument('--board', type=str, help='KiCad file to use instead of a synthetic board')
+    parser.add_argument('--run', type=str, nargs=2, metavar=("VARIANT", "PATH"), help=argparse.SUPPRESS)
+    parser.add_argument('--build', type=str, metavar="PATH", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.build:
+        with open(args.build, "w") as board:
+            board.write(build_board(1000, num_segments=args.size * 1024 * 1024 // SEGMENT_SIZE))
+        sys.exit(0)
+
+    if args.run:
+        if args.run[0] == "baseline":
+            # interpreter and modules only
+            from libs.realthunder_kicad_parser.sexp_parser import parseSexp  # noqa: F401
+        elif args.run[0] == "baseline-parser":
+            import kicad_parser  # noqa: F401
+        else:
+            tokenize(*args.run)
+        print(max_rss())
+        sys.exit(0)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = args.board
+        if path is None:
+            path = os.path.join(directory, "board.kicad_pcb")
+            run("--size", str(args.size), "--build", path)
+
+        size = os.path.getsize(path) / 1024 / 1024
+        baseline = float(run("--run", "baseline", path))
+        print(f"{size:.1f} MB board, baseline {baseline:.0f} MB")
+        for variant in VARIANTS:
+            peak = float(run("--run", variant, path)) - baseline
+            print(f"    {variant:13s} {peak:7.0f} MB   {peak / size:5.1f}x file size")
+
+        baseline = float(run("--run", "baseline-parser", path))
+        print(f"read_modules, baseline {baseline:.0f} MB")
+        for variant in MODULE_VARIANTS:
+            peak = float(run("--run", variant, path)) - baseline
+            print(f"    {variant:13s} {peak:7.0f} MB   {peak / size:5.1f}x file size")
@@ -0,0 +1,52 @@
+"""
+Benchmark of the parse stage of the parser with different numbers of worker processes. Parses a set of synthetic
+KiCad boards the same way parse_repos_from_pickle_file does (without downloads and database writes) and reports the
+throughput in files per second.
+
+    python -m benchmarks.bench_parse_workers --files 64 --workers 1 2 4 8 16
+"""
+
+import argparse
+import time
+from benchmarks.synthetic import build_board
+import kicad_parser
+
+
+def measure(boards, workers):
+    """
+    Extracts the modules of all boards.
+
+    :param boards: list of board file contents
+    :param workers: number of worker processes (1: parse in this process)
+    :return: seconds
+    """
+    downloads = ((f"board{i}", contents, None) for i, contents in enumerate(boards))
+    pool = kicad_parser.parse_pool(workers) if workers > 1 else None
+    try:
+        # start the workers before measuring
+        if pool is not None:
+            list(pool.map(abs, range(workers)))
+        start = time.perf_counter()
+        for _, _, error, _ in kicad_parser.extract_all(downloads, pool, workers):
+            assert error is None
+        return time.perf_counter() - start
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmarks parsing KiCad files with worker processes.')
+    parser.add_argument('--files', type=int, default=32, help='number of synthetic boards')
+    parser.add_argument('--modules', type=int, default=300, help='modules per board')
+    parser.add_argument('--workers', type=int, nargs="+", default=[1, 2, 4], help='numbers of workers to compare')
+    args = parser.parse_args()
+
+    boards = [build_board(args.modules, seed=i) for i in range(args.files)]
+    print(f"{args.files} boards, {sum(map(len, boards)) / len(boards) / 1024:.0f} KiB on average")
+
+    baseline = None
+    for workers in args.workers:
+        seconds = measure(boards, workers)
+        baseline = baseline or seconds
+        print(f"{workers:3d} workers: {args.files / seconds:7.1f} files/s   speedup {baseline / seconds:5.2f}x")
@@ -0,0 +1,60 @@
+"""
+Benchmark of the item lookup of search.search() with and without the full-text index. Builds a synthetic database,
+copies it, indexes the copy and reports p50/p99 latencies of fetching the matching items for a set of typical queries.
+
+    python -m benchmarks.bench_search --items 1000000
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from benchmarks.synthetic import build_database, percentile
+from libs.search_index import create_search_index
+from models.items import Item
+import search
+
+QUERIES = ["STM32", "ESP8266", "ATMEGA328", "NE555", "LM358", "CH340", "TPS62", "NOTEXISTING", "USBLC6", "F407"]
+
+
+def measure(uri, repetitions):
+    """
+    Runs all queries repeatedly against the database.
+
+    :param uri: database uri
+    :param repetitions: runs per query
+    :return: list of latencies in ms
+    """
+    session = sessionmaker(bind=create_engine(uri))()
+    latencies = []
+    for _ in range(repetitions):
+        for query in QUERIES:
+            start = time.perf_counter()
+            session.query(Item.id).filter(search.build_item_filter(query, session)).all()
+            latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmarks the search with and without full-text index.')
+    parser.add_argument('--items', type=int, default=200000, help='number of synthetic items')
+    parser.add_argument('--repetitions', type=int, default=5, help='runs per query')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    try:
+        like_db = build_database(os.path.join(workdir, "like.sqlite"), num_items=args.items)
+        fts_db = shutil.copy(like_db, os.path.join(workdir, "fts.sqlite"))
+
+        start = time.perf_counter()
+        create_search_index(create_engine(f"sqlite:///{fts_db}"))
+        print(f"Indexing {args.items} items took {time.perf_counter() - start:.1f}s")
+
+        for name, path in (("ILIKE", like_db), ("FTS5", fts_db)):
+            latencies = measure(f"sqlite:///{path}", args.repetitions)
+            print(f"{name:6s} p50 {percentile(latencies, 0.5):9.1f} ms   p99 {percentile(latencies, 0.99):9.1f} ms")
+    finally:
+        shutil.rmtree(workdir)
@@ -0,0 +1,104 @@
+"""
+Regression benchmark of the complete search.search() call (query, grouping by repository and serialisation) on a
+synthetic database. With --legacy, the previous implementation (one Repo query per new repository and a linear scan of
+the result list per item) is measured as well for comparison.
+
+    python -m benchmarks.bench_search_results --items 1000000
+"""
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from benchmarks.synthetic import build_database, percentile
+from libs.search_index import create_search_index
+from models.files import File
+from models.items import Item
+from models.part import Part
+from models.repos import Repo
+import search
+
+QUERIES = ["STM32F407", "ESP32-WROOM", "ATMEGA32U4", "NE555", "CH340G", "TPS62160", "NOTEXISTING", "MCP2515"]
+
+
+def legacy_search(query, session):
+    """
+    The grouping of search.search() before it was reworked, kept for comparison.
+
+    :param query: query term
+    :param session: database session
+    :return: json string
+    """
+    query_item = search.preprocess_query(query)[0]
+    item_results = (
+        session.query(Item, File, Part)
+        .filter(search.build_item_filter(query_item, session))
+        .filter(File.id == Item.file_id)
+        .join(Part, Item.part_id == Part.id, isouter=True)
+        .all()
+    )
+
+    repo_list = []
+    for item in item_results:
+        saved_repo_ids = [str(repo['repo_id']) for repo in repo_list]
+        if str(item.File.repo_id) not in saved_repo_ids:
+            repo_obj = search.build_repo_object(session.query(Repo).filter(Repo.id == item.File.repo_id).one())
+        else:
+            repo_obj = [repo for repo in repo_list if str(repo['repo_id']) == str(item.File.repo_id)][0]
+            repo_list.pop(repo_list.index(repo_obj))
+        files_data = search.build_file_item_object(item.Item, item.File, item.Part)
+        repo_obj["files"].append(files_data)
+        repo_obj["tags"].extend(files_data["tags"])
+        repo_obj["tags"] = list(set(repo_obj["tags"]))
+        repo_list.append(repo_obj)
+
+    return json.dumps({"status": "OK", "results": search.sort_by_relevance(repo_list)})
+
+
+def measure(function, uri, repetitions):
+    """
+    Runs all queries repeatedly.
+
+    :param function: search function taking (query, session)
+    :param uri: database uri
+    :param repetitions: runs per query
+    :return: (list of latencies in ms, number of found items per query)
+    """
+    session = sessionmaker(bind=create_engine(uri))()
+    latencies = []
+    found = {}
+    for _ in range(repetitions):
+        for query in QUERIES:
+            start = time.perf_counter()
+            result = json.loads(function(query, session=session))
+            latencies.append((time.perf_counter() - start) * 1000)
+            found[query] = sum(len(repo["files"]) for repo in result["results"])
+    return latencies, found
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmarks the complete search call.')
+    parser.add_argument('--items', type=int, default=1000000, help='number of synthetic items')
+    parser.add_argument('--repetitions', type=int, default=3, help='runs per query')
+    parser.add_argument('--legacy', action="store_true", help='measure the previous implementation as well')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    try:
+        path = build_database(os.path.join(workdir, "search.sqlite"), num_items=args.items)
+        create_search_index(create_engine(f"sqlite:///{path}"))
+
+        candidates = [("current", search.search)]
+        if args.legacy:
+            candidates.append(("legacy", legacy_search))
+
+        for name, function in candidates:
+            latencies, found = measure(function, f"sqlite:///{path}", args.repetitions)
+            print(f"{name:8s} p50 {percentile(latencies, 0.5):9.1f} ms   p99 {percentile(latencies, 0.99):9.1f} ms")
+        print("items found per query:", found)
+    finally:
+        shutil.rmtree(workdir)
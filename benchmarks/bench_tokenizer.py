@@ -0,0 +1,65 @@
+"""
+Micro-benchmark of the S-expression tokenizer (parseSexp) used by KicadPCB. Reports tokens/s of the original
+implementation (joining all lines first), the current one (on str and on UTF-8 encoded bytes) and the current one
+without line numbers, as well as building the forms of a board one by one from events (iterSexp). Real boards can be
+passed as files, otherwise the test fixture and synthetic boards are used.
+
+    python -m benchmarks.bench_tokenizer path/to/board.kicad_pcb ...
+"""
+
+import argparse
+import os
+from benchmarks.bench_extract import measure
+from benchmarks.synthetic import build_board
+from libs.realthunder_kicad_parser.module_extractor import TOKEN
+from libs.realthunder_kicad_parser.sexp_parser import parseSexp, parseSexpLines, iterSexp, SexpBuilder
+
+FIXTURE = os.path.join(os.path.dirname(__file__), os.pardir, "tests", "fixtures", "demo.kicad_pcb")
+
+
+def legacy(contents):
+    return parseSexpLines(contents.splitlines(False))
+
+
+def without_lines(contents):
+    return parseSexp(contents, lines=False)
+
+
+def events(contents):
+    for _ in SexpBuilder(depth=1).iterBuild(iterSexp(contents)):
+        pass
+
+
+def boards(paths):
+    """
+    Yields (name, contents) of the boards to measure.
+    """
+    if not paths:
+        paths = [FIXTURE]
+        for num_modules, num_segments in ((200, 20000), (1000, 100000)):
+            yield f"synthetic ({num_modules} modules, {num_segments} segments)", \
+                build_board(num_modules, num_segments=num_segments)
+
+    for path in paths:
+        with open(path, "r") as board:
+            yield os.path.basename(path), board.read()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmarks the S-expression tokenizer.')
+    parser.add_argument('boards', type=str, nargs="*", help='KiCad files (default: fixture and synthetic boards)')
+    parser.add_argument('--repetitions', type=int, default=3, help='runs per board')
+    args = parser.parse_args()
+
+    for name, contents in boards(args.boards):
+        assert parseSexp(contents) == legacy(contents)
+
+        tokens = len(TOKEN.findall("".join(contents.splitlines())))
+        encoded = contents.encode("utf-8")
+        results = [(label, measure(function, text, args.repetitions)) for label, function, text in
+                   (("legacy", legacy, contents), ("parseSexp", parseSexp, contents),
+                    ("bytes", parseSexp, encoded), ("without lines", without_lines, contents),
+                    ("events", events, contents))]
+        print(f"{name}: {tokens} tokens")
+        for label, seconds in results:
+            print(f"    {label:14s} {tokens / seconds / 1e6:6.2f} M tokens/s   {results[0][1] / seconds:4.1f}x")
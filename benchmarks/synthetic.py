@@ -0,0 +1,156 @@
+"""
+Synthetic data for the benchmarks. Builds a parser database of arbitrary size with realistic looking component values
+(MPN families with many siblings, passives and connectors) so that query plans and latencies can be compared without
+a production database.
+"""
+
+import random
+import sqlite3
+from sqlalchemy import create_engine
+from models.base import Base
+# models have to be imported so that the tables are known to the metadata
+from models.files import File  # noqa: F401
+from models.items import Item  # noqa: F401
+from models.part import Part  # noqa: F401
+from models.repos import Repo  # noqa: F401
+
+FAMILIES = [
+    "STM32F103C8T6", "STM32F103RBT6", "STM32F407VGT6", "STM32L432KC", "ATMEGA328P-AU", "ATMEGA32U4-MU",
+    "ATTINY85-20SU", "ESP8266EX", "ESP32-WROOM-32", "LM358", "NE555", "AMS1117-3.3", "CH340G", "FT232RL",
+    "MCP2515", "TJA1050", "NRF52832", "LM1117", "TPS62160", "USBLC6-2SC6",
+]
+PASSIVES = ["10K", "100n", "4.7uF", "1K", "22pF", "0R", "R_0603", "C_0805"]
+SUFFIXES = ["", "-TR", "/NOPB", "DR", "N", "P", "TX", "-REEL", "_Module", "-X"]
+
+
+def random_value(rnd):
+    """
+    Draws a component value. Roughly a third of the values are passives, a fifth are variants of popular MPN families
+    and the rest are random MPN-like strings (the long tail).
+
+    :param rnd: random.Random instance
+    :return: value string
+    """
+    draw = rnd.random()
+    if draw < 0.3:
+        return rnd.choice(PASSIVES)
+    if draw < 0.5:
+        return rnd.choice(FAMILIES) + rnd.choice(SUFFIXES)
+    letters = "ABCDEFGHJKLMNPQRSTUVWXYZ"
+    return "".join(rnd.choice(letters) for _ in range(rnd.randint(2, 4))) + str(rnd.randint(1, 99999)) + \
+        "".join(rnd.choice(letters) for _ in range(rnd.randint(0, 3)))
+
+
+def build_database(path, num_items=100000, items_per_file=50, files_per_repo=4, num_parts=5000, seed=42):
+    """
+    Creates (or overwrites) an SQLite parser database at path and fills it with synthetic rows.
+
+    :param path: file path of the database
+    :param num_items: number of items to generate
+    :param items_per_file: items per KiCad file
+    :param files_per_repo: files per repository
+    :param num_parts: number of parts in the parts catalogue
+    :param seed: seed for reproducible data
+    :return: path
+    """
+    rnd = random.Random(seed)
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    engine.dispose()
+
+    num_files = max(1, num_items // items_per_file)
+    num_repos = max(1, num_files // files_per_repo)
+
+    connection = sqlite3.connect(path)
+    connection.execute("PRAGMA journal_mode = OFF")
+    connection.execute("PRAGMA synchronous = OFF")
+    with connection:
+        connection.executemany(
+            "INSERT INTO repos (id, repo_url, repo_uuid, description, name, license, license_url, readme, readme_url, "
+            "forks, stars) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            ((i, f"https://github.com/user{i}/board{i}", f"r{i}", f"Board number {i}", f"board{i}", "MIT",
+              "https://opensource.org/licenses/MIT", "Readme " * 20, "", rnd.randint(0, 50), rnd.randint(0, 500))
+             for i in range(1, num_repos + 1))
+        )
+        connection.executemany(
+            "INSERT INTO files (id, url, uuid, repo_id) VALUES (?, ?, ?, ?)",
+            ((i, f"https://raw.githubusercontent.com/user/board/master/board{i}.kicad_pcb", f"f{i}",
+              str((i - 1) % num_repos + 1)) for i in range(1, num_files + 1))
+        )
+        connection.executemany(
+            "INSERT INTO parts (id, description, manufacturer, aisler_id, mpn, datasheet) VALUES (?, ?, ?, ?, ?, ?)",
+            ((i, "Synthetic part", "ACME", f"a{i}", random_value(rnd) + str(i % 7), "")
+             for i in range(1, num_parts + 1))
+        )
+        connection.executemany(
+            "INSERT INTO items (id, uuid, module, description, tags, reference, value, part_id, file_id) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            ((i, f"i{i}", "Package_QFP:LQFP-48", '"LQFP, 48 Pin"', '"QFP 0.5"', f"U{i % 100}",
+              random_value(rnd), str(rnd.randint(1, num_parts)) if rnd.random() < 0.2 else None,
+              str((i - 1) // items_per_file + 1)) for i in range(1, num_items + 1))
+        )
+    connection.close()
+    return path
+
+
+def build_board(num_modules=200, pads_per_module=8, num_segments=None, seed=42):
+    """
+    Generates the contents of a KiCad 5 board file with the given number of footprints (modules). Besides the
+    modules, boards consist mostly of tracks, which are generated as well (by default 5 segments per module).
+
+    :param num_modules: number of modules
+    :param pads_per_module: pads of each module
+    :param num_segments: number of track segments (default 5 per module)
+    :param seed: seed for reproducible data
+    :return: board file contents
+    """
+    rnd = random.Random(seed)
+    if num_segments is None:
+        num_segments = 5 * num_modules
+
+    lines = ["(kicad_pcb (version 20171130) (host pcbnew 5.1.5)", "",
+             "  (general", "    (thickness 1.6)", f"    (modules {num_modules})", "  )", "",
+             "  (page A4)", "  (layers", "    (0 F.Cu signal)", "    (31 B.Cu signal)", "  )", "",
+             "  (net 0 \"\")"]
+    for i in range(1, num_modules + 1):
+        value = random_value(rnd)
+        prefix = "R" if value in PASSIVES else "U"
+        x, y = rnd.uniform(50, 250), rnd.uniform(50, 200)
+        lines += [
+            f"  (module Package_QFP:LQFP-48_7x7mm_P0.5mm (layer F.Cu) (tedit 5A02F146) (tstamp 5E1C{i:04X})",
+            f"    (at {x:.2f} {y:.2f})",
+            "    (descr \"LQFP, 48 Pin (https://www.st.com/resource/en/datasheet/stm32f103c8.pdf)\")",
+            "    (tags \"LQFP QFP\")",
+            f"    (path /5E1C{i:04X})",
+            "    (attr smd)",
+            f"    (fp_text reference {prefix}{i} (at 0 -5.85) (layer F.SilkS)",
+            "      (effects (font (size 1 1) (thickness 0.15)))",
+            "    )",
+            f"    (fp_text value {value} (at 0 5.85) (layer F.Fab)",
+            "      (effects (font (size 1 1) (thickness 0.15)))",
+            "    )",
+            "    (fp_line (start -3.5 -3.5) (end 3.5 -3.5) (layer F.Fab) (width 0.1))",
+        ]
+        lines += [f"    (pad {pad} smd rect (at {-4.16 + pad * 0.5:.2f} -2.75) (size 1.475 0.3) "
+                  f"(layers F.Cu F.Paste F.Mask) (net {rnd.randint(0, 200)} \"Net-(U{i}-Pad{pad})\"))"
+                  for pad in range(1, pads_per_module + 1)]
+        lines.append("  )")
+    lines += [f"  (segment (start {rnd.uniform(50, 250):.4f} {rnd.uniform(50, 200):.4f}) "
+              f"(end {rnd.uniform(50, 250):.4f} {rnd.uniform(50, 200):.4f}) (width 0.25) (layer F.Cu) "
+              f"(net {rnd.randint(0, 200)}) (tstamp 5E2{i:05X}))" for i in range(num_segments)]
+    lines += [")", ""]
+    return "\n".join(lines)
+
+
+def percentile(samples, fraction):
+    """
+    Nearest-rank percentile of a list of samples.
+
+    :param samples: list of numbers
+    :param fraction: e.g. 0.99
+    :return: percentile value
+    """
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[index]
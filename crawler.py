@@ -3,7 +3,7 @@ Crawler
 ====================================
 The GitHub crawler. This crawler searches GitHub for repositories that contain 'KiCad' or 'PCB' in their description or
 readme, checks if they contain .kicad_pcb files, and saves repository metadata and the file urls so that they can later
-be parsed by the parser module.
+be parsed by the parser module. The repositories are appended to the crawl log (repos.jsonl) one by one.
 """
 from github import Github, GithubException, UnknownObjectException
 import pickle
@@ -14,6 +14,7 @@ import calendar
 import logging.handlers
 from configparser import ConfigParser
 import os
+from libs.crawl_log import CrawlLog, convert_pickle
 
 config = ConfigParser()
 
@@ -31,6 +32,9 @@ except KeyError:
 
 abuse_count = 0
 
+# Crawled repositories, one per line (see libs/crawl_log.py)
+CRAWL_LOG = 'repos.jsonl'
+
 logger = logging.getLogger("Crawler")
 # Logger has to have 'lowest' Level. Nothing underneath this level is logged.
 logger.setLevel(logging.DEBUG)
@@ -48,11 +52,17 @@ def main(test=False):
     over the creation date of the repository to circumvent GitHubs 1000 items per response limit.
 
     :param test: When set to True, the crawler will write a pickle file as soon as a repository containing KiCad
-    files has been found. Used for testing.
+    files has been found (instead of appending to the crawl log). Used for testing.
     """
     # Maximum per page seems to be 100, but it doesn't hurt to set it higher
     g = Github(GITHUB_TOKEN, per_page=1000)
 
+    # repos.pickle of older versions of the crawler
+    if not test and not os.path.exists(CRAWL_LOG) and os.path.exists('repos.pickle'):
+        logger.warning(f"Converting repos.pickle to {CRAWL_LOG}...")
+        convert_pickle('repos.pickle', CRAWL_LOG)
+    crawl_log = CrawlLog(CRAWL_LOG) if not test else None
+
     try:
         with open('crawler_status.pickle', 'rb') as f:
             crawler_status = pickle.load(f)
@@ -66,12 +76,12 @@ def main(test=False):
             logger.warning(f"Found crawler status file. {crawler_status['repos_searched']} repos searched and "
                            f"{crawler_status['files_found']} files found so far. Resuming search from "
                            f"{start_date.strftime('%Y-%m')}.")
-        with open('repos.pickle', 'rb') as f:
-            list_of_repos = pickle.load(f)
+        # the month that has not been completed is crawled again, drop its repos
+        if crawl_log is not None and crawler_status.get('crawl_log_offset') is not None:
+            crawl_log.truncate(crawler_status['crawl_log_offset'])
     except IOError:
         logger.warning("No crawler status file found, beginning search from 2015-01.")
         start_date = datetime.datetime.strptime('2015-01-01', '%Y-%m-%d')
-        list_of_repos = []
         num_of_repos = 0
         num_of_files = 0
 
@@ -113,6 +123,8 @@ def main(test=False):
                         license_url = ''
 
                     list_of_kicad_files = []
+                    # git blob SHAs of the files, changed files are re-parsed by the parser in incremental mode
+                    kicad_shas = {}
                     try:
                         for cf in content_files:
                             check_rate_limit(g, rl_limit=RATE_LIMIT_SAFETY, num_of_repos=num_of_repos,
@@ -120,6 +132,7 @@ def main(test=False):
                             download_url = cf.download_url
                             if download_url.endswith('.kicad_pcb'):
                                 list_of_kicad_files.append(download_url)
+                                kicad_shas[download_url] = cf.sha
                                 num_of_files += 1
 
                     except GithubException as e:
@@ -161,30 +174,35 @@ def main(test=False):
                             'repo_license': license_text,
                             'repo_license_url': license_url,
                             'kicad_urls': list_of_kicad_files,
+                            'kicad_shas': kicad_shas,
+                            'pushed_at': repo.pushed_at.isoformat() if repo.pushed_at else None,
                             'stars': repo.stargazers_count,
                             'forks': repo.forks_count
                         }
 
-                        list_of_repos.append(info_dict)
-
                         # Only save one repo for testing
                         if test:
                             with open('repos_test.pickle', 'wb') as f:
-                                pickle.dump(list_of_repos, f, pickle.HIGHEST_PROTOCOL)
+                                pickle.dump([info_dict], f, pickle.HIGHEST_PROTOCOL)
                             return
 
+                        crawl_log.append(info_dict)
+
             except GithubException as e:
                 handle_github_exception(e)
                 pass
 
-            logger.info(f"Reached the end of month {dt.strftime('%Y-%m')}. Saving data to repos.pickle and status to "
-                        f"crawler_status.pickle. Restarting the crawler will resume from this position.")
-            save_list_of_repos(list_of_repos, num_of_repos, num_of_files, dt)
+            logger.info(f"Reached the end of month {dt.strftime('%Y-%m')}. Saving status to crawler_status.pickle. "
+                        f"Restarting the crawler will resume from this position.")
+            save_status(crawl_log, num_of_repos, num_of_files, dt)
 
         logger.info('Reached current date. Stopping and writing to file...')
-        save_list_of_repos(list_of_repos, num_of_repos, num_of_files, dt)
+        save_status(crawl_log, num_of_repos, num_of_files, dt)
     except KeyboardInterrupt:
         logger.warning("Received Keyboard interrupt, stopping...")
+    finally:
+        if crawl_log is not None:
+            crawl_log.close()
 
 
 def check_rate_limit(g, rl_limit, num_of_repos, num_of_files, dt):
@@ -226,13 +244,13 @@ def update_status(num_of_repos, num_of_files, dt):
     logger.info(f"Abuse limit count: {abuse_count}")
 
 
-def save_list_of_repos(list_of_repos, num_of_repos, num_of_files, dt):
+def save_status(crawl_log, num_of_repos, num_of_files, dt):
     """
-    Save repositories and files that have been crawled, create a status dict so that the crawling can be continued if it
-    is cancelled in the meantime. This method is only called at the end of each month-slice, to allow for easy
-    continuation (just start with the next month)
-    :param list_of_repos: A list of dictionaries that contain all the info that has been found (e.g. repo urls,
-    KiCad file urls)
+    Create a status dict so that the crawling can be continued if it is cancelled in the meantime. The repositories
+    have already been written to the crawl log, the status records its size. This method is only called at the end of
+    each month-slice, to allow for easy continuation (just start with the next month, the repositories crawled after
+    the recorded size are dropped)
+    :param crawl_log: The CrawlLog the repositories are appended to
     :param num_of_repos: The number of repos that have been crawled so far
     :param num_of_files: The number of KiCad files that have been found so far
     :param dt: The month that is currently being crawled
@@ -243,13 +261,11 @@ def save_list_of_repos(list_of_repos, num_of_repos, num_of_files, dt):
         status_dict = {
             'last_month_completed': dt.strftime('%Y-%m'),
             'repos_searched': num_of_repos,
-            'files_found': num_of_files
+            'files_found': num_of_files,
+            'crawl_log_offset': crawl_log.offset if crawl_log is not None else None
         }
         pickle.dump(status_dict, f, pickle.HIGHEST_PROTOCOL)
 
-    with open('repos.pickle', 'wb') as f:
-        pickle.dump(list_of_repos, f, pickle.HIGHEST_PROTOCOL)
-
 
 def handle_github_exception(e):
     """
@@ -7,22 +7,38 @@ flask search app.
 """
 
 import argparse
+from collections import OrderedDict, deque
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+import functools
 import logging
+import mmap
+import multiprocessing
 from configparser import ConfigParser
 import pickle
-import requests
+import signal
+import threading
 import uuid
-from libs.realthunder_kicad_parser import KicadPCB
-import re
+from libs.realthunder_kicad_parser import KicadPCB, KicadPCB_module, SexpBuilder, iterSexp, scan_modules, \
+    UnsupportedSexp
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.orm import scoped_session
-from sqlalchemy.exc import InterfaceError
-from models.base import Base
+from models.base import Base, add_missing_columns
 from models.files import File
 from models.repos import Repo
 from models.items import Item
 from models.part import Part
+from libs.search_index import create_search_index
+from libs.ResultCache import bump_generation
+from libs.FileFetcher import FileFetcher
+from libs.DownloadCache import content_hash
+from libs.ParseCache import ParseCache
+from libs.crawl_log import read_crawl_log, is_record_start
+from libs.Checkpoint import Checkpoint
+from libs.Pipeline import Pipeline, Stage, Watermark
+from libs.local_repos import LocalFetcher, local_repos, cloned_repos
+from libs.ModuleFilter import ModuleFilter
 import os
 
 config = ConfigParser()
@@ -33,33 +49,49 @@ if os.path.exists('config/parser.config'):
 else:
     config.read('config/default_parser.config')
 
-# Check for db repo
-db_path = config["DATABASE"]["database-uri"].split(":///")
-if len(db_path) > 0:
-    db_path = db_path[1]
-    db_path = os.path.dirname(db_path)
-    if not os.path.exists(db_path):
-        os.mkdir(db_path)
-else:
-    print("Do not understand the db file config. Continuing nevertheless...")
-
-# Init SQLAlchemy
-engine = create_engine(config["DATABASE"]["database-uri"])
-Base.metadata.create_all(engine)
-session_factory = sessionmaker(bind=engine)
+# Database sessions of the parser, bound to the configured database by init_parser()
+session_factory = sessionmaker()
 Session = scoped_session(session_factory)
 
 # logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger("KiCad_Parser")
 logger.setLevel(logging.DEBUG)
 
-logfile_handler = logging.FileHandler(config["DEFAULT"]["Logfile"])
-logfile_handler.setLevel(logging.DEBUG)
+# Downloads the KiCad files (concurrently, with a shared connection pool), set up by init_parser()
+file_fetcher = None
+
+# Removes duplicate and common modules, excluded values are re-read when the file is changed
+EXCLUDED_VALUES_FILE = "excluded_values.txt"
+module_filter = ModuleFilter(EXCLUDED_VALUES_FILE)
+
+# Modules read from KiCad files by content hash, files found under several URLs are only tokenized once. Set up by
+# init_parser(), None without a cache
+parse_cache = None
+
+
+# Fields of the module tuples extracted from KiCad files
+MODULE_FIELDS = ("module", "descr", "tags", "reference", "value")
+
+# Columns of the items table the module fields are stored in
+ITEM_COLUMNS = ("module", "description", "tags", "reference", "value")
+
+# Files handed to each parse worker ahead of the database writes
+PARSE_AHEAD = 2
 
-log_formatter = logging.Formatter("%(asctime)s [ 0] %(levelname)8s - %(name)15s  - %(message)s")
-logfile_handler.setFormatter(log_formatter)
+# Repos that are planned (and downloaded) together, bounds the memory used for large crawl logs
+PLAN_BATCH = 256
 
-logger.addHandler(logfile_handler)
+# Threads downloading the files of repos, repos waiting in front of each stage of the pipeline and repos written per
+# transaction (see parse_repos)
+PIPELINE_FETCHERS = config.getint("PIPELINE", "Fetchers", fallback=4)
+PIPELINE_QUEUE_SIZE = config.getint("PIPELINE", "Queue-Size", fallback=64)
+WRITE_BATCH = config.getint("PIPELINE", "Write-Batch", fallback=16)
+
+# Directory of the shallow clones of git repos (see parse_repos_from_git)
+CLONE_DIR = config.get("LOCAL", "Clone-Dir", fallback="./cache/clones")
+
+# Appended to the path of a pickle file or crawl log for the checkpoint of its run
+CHECKPOINT_SUFFIX = ".checkpoint"
 
 
 class RateLimitException(Exception):
@@ -72,92 +104,728 @@ class RateLimitException(Exception):
         super().__init__(message)
 
 
-def parse_repos_from_pickle_file(pickle_file):
+def init_parser():
+    """
+    Sets up the parser: creates (or migrates) the configured database and binds the Session to it, opens the log file,
+    the FileFetcher and the ParseCache. This is not done on import: the spawned parse workers import this module (as
+    __mp_main__ when it is run as a script) and must not write to the database or open the log file again.
+
+    :return: Nothing
     """
-    Parses a pickle file for repo and file information.
+    global file_fetcher, parse_cache
+    if file_fetcher is not None:
+        return
+
+    # Check for db repo
+    db_path = config["DATABASE"]["database-uri"].split(":///")
+    if len(db_path) > 0:
+        db_path = db_path[1]
+        db_path = os.path.dirname(db_path)
+        if not os.path.exists(db_path):
+            os.mkdir(db_path)
+    else:
+        print("Do not understand the db file config. Continuing nevertheless...")
+
+    # Init SQLAlchemy
+    engine = create_engine(config["DATABASE"]["database-uri"])
+    Base.metadata.create_all(engine)
+    add_missing_columns(engine)
+    create_search_index(engine)
+    session_factory.configure(bind=engine)
+
+    logfile_handler = logging.FileHandler(config["DEFAULT"]["Logfile"])
+    logfile_handler.setLevel(logging.DEBUG)
+
+    log_formatter = logging.Formatter("%(asctime)s [ 0] %(levelname)8s - %(name)15s  - %(message)s")
+    logfile_handler.setFormatter(log_formatter)
+
+    logger.addHandler(logfile_handler)
+
+    file_fetcher = FileFetcher.from_config(config)
+    parse_cache = ParseCache.from_config(config)
+
+
+def parse_repos_from_pickle_file(pickle_file, fetcher=None, workers=1, incremental=False, restart=False):
+    """
+    Parses a pickle file for repo and file information. The files are downloaded concurrently ahead of parsing.
+    An interrupted run resumes after the last stored repo (see Checkpoint), unless the pickle file has changed since.
 
     :param pickle_file: picke file to parse
+    :param fetcher: (optional) FileFetcher used for the downloads, defaults to the one of the parser (see init_parser)
+    :param workers: number of processes parsing the files. All database writes are done by this process
+    :param incremental: update repos that have already been parsed and changed since (see plan_repos)
+    :param restart: ignore the checkpoint of an earlier run and start with the first repo
     :return: -
     """
     with open(pickle_file, "rb") as pf:
         list_of_repos = pickle.load(pf, encoding="UTF-8")
 
-    num_of_repos = len(list_of_repos)
-    repo_counter = 0
+    checkpoint = Checkpoint(pickle_file + CHECKPOINT_SUFFIX)
+    source = os.stat(pickle_file)
+    start = checkpoint.load(fingerprint=[source.st_size, source.st_mtime_ns]) if not restart else 0
+    if start:
+        logger.info(f"Resuming after repo {start} of {pickle_file}")
 
-    for repo in list_of_repos:
-        repo_counter += 1
-        print(f"Currently parsing repo {repo_counter}/{num_of_repos}")
-        logger.info(f"Fetching info for repo url: {repo['repo_url']}")
+    # the offset of a repo is its position in the list, starting with 1
+    records = ((index + 1, list_of_repos[index]) for index in range(start, len(list_of_repos)))
+    parse_repos(records, fetcher, workers, incremental, num_of_repos=len(list_of_repos), repo_counter=start,
+                checkpoint=checkpoint)
 
-        session = Session()
 
-        # TODO: Better to use one() and handle the exception
-        repo_found = session.query(Repo).filter_by(repo_url=repo['repo_url']).first()
+def parse_repos_from_crawl_log(log_file, fetcher=None, workers=1, incremental=False, restart=False):
+    """
+    Parses the repos of a crawl log (see libs/crawl_log.py). The repos are read one by one, instead of loading all of
+    them into memory first. An interrupted run resumes after the last stored repo (see Checkpoint), repos appended
+    to the log since are parsed by the next run.
+
+    :param log_file: crawl log to parse
+    :param fetcher: (optional) FileFetcher used for the downloads, defaults to the one of the parser (see init_parser)
+    :param workers: number of processes parsing the files. All database writes are done by this process
+    :param incremental: update repos that have already been parsed and changed since (see plan_repos)
+    :param restart: ignore the checkpoint of an earlier run and start with the first repo
+    :return: -
+    """
+    checkpoint = Checkpoint(log_file + CHECKPOINT_SUFFIX)
+    start = checkpoint.load() if not restart else 0
+    # e.g. the crawler has dropped the repos of an incomplete month and crawled it again
+    if start > os.path.getsize(log_file) or not is_record_start(log_file, start):
+        logger.warning(f"Checkpoint of {log_file} does not match the log anymore, starting at the beginning")
+        start = 0
+    if start:
+        logger.info(f"Resuming at offset {start} of {log_file}")
 
-        if not repo_found:
-            repo_new = Repo(repo_url=repo['repo_url'], repo_uuid=str(uuid.uuid4()),
-                            description=repo['repo_description'],
-                            name=repo['repo_name'], readme=repo['repo_readme'],
-                            readme_url=repo['repo_readme_url'], license=repo['repo_license'],
-                            license_url=repo['repo_license_url'], forks=int(repo['forks']),
-                            stars=int(repo['stars']))
+    parse_repos(read_crawl_log(log_file, start), fetcher, workers, incremental, checkpoint=checkpoint)
 
-            # Save files and items in lists, only add to DB if all files of a repo have been parsed
-            # as to not lose any in case we reach the rate limit
 
-            list_of_results = []
+def parse_repos_from_directory(directory, workers=1, incremental=False):
+    """
+    Parses the repos of a local directory tree, e.g. of mirrored repos (see libs/local_repos.py). The files are read
+    from disk instead of being downloaded.
 
-            file = None
-            items = None
-            for file_url in repo['kicad_urls']:
-                try:
-                    file, items = parse_file_from_url(file_url)
-                    list_of_results.append((file, items))
-                except AssertionError:
-                    logger.warning("File could not be parsed, skipping...")
-                except TypeError:
-                    logger.warning("File does not contain any modules, skipping...")
-                except FileNotFoundError:
-                    logger.warning("File can not be found anymore, skipping...")
-                except ConnectionError as e:
-                    logger.error(f"GitHub returned error: {e}")
-                    raise e
-
-            session.add(repo_new)
-            session.commit()
+    :param directory: directory tree of one or more repos
+    :param workers: number of processes parsing the files. All database writes are done by this process
+    :param incremental: update repos that have already been parsed and changed since (see plan_repos)
+    :return: -
+    """
+    with LocalFetcher() as fetcher:
+        parse_repos(enumerate(local_repos(directory, fetcher), 1), fetcher, workers, incremental)
+
+
+def parse_repos_from_git(urls, workers=1, incremental=False, clone_dir=None):
+    """
+    Makes shallow clones of git repos and parses them like a local directory (see parse_repos_from_directory). Earlier
+    clones are updated instead. The next repo is cloned while the files of the previous ones are parsed.
+
+    :param urls: URLs of the repos
+    :param workers: number of processes parsing the files. All database writes are done by this process
+    :param incremental: update repos that have already been parsed and changed since (see plan_repos)
+    :param clone_dir: (optional) directory of the clones, defaults to the Clone-Dir of the parser config
+    :return: -
+    """
+    with LocalFetcher() as fetcher:
+        repos = cloned_repos(urls, clone_dir or CLONE_DIR, fetcher)
+        parse_repos(enumerate(repos, 1), fetcher, workers, incremental, num_of_repos=len(urls))
+
+
+def parse_repos(records, fetcher=None, workers=1, incremental=False, num_of_repos=None, repo_counter=0,
+                checkpoint=None):
+    """
+    Parses repos and stores their files and items. The repos run through a pipeline (see libs/Pipeline.py): they are
+    planned in batches (see PLAN_BATCH) by a reader thread, the files of each repo are downloaded by the fetch stage
+    and parsed by the parse stage, while this thread writes the parsed repos in batches (see WRITE_BATCH). A first
+    CTRL+C stops reading further repos and stores the ones in flight, a second one aborts at once.
+
+    :param records: iterable of (offset, repo dict) tuples, the offset after the repo in its source (see crawler.py)
+    :param fetcher: (optional) FileFetcher used for the downloads, defaults to the one of the parser (see init_parser)
+    :param workers: number of processes parsing the files. All database writes are done by this process
+    :param incremental: update repos that have already been parsed and changed since (see plan_repos)
+    :param num_of_repos: (optional) number of repos, for the progress output
+    :param repo_counter: number of repos that have been parsed before (resumed run), for the progress output
+    :param checkpoint: (optional) Checkpoint advanced to the offset of each stored repo
+    :return: -
+    """
+    if fetcher is None:
+        fetcher = file_fetcher
+
+    pool = parse_pool(workers) if workers > 1 else None
+    num_of_files = 0
+    # one query each instead of one per repo and file
+    known = KnownUrls.load()
+    pipeline = Pipeline(plan_jobs(records, incremental, known), [
+        Stage("fetch", functools.partial(fetch_job, fetcher), PIPELINE_FETCHERS),
+        Stage("parse", functools.partial(parse_job, pool, RecentModules()), workers)
+    ], queue_size=PIPELINE_QUEUE_SIZE)
+    # repos are finished out of order, the checkpoint must not skip one that is still in flight
+    watermark = Watermark()
+    previous_handler = _drain_on_interrupt(pipeline)
+
+    try:
+        for job in pipeline:
+            jobs = [job] + pipeline.get_ready(WRITE_BATCH - 1)
+            written, files = write_jobs(jobs, known)
+            num_of_files += files
+            for job in written:
+                repo_counter += 1
+                if num_of_repos is not None:
+                    print(f"Currently parsing repo {repo_counter}/{num_of_repos}")
+                else:
+                    print(f"Currently parsing repo {repo_counter}")
+                offset = watermark.finish(job.sequence, job.offset)
+                if checkpoint is not None and offset is not None:
+                    checkpoint.advance(offset)
+    finally:
+        pipeline.close()
+        if previous_handler is not None:
+            signal.signal(signal.SIGINT, previous_handler)
+        if pool is not None:
+            pool.shutdown(wait=True)
+        if checkpoint is not None:
+            checkpoint.save()
+        logger.info(f"Pipeline stats:\n{pipeline.report()}")
+
+    summary = f"Parsed {num_of_files} files of {repo_counter} repos. Downloaded {fetcher.downloaded} files, " \
+              f"{fetcher.not_modified} not modified."
+    if parse_cache is not None:
+        summary += f" Parse cache hit rate {parse_cache.hit_rate:.1%} ({parse_cache.hits} hits, " \
+                   f"{parse_cache.misses} misses)."
+    print(summary)
+    print(pipeline.report())
+    logger.info(summary)
+
+
+def _drain_on_interrupt(pipeline):
+    # signal handlers can only be installed by the main thread
+    if threading.current_thread() is not threading.main_thread():
+        return None
+
+    def interrupted(signum, frame):
+        if pipeline.stopping:
+            raise KeyboardInterrupt
+        logger.warning("Interrupted, storing the repos in progress. Press CTRL+C again to abort at once")
+        print("Interrupted, storing the repos in progress. Press CTRL+C again to abort at once")
+        pipeline.stop()
+
+    return signal.signal(signal.SIGINT, interrupted)
+
+
+class RepoJob:
+    """
+    A repo passing through the pipeline of parse_repos.
+    """
+
+    def __init__(self, sequence, offset, repo, file_urls, stored):
+        """
+        :param sequence: position of the repo in this run, starting with 0
+        :param offset: offset after the repo in its source, see parse_repos
+        :param repo: repo dict
+        :param file_urls: urls of the files to parse, None if the repo is skipped (see plan_repos)
+        :param stored: stored state of an updated repo, see plan_repos
+        """
+        self.sequence = sequence
+        self.offset = offset
+        self.repo = repo
+        self.file_urls = file_urls
+        self.stored = stored
+        self.downloads = []
+        self.results = []
+
+
+def plan_jobs(records, incremental=False, known=None):
+    """
+    Plans the repos of a source in batches (see plan_repos), the first stage of the pipeline of parse_repos.
+
+    :param records: iterable of (offset, repo dict) tuples
+    :param incremental: also plan updates of repos that have already been parsed
+    :param known: (optional) KnownUrls, read from the database if not given
+    :return: generator of RepoJob
+    """
+    if known is None:
+        known = KnownUrls.load()
+
+    records = iter(records)
+    sequence = 0
+    while True:
+        batch = list(islice(records, PLAN_BATCH))
+        if not batch:
+            return
+        # Decide upfront which repos and files are new, so that their files can be downloaded in the background
+        plans = plan_repos([repo for _, repo in batch], incremental, known)
+        for (offset, _), (repo, file_urls, stored) in zip(batch, plans):
+            yield RepoJob(sequence, offset, repo, file_urls, stored)
+            sequence += 1
+
+
+def fetch_job(fetcher, job):
+    """
+    Downloads the files of a repo. Failed downloads are passed on with their error.
+
+    :param fetcher: FileFetcher
+    :param job: RepoJob
+    :return: the job, with its downloads as (url, contents, error) tuples
+    """
+    if job.file_urls:
+        job.downloads = list(fetcher.fetch_all(job.file_urls, binary=True))
+    return job
+
+
+def parse_job(pool, recent, job):
+    """
+    Extracts the modules of the downloaded files of a repo, see extract_all.
 
-            for file, list_of_items in list_of_results:
-                # Skip if there was some error parsing the file
-                if file is None:
+    :param pool: (optional) ProcessPoolExecutor parsing the files
+    :param recent: RecentModules of the files parsed in this run
+    :param job: RepoJob
+    :return: the job, with its results as (url, modules, error, content hash) tuples
+    """
+    if job.downloads:
+        # files with the same contents as an already stored one (e.g. in forks) are not parsed again
+        job.results = list(extract_all(job.downloads, pool, 1, stored_modules=recent.lookup,
+                                       parse_cache=parse_cache))
+        job.downloads = []
+        for _, modules, _, digest in job.results:
+            if modules is not None:
+                recent.add(digest, modules)
+    return job
+
+
+class RecentModules:
+    """
+    Modules of the files parsed most recently, by content hash. The pipeline parses repos ahead of writing them, so
+    forks of a repo that has just been parsed would not find its items in the database yet (see stored_modules).
+    """
+
+    def __init__(self, size=256):
+        """
+        :param size: max. number of remembered files
+        """
+        self.size = size
+        self._modules = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, digest, modules):
+        with self._lock:
+            self._modules[digest] = modules
+            self._modules.move_to_end(digest)
+            while len(self._modules) > self.size:
+                self._modules.popitem(last=False)
+
+    def lookup(self, digest):
+        """
+        Looks up the modules of a file parsed in this run, otherwise of a stored file (see stored_modules).
+
+        :param digest: content hash of the file
+        :return: list of module tuples or None
+        """
+        with self._lock:
+            modules = self._modules.get(digest)
+        return modules if modules is not None else stored_modules(digest)
+
+
+def job_results(job):
+    """
+    Collects the files of a repo that have been parsed successfully. Files that could not be parsed are logged and
+    skipped.
+
+    :param job: RepoJob
+    :return: list of (file url, module tuples, content hash)
+    :raises ConnectionError: if a file could not be downloaded, e.g. because the rate limit has been reached
+    """
+    # Save files and items in lists, only add to DB if all files of a repo have been parsed
+    # as to not lose any in case we reach the rate limit
+    list_of_results = []
+    for file_url, modules, error, digest in job.results:
+        try:
+            if error is not None:
+                raise error
+            list_of_results.append((file_url, modules, digest))
+        except IndexError as e:
+            logger.error(f"Error parsing file, skipping... Error message: {e}")
+        except AssertionError:
+            logger.warning("File could not be parsed, skipping...")
+        except TypeError:
+            logger.warning("File does not contain any modules, skipping...")
+        except FileNotFoundError:
+            logger.warning("File can not be found anymore, skipping...")
+        except ValueError as e:
+            # e.g. UnicodeDecodeError or a broken S-expression
+            logger.warning(f"File could not be read, skipping... Error message: {e}")
+        except ConnectionError as e:
+            logger.error(f"GitHub returned error: {e}")
+            raise e
+    return list_of_results
+
+
+def write_jobs(jobs, known=None):
+    """
+    Stores a batch of parsed repos in a single transaction. If a file of a repo could not be downloaded, the repos
+    before it are stored and the error is raised.
+
+    :param jobs: list of RepoJob
+    :param known: (optional) KnownUrls the stored repos and files are added to
+    :return: (written jobs, number of stored files) tuple. The written jobs include the skipped repos
+    """
+    written = []
+    error = None
+    for job in jobs:
+        logger.info(f"Fetching info for repo url: {job.repo['repo_url']}")
+        if job.file_urls is None:
+            logger.warning("Repository has already been parsed, skipping...")
+            written.append((job, None))
+            continue
+        try:
+            written.append((job, job_results(job)))
+        except ConnectionError as e:
+            error = e
+            break
+
+    num_of_files = 0
+    if any(list_of_results is not None for _, list_of_results in written):
+        session = Session()
+        try:
+            for job, list_of_results in written:
+                if list_of_results is None:
                     continue
+                if job.stored is None:
+                    insert_repo(session, job.repo, list_of_results)
+                else:
+                    apply_repo_update(session, job.repo, job.stored, list_of_results)
+                num_of_files += len(list_of_results)
+
+            # invalidate cached search results
+            bump_generation(session)
+            session.commit()
+        except BaseException:
+            session.rollback()
+            raise
+        finally:
+            session.close()
 
-                file.repo_id = repo_new.id
-                session.add(file)
-                session.commit()
+    if known is not None:
+        for job, list_of_results in written:
+            if list_of_results is not None:
+                known.stored(job.repo, list_of_results, job.stored)
 
-                for item in list_of_items:
-                    item.file_id = file.id
-                    session.add(item)
-                    try:
-                        session.commit()
-                    except InterfaceError as e:
-                        session.rollback()
-                        logger.error(f"Could not insert item, probably due to a formatting error in the KiCad file. "
-                                     f"Proceeding... Error message: {e}")
+    if error is not None:
+        raise error
+    return [job for job, _ in written], num_of_files
 
+
+def insert_repo(session, repo, list_of_results):
+    """
+    Inserts a repo together with its files and items, without committing. The items of all files are inserted at once
+    (executemany).
+
+    :param session: database session
+    :param repo: repo from the pickle file
+    :param list_of_results: list of (file url, module tuples, content hash) of the parsed files
+    :return: number of inserted items
+    """
+    # repos of sources without stars and forks (see repo_values) start with 0
+    values = dict({"stars": 0, "forks": 0}, **repo_values(repo))
+    repo_id = session.execute(Repo.__table__.insert().values(
+        repo_url=repo['repo_url'], repo_uuid=str(uuid.uuid4()), **values
+    )).inserted_primary_key[0]
+
+    item_rows = []
+    for file_url, modules, digest in list_of_results:
+        file_id = session.execute(File.__table__.insert().values(
+            url=file_url, uuid=str(uuid.uuid4()), repo_id=repo_id, content_hash=digest,
+            sha=repo.get('kicad_shas', {}).get(file_url)
+        )).inserted_primary_key[0]
+        item_rows.extend(file_item_rows(file_id, modules))
+
+    if item_rows:
+        session.execute(Item.__table__.insert(), item_rows)
+    return len(item_rows)
+
+
+def apply_repo_update(session, repo, stored, list_of_results):
+    """
+    Updates an already parsed repo (see plan_repos), without committing: the repo information (e.g. stars and forks)
+    is updated in place, the items of changed files are replaced and files that have been removed from the repo are
+    deleted together with their items. Files whose contents have not changed are left as they are.
+
+    :param session: database session
+    :param repo: repo from the pickle file
+    :param stored: stored state of the repo, see plan_repos
+    :param list_of_results: list of (file url, module tuples, content hash) of the re-parsed files
+    :return: number of inserted items
+    """
+    shas = repo.get('kicad_shas', {})
+    session.execute(Repo.__table__.update().where(Repo.id == stored["id"]).values(**repo_values(repo)))
+
+    item_rows = []
+    for file_url, modules, digest in list_of_results:
+        if file_url not in stored["files"]:
+            file_id = session.execute(File.__table__.insert().values(
+                url=file_url, uuid=str(uuid.uuid4()), repo_id=stored["id"], content_hash=digest,
+                sha=shas.get(file_url)
+            )).inserted_primary_key[0]
         else:
-            logger.warning("Repository has already been parsed, skipping...")
+            file_id, _, stored_hash = stored["files"][file_url]
+            session.execute(File.__table__.update().where(File.id == file_id).values(
+                content_hash=digest, sha=shas.get(file_url)))
+            if digest == stored_hash:
+                logger.info(f"File {file_url} has not changed, keeping its items")
+                continue
+            session.execute(Item.__table__.delete().where(Item.file_id == file_id))
+        item_rows.extend(file_item_rows(file_id, modules))
+
+    if item_rows:
+        session.execute(Item.__table__.insert(), item_rows)
+
+    if stored["removed"]:
+        logger.info(f"Deleting {len(stored['removed'])} files that have been removed from the repo")
+        session.execute(Item.__table__.delete().where(Item.file_id.in_(stored["removed"])))
+        session.execute(File.__table__.delete().where(File.id.in_(stored["removed"])))
+    return len(item_rows)
+
+
+def repo_values(repo):
+    """
+    Reads the columns of the repos table from a repo of the pickle file. The description, stars, forks and pushed_at
+    are only read if the repo has them: sources that do not know them (e.g. local repos, see libs/local_repos.py)
+    leave them out, so that updates keep the stored values.
+
+    :param repo: repo from the pickle file
+    :return: dict of column values (w/o url and uuid)
+    """
+    values = {
+        "name": repo['repo_name'], "readme": repo['repo_readme'], "readme_url": repo['repo_readme_url'],
+        "license": repo['repo_license'], "license_url": repo['repo_license_url']
+    }
+    if 'repo_description' in repo:
+        values["description"] = repo['repo_description']
+    if 'forks' in repo:
+        values["forks"] = int(repo['forks'])
+    if 'stars' in repo:
+        values["stars"] = int(repo['stars'])
+    if 'pushed_at' in repo:
+        values["pushed_at"] = repo['pushed_at']
+    return values
+
+
+def file_item_rows(file_id, modules):
+    """
+    Converts the modules of a file to rows of the items table, skipping the ones that can not be stored.
+
+    :param file_id: id of the file
+    :param modules: list of module tuples (see MODULE_FIELDS)
+    :return: list of dicts of column values
+    """
+    rows = []
+    for module in modules:
+        row = item_row(module)
+        if row is None:
+            logger.error(f"Could not insert item, probably due to a formatting error in the KiCad file. "
+                         f"Proceeding... Module: {module}")
+            continue
+        row["file_id"] = file_id
+        rows.append(row)
+    return rows
+
+
+def item_row(module):
+    """
+    Validates an extracted module and converts it to a row of the items table. Numbers (KiCad writes e.g. values like
+    7805 without quotes) are stored as text, modules with other non-text fields are rejected.
+
+    :param module: module tuple (see MODULE_FIELDS)
+    :return: dict of column values or None if the module can not be stored
+    """
+    row = {"uuid": str(uuid.uuid4())}
+    for column, field in zip(ITEM_COLUMNS, module):
+        if isinstance(field, (int, float)) and not isinstance(field, bool):
+            field = str(field)
+        elif field is not None and not isinstance(field, str):
+            return None
+        row[column] = field
+    return row
+
+
+class KnownUrls:
+    """
+    URLs of the stored repos and files, read with one query each, so that checking whether a repo or a file has
+    already been parsed does not need a database round trip. Has to be updated for every stored repo (see stored()).
+    Also remembers the repos and files planned in this run, which may still be in flight.
+    """
+
+    def __init__(self, repos, files):
+        """
+        :param repos: set of repo urls
+        :param files: set of file urls
+        """
+        self.repos = repos
+        self.files = files
+        self.planned_repos = set()
+        self.planned_files = set()
+
+    @classmethod
+    def load(cls):
+        """
+        Reads the URLs of all stored repos and files.
+
+        :return: KnownUrls
+        """
+        session = Session()
+        try:
+            return cls({url for url, in session.query(Repo.repo_url)}, {url for url, in session.query(File.url)})
+        finally:
+            session.close()
+
+    def stored(self, repo, list_of_results, stored=None):
+        """
+        Updates the URLs after a repo has been stored (see insert_repo and apply_repo_update).
+
+        :param repo: repo from the pickle file
+        :param list_of_results: list of (file url, module tuples, content hash) of the stored files
+        :param stored: stored state of an updated repo, see plan_repos
+        :return: Nothing
+        """
+        self.repos.add(repo['repo_url'])
+        self.files.update(file_url for file_url, _, _ in list_of_results)
+        if stored is not None:
+            removed = set(stored["removed"])
+            self.files.difference_update(url for url, (file_id, _, _) in stored["files"].items() if file_id in removed)
+
+
+def plan_repos(list_of_repos, incremental=False, known=None):
+    """
+    Determines which repos of the list have not been parsed yet and which of their files are new.
+
+    In incremental mode, repos that have already been parsed are compared to what is stored: repos without changes
+    (same pushed_at, files, stars and forks) are skipped, for repos that have not been pushed to since only the repo
+    information is updated. Otherwise the added files and the files whose git blob SHA differs are parsed again, files
+    that are no longer in the repo are removed. Files without SHA (e.g. in pickle files of older crawlers) are
+    downloaded again, unchanged ones are then recognised by their content hash.
+
+    :param list_of_repos: repos from the pickle file
+    :param incremental: also plan updates of repos that have already been parsed
+    :param known: (optional) KnownUrls, read from the database if not given
+    :return: list of (repo, file urls, stored) tuples. The file urls are None if the repo is skipped. stored is None
+             for new repos, otherwise a dict with the id of the stored repo, its files (url -> (id, sha, content hash))
+             and the ids of the removed files
+    """
+    if known is None:
+        known = KnownUrls.load()
+
+    session = Session()
+    plans = []
+
+    try:
+        for repo in list_of_repos:
+            repo_known = repo['repo_url'] in known.repos
+            if repo['repo_url'] in known.planned_repos or (repo_known and not incremental):
+                plans.append((repo, None, None))
+                continue
+            # TODO: Better to use one() and handle the exception
+            repo_found = session.query(Repo).filter_by(repo_url=repo['repo_url']).first() if repo_known else None
+            known.planned_repos.add(repo['repo_url'])
+
+            stored = None
+            not_pushed = False
+            if repo_found:
+                stored = stored_repo(session, repo_found, repo)
+                not_pushed = repo.get('pushed_at') is not None and repo.get('pushed_at') == repo_found.pushed_at
+                same_files = not stored["removed"] and all(url in stored["files"] for url in repo['kicad_urls'])
+                if same_files and not_pushed and \
+                        (repo_found.stars, repo_found.forks) == (int(repo['stars']), int(repo['forks'])):
+                    plans.append((repo, None, None))
+                    continue
+                # sources without pushed_at (e.g. local repos): unchanged if the SHAs of all files and the repo
+                # information are the same
+                if same_files and repo.get('pushed_at') is None and unchanged_repo(repo_found, stored, repo):
+                    plans.append((repo, None, None))
+                    continue
+
+            # If we already have downloaded the file do not do anything
+            file_urls = []
+            shas = repo.get('kicad_shas', {})
+            for file_url in repo['kicad_urls']:
+                if file_url in known.planned_files:
+                    continue
+                if stored is not None and file_url in stored["files"]:
+                    stored_sha = stored["files"][file_url][1]
+                    if not_pushed or (stored_sha is not None and stored_sha == shas.get(file_url)):
+                        continue
+                elif file_url in known.files:
+                    continue
+                known.planned_files.add(file_url)
+                file_urls.append(file_url)
+            plans.append((repo, file_urls, stored))
+    finally:
+        session.close()
+
+    return plans
+
+
+def unchanged_repo(repo_found, stored, repo):
+    """
+    Checks whether a repo is stored as it is: all of its files with the same git blob SHA and the same repo
+    information (see repo_values).
+
+    :param repo_found: the stored Repo
+    :param stored: stored state of the repo, see stored_repo
+    :param repo: repo from the pickle file
+    :return: True if nothing has to be updated
+    """
+    shas = repo.get('kicad_shas', {})
+    if any(shas.get(url) is None or stored["files"][url][1] != shas[url] for url in repo['kicad_urls']):
+        return False
+    return all(getattr(repo_found, column) == value for column, value in repo_values(repo).items())
+
+
+def stored_repo(session, repo_found, repo):
+    """
+    Reads the stored state of an already parsed repo (see plan_repos).
+
+    :param session: database session
+    :param repo_found: the stored Repo
+    :param repo: repo from the pickle file
+    :return: dict with the id, the files (url -> (id, sha, content hash)) and the ids of the files that are no longer
+             in the repo (removed)
+    """
+    files = {url: (file_id, sha, digest) for file_id, url, sha, digest in
+             session.query(File.id, File.url, File.sha, File.content_hash).filter(File.repo_id == str(repo_found.id))}
+    kicad_urls = set(repo['kicad_urls'])
+    removed = [file_id for url, (file_id, _, _) in files.items() if url not in kicad_urls]
+    return {"id": repo_found.id, "files": files, "removed": removed}
+
+
+def stored_modules(digest):
+    """
+    Looks up the modules of an already stored file with the given contents, so that identical files (e.g. in forks)
+    are only parsed once and share the same items.
+
+    :param digest: content hash of the file (see DownloadCache.content_hash)
+    :return: list of module tuples (see MODULE_FIELDS) or None if no file with these contents has been stored
+    """
+    session = Session()
+
+    try:
+        file = session.query(File.id).filter_by(content_hash=digest).order_by(File.id).first()
+        if file is None:
+            return None
+        rows = session.query(*(getattr(Item, column) for column in ITEM_COLUMNS)) \
+            .filter_by(file_id=file.id).order_by(Item.id).all()
+        return [tuple(row) for row in rows]
+    finally:
         session.close()
 
 
-def parse_file_from_url(file_url):
+def parse_file_from_url(file_url, known=None):
     """
     Parse a kicad file from a given URL.
 
     :param file_url: URL to fetch te file from
+    :param known: (optional) KnownUrls, to check whether the file has been parsed before without a database query
     :return: (files, items) touple. files represent information objects of files, and items vice versa.
     """
+    if known is not None:
+        if file_url in known.files:
+            return None, None
+        return parse_file_contents(file_url, file_fetcher.fetch(file_url, binary=True))
+
     session = Session()
 
     try:
@@ -168,102 +836,115 @@ def parse_file_from_url(file_url):
         if file:
             return None, None
         else:
-            logger.info(f"Fetching file via url {file_url}...")
-            resp = requests.get(url=file_url)
-
-            logger.info(f"No uuid for file {file_url} yet found. Assigning one...")
-            uid = str(uuid.uuid4())
-
-            file = File(url=file_url, uuid=uid)
-
-            if not resp.status_code == 200:
-                if resp.status_code == 404:
-                    logger.warning(f"File with url {file_url} could not be found, skipping...")
-                    raise FileNotFoundError(f"File with URL {file_url} can not be found...")
-                raise ConnectionError(f"Retrieval Exception. Cannot get data from {file_url}; status: "
-                                      f"{resp.status_code}; message: {resp.text} ")
-
-            logger.info("Fetching of file successful. Parsing to get included modules...")
-            try:
-                items = parse_kicad_file(resp.text)
-            except IndexError as e:
-                logger.error(f"Error parsing file, return none... Error message: {e}")
-                return None, None
+            contents = file_fetcher.fetch(file_url, binary=True)
     except Exception as e:
         logger.error(f"Error checking if file has been parsed before: {e}")
         raise e
     finally:
         session.close()
 
-    return file, items
+    return parse_file_contents(file_url, contents)
+
+
+def parse_file_contents(file_url, contents):
+    """
+    Parse the downloaded contents of a kicad file.
+
+    :param file_url: URL the file has been fetched from
+    :param contents: file contents (text or UTF-8 encoded bytes)
+    :return: (files, items) touple. files represent information objects of files, and items vice versa.
+    """
+    logger.info("Fetching of file successful. Parsing to get included modules...")
+    try:
+        modules = cached_extract_modules(contents)
+    except IndexError as e:
+        logger.error(f"Error parsing file, return none... Error message: {e}")
+        return None, None
+
+    return new_file(file_url, content_hash(contents)), build_items(modules)
+
+
+def new_file(file_url, digest=None):
+    """
+    Creates the file information object for a newly parsed file.
+
+    :param file_url: URL the file has been fetched from
+    :param digest: (optional) content hash of the file
+    :return: File
+    """
+    logger.info(f"No uuid for file {file_url} yet found. Assigning one...")
+    return File(url=file_url, uuid=str(uuid.uuid4()), content_hash=digest)
 
 
 def parse_kicad_file(contents):
     """
     Wrapper for reading pcb data out of text instead of file
 
-    :param contents: file contents
+    :param contents: file contents (text or UTF-8 encoded bytes)
     :return: item list
     """
-    logger.info(f"Start Parsing of file.")
-    pcb = KicadPCB.load_contents(contents)
+    return build_items(cached_extract_modules(contents))
 
-    logger.info("Started extraction")
 
-    if not hasattr(pcb, "module"):
-        logger.warning("WARNING: the read file does not seem to contain any relevant data")
-        return {}
+def extract_modules(contents):
+    """
+    Extracts the relevant modules of a KiCad file. Only returns plain tuples (see MODULE_FIELDS), so that it can run in
+    a worker process and the results can be sent back cheaply.
 
-    modules = []
+    :param contents: file contents (text or UTF-8 encoded bytes)
+    :return: list of module tuples
+    """
+    return filter_modules(read_modules(contents))
 
-    # Go through all modules in file
-    for module in pcb.module:
-        # Initialize. We need to do this as we would have problems later on (accessing the names would not be possible)
-        desc = None
-        tags = None
-        reference = None
-        value = None
 
-        # try to extract description
-        if hasattr(module, "descr"):
-            desc = module["descr"]
+def cached_extract_modules(contents, digest=None):
+    """
+    Like extract_modules, but the modules of the file are looked up in (and stored to) the parse cache first.
 
-        # try to extract tags
-        if hasattr(module, "tags"):
-            tags = module["tags"]
+    :param contents: file contents (text or UTF-8 encoded bytes)
+    :param digest: (optional) content hash of the contents, computed if not given
+    :return: list of module tuples
+    """
+    if parse_cache is None:
+        return extract_modules(contents)
 
-        # try to extract freetext fields
-        if hasattr(module, "fp_text"):
+    if digest is None:
+        digest = content_hash(contents)
+    modules = parse_cache.get(digest)
+    if modules is None:
+        modules = read_modules(contents)
+        parse_cache.put(digest, modules)
+    return filter_modules(modules)
 
-            # iterate over freetext fields
-            # Note: fp_text is part of KiCad for (free) text field in component
-            for fp_text in module["fp_text"]:
 
-                # if reference exists, save it
-                if fp_text[0] == "reference":
-                    reference = fp_text[1]
+def read_modules(contents):
+    """
+    Reads all modules of a KiCad file, before removing duplicate and common ones. This is the expensive part of the
+    extraction, which is run in the worker processes and whose results are kept in the parse cache.
 
-                # save value if it exists
-                elif fp_text[0] == "value":
-                    value = fp_text[1]
+    :param contents: file contents (text or UTF-8 encoded bytes)
+    :return: list of module tuples
+    """
+    logger.info(f"Start Parsing of file.")
+    try:
+        # fast path, skips everything but the modules
+        modules = scan_modules(contents)
+    except UnsupportedSexp as e:
+        logger.info(f"Falling back to the full parser: {e}")
+        modules = load_modules(contents)
+
+    return [tuple(module[field] for field in MODULE_FIELDS) for module in modules]
 
-                else:
-                    try:
-                        logger.warning(f"Ignoring field '{fp_text[0]}' with value '{fp_text[1]}'")
-                    except KeyError:
-                        # fp_text[0] or fp_text[1] are empty, just continue...
-                        pass
-                    pass
 
-        # save in data output
-        modules.append({
-            "module": module[0],
-            "descr": desc,
-            "tags": tags,
-            "reference": reference,
-            "value": value,
-            "item_uuid": str(uuid.uuid4())
-        })
+def filter_modules(modules):
+    """
+    Removes duplicate and common modules. The excluded values may change between runs, so this is not cached.
+
+    :param modules: list of module tuples
+    :return: list of module tuples
+    :raises TypeError: if no modules are left
+    """
+    modules = [dict(zip(MODULE_FIELDS, module)) for module in modules]
 
     # remove duplicate entries
     modules = deduplicate(modules)
@@ -271,93 +952,224 @@ def parse_kicad_file(contents):
     # Remove common symbols
     modules = clean_data(modules)
 
-    items = []
-    if modules:
-        for module in modules:
-            # Create item with all info that we currently have
-            item = Item(
-                uuid=module["item_uuid"],
-                module=module["module"],
-                description=module["descr"],
-                reference=module["reference"],
-                tags=module["tags"],
-                value=module["value"]
-            )
-            items.append(item)
-    else:
+    if not modules:
         raise TypeError("Modules are empty!")
     logger.info("Extraction done for pcb...")
 
+    return [tuple(module[field] for field in MODULE_FIELDS) for module in modules]
+
+
+def load_modules(contents):
+    """
+    Reads the modules of a KiCad file using the object model of the realthunder parser. The board is read
+    incrementally: each module is read as soon as it is closed and the other forms with sub forms (tracks, zones, ...)
+    are dropped right away, so only the largest of them has to fit into memory instead of the whole board. The rest of
+    the board is still checked by KicadPCB, so that broken boards raise the same errors as before.
+
+    :param contents: file contents (text or UTF-8 encoded bytes)
+    :return: list of module dicts
+    """
+    builder = SexpBuilder(depth=1)
+    modules = []
+    # forms of the board with atoms only, KicadPCB fails for some of them (e.g. zones without sub forms)
+    kept = []
+    # errors of reading the fields are raised after the board has been checked, as before
+    error = None
+
+    logger.info("Started extraction")
+
+    for sexp in builder.iterBuild(iterSexp(contents)):
+        if len(sexp) > 1 and sexp[1] == "module":
+            try:
+                module = KicadPCB_module(sexp)
+            except Exception as e:
+                # skipped by KicadPCB as well
+                logger.error(f"Error reading module: {e}")
+                continue
+            if error is None:
+                try:
+                    modules.append(module_fields(module))
+                except Exception as e:
+                    error = e
+        elif not any(isinstance(value, list) for value in sexp):
+            kept.append(sexp)
+
+    board = builder.result
+    if isinstance(board, list):
+        board.extend(kept)
+    KicadPCB(board)
+
+    if error is not None:
+        raise error
+    return modules
+
+
+def module_fields(module):
+    """
+    Reads the fields of a module.
+
+    :param module: KicadPCB_module
+    :return: module dict
+    """
+    # Initialize. We need to do this as we would have problems later on (accessing the names would not be possible)
+    desc = None
+    tags = None
+    reference = None
+    value = None
+
+    # try to extract description
+    if hasattr(module, "descr"):
+        desc = module["descr"]
+
+    # try to extract tags
+    if hasattr(module, "tags"):
+        tags = module["tags"]
+
+    # try to extract freetext fields
+    if hasattr(module, "fp_text"):
+
+        # iterate over freetext fields
+        # Note: fp_text is part of KiCad for (free) text field in component
+        for fp_text in module["fp_text"]:
+
+            # if reference exists, save it
+            if fp_text[0] == "reference":
+                reference = fp_text[1]
+
+            # save value if it exists
+            elif fp_text[0] == "value":
+                value = fp_text[1]
+
+            else:
+                try:
+                    logger.warning(f"Ignoring field '{fp_text[0]}' with value '{fp_text[1]}'")
+                except KeyError:
+                    # fp_text[0] or fp_text[1] are empty, just continue...
+                    pass
+                pass
+
+    return {
+        "module": module[0],
+        "descr": desc,
+        "tags": tags,
+        "reference": reference,
+        "value": value
+    }
+
+
+def build_items(modules):
+    """
+    Creates the items for extracted modules.
+
+    :param modules: list of module tuples (see MODULE_FIELDS)
+    :return: item list
+    """
+    items = []
+    for module, descr, tags, reference, value in modules:
+        # Create item with all info that we currently have
+        item = Item(
+            uuid=str(uuid.uuid4()),
+            module=module,
+            description=descr,
+            reference=reference,
+            tags=tags,
+            value=value
+        )
+        items.append(item)
     return items
 
 
-def clean_data(modules):
+def parse_pool(workers):
     """
-    Removes the items by common symbols (names) like R for resistors etc...
+    Creates the process pool for parsing. The workers are spawned instead of forked, as forking while the download
+    threads are running can leave locks held in the workers. The workers ignore CTRL+C.
 
-    :param modules: the data to be cleaned
-    :return: the cleaned data
+    :param workers: number of processes
+    :return: ProcessPoolExecutor
     """
-    # test if items are empty
-
-    excluded_symbols = [
-        r"R",  # Resistors
-        r"D",  # Diode
-        r"C",  # Capacitors
-        r"L",  # Inductors
-        r"F",  # Fuse
-        r"P",  # pins
-        r"S", r"SW",  # Switch
-        r"TP",  # Test pads
-        r"G",  # Graphics
-        r"J",  # Jacks
-        r"FID",  # Fiducial Markers (Reference Points)
-        r"M",  # Mounting Holes/Points
-        r"CON",  # Connectors
-        r"REF",  # Reference points
-        r"BT",  # Batteries
-    ]
-
-    common_components = [
-        r"^\d*\.?\d*K$",  # Resistors
-        r"^\d*\.?\d*M$",  # Resistors
-        r"^\d*\.?\d*Mhz$",  # Crystals
-        r"^conn_.*$",  # Connections
-        r"^symbol_.*$",  # Something to be printed
-        r"^resistor_.*$",  # Resistors
-        r"^potentiometer_.*$",  # Potentiometers
-        r"^gauge_.*$"  # Gauges
-    ]
-
-    common_comp_regex = "(" + ")|(".join(common_components) + ")"
-
-    EXCLUDED_VALUES_FILE = "excluded_values.txt"
-    if os.path.exists(EXCLUDED_VALUES_FILE):
-        with open('excluded_values.txt', 'r') as f:
-            excluded_values = f.read().splitlines()
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                               initializer=_ignore_interrupt)
+
+
+def _ignore_interrupt():
+    # the terminal sends CTRL+C to the whole process group, the workers keep parsing and leave it to the main process
+    # whether the files in flight are stored or the run is aborted (see _drain_on_interrupt)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
 
-    logger.debug("\t-> Removing by pattern...")
 
-    if len(excluded_symbols) == 0:
-        return modules
+def extract_all(downloads, pool=None, workers=1, stored_modules=None, parse_cache=None):
+    """
+    Extracts the modules of downloaded files. With a process pool, the files are parsed in parallel ahead of the
+    consumer, otherwise one after another in this process.
+
+    :param downloads: iterable of (url, contents, error) tuples, see FileFetcher.fetch_all
+    :param pool: (optional) ProcessPoolExecutor
+    :param workers: number of processes of the pool
+    :param stored_modules: (optional) function returning the modules of already stored files by content hash (or
+                           None), these files are not parsed again
+    :param parse_cache: (optional) ParseCache of the modules read from files, consulted before parsing a file
+    :return: generator of (url, modules, error, content hash) tuples in the order of the downloads
+    """
+    pending = deque()
+    try:
+        for url, contents, error in downloads:
+            digest = None
+            modules = None
+            read = None
+            if error is None:
+                digest = content_hash(contents)
+                if stored_modules is not None:
+                    modules = stored_modules(digest)
+                    if modules is not None:
+                        logger.info(f"File {url} has already been parsed under another URL, sharing its items")
+                if modules is None and parse_cache is not None:
+                    read = parse_cache.get(digest)
+
+            if pool is None:
+                yield _extracted(url, None, modules, read, error, digest, parse_cache, contents)
+                continue
+
+            if error is None and modules is None and read is None:
+                # memory-mapped contents can not be sent to a worker process, only their bytes
+                future = pool.submit(read_modules, bytes(contents) if isinstance(contents, mmap.mmap) else contents)
+            else:
+                future = None
+            pending.append((url, future, modules, read, error, digest, parse_cache))
+            if len(pending) >= PARSE_AHEAD * workers:
+                yield _extracted(*pending.popleft())
+
+        while pending:
+            yield _extracted(*pending.popleft())
+    finally:
+        for _, future, _, _, _, _, _ in pending:
+            if future is not None:
+                future.cancel()
 
-    # Build pattern
-    pattern = r"^["
-    for symbol in excluded_symbols:
-        pattern += symbol.upper()
-        pattern += symbol.lower()
-    pattern += r"]{1,3}[\d:\*]+$"
 
-    logger.debug(f"Exclude with pattern {pattern}")
+def _extracted(url, future, modules, read, error, digest, parse_cache, contents=None):
+    if error is not None:
+        return url, None, error, digest
+    if modules is not None:
+        return url, modules, None, digest
+    try:
+        if read is None:
+            read = future.result() if future is not None else read_modules(contents)
+            if parse_cache is not None:
+                parse_cache.put(digest, read)
+        return url, filter_modules(read), None, digest
+    except Exception as e:
+        return url, None, e, digest
 
-    cleaned_modules = [module for module in modules if not re.match(pattern, module["reference"])
-                       and not re.match(common_comp_regex, module['value'], re.IGNORECASE)]
 
-    result = [module for module in cleaned_modules if
-              isinstance(module["value"], str) and not module['value'].upper() in
-              (value.upper() for value in excluded_values)]
+def clean_data(modules):
+    """
+    Removes the items by common symbols (names) like R for resistors etc...
 
-    return result
+    :param modules: the data to be cleaned
+    :return: the cleaned data
+    """
+    logger.debug("\t-> Removing by pattern...")
+    return module_filter.clean(modules)
 
 
 def deduplicate(modules):
@@ -368,15 +1180,7 @@ def deduplicate(modules):
     :return: module list w/o duplicates
     """
     logger.debug("\t-> Removing duplicates...")
-    seen = []
-    reduced = []
-
-    for module in modules:
-        if (module['module'], module['value']) not in seen:
-            reduced.append(module)
-            seen.append((module['module'], module['value']))
-
-    return reduced
+    return module_filter.deduplicate(modules)
 
 
 if __name__ == "__main__":
@@ -385,16 +1189,37 @@ if __name__ == "__main__":
                                                  'replaced after each found, so already found items are forgotten.')
     parser.add_argument('--pickle', "-p", type=str, nargs="?",
                         help='uses a pickle file')
+    parser.add_argument('--log', "-l", type=str, nargs="?",
+                        help='uses a crawl log of the crawler (repos.jsonl)')
+    parser.add_argument('--directory', "-d", type=str, nargs="?",
+                        help='uses a local directory of one or more (e.g. mirrored) repos')
+    parser.add_argument('--git', "-g", type=str, nargs="+",
+                        help='makes shallow clones of the given git repos and uses them')
+    parser.add_argument('--workers', "-w", type=int, default=1,
+                        help='number of processes parsing the KiCad files (default: 1)')
+    parser.add_argument('--incremental', "-i", action='store_true',
+                        help='updates repos that have already been parsed and changed since')
+    parser.add_argument('--restart', action='store_true',
+                        help='starts with the first repo instead of resuming the last run')
     args = parser.parse_args()
 
-    if args.pickle is None:
-        print("Error: you need to at least specify one source (pickle)")
+    if args.pickle is None and args.log is None and args.directory is None and args.git is None:
+        print("Error: you need to at least specify one source (pickle, crawl log, directory or git repos)")
         exit()
 
     else:
-        if args.pickle is not None:
-            try:
-                parse_repos_from_pickle_file(args.pickle)
-            except RateLimitException:
-                logger.warning("Stopping parser since the ratelimit for today has been reached...")
-                exit(0)
+        init_parser()
+        try:
+            if args.log is not None:
+                parse_repos_from_crawl_log(args.log, workers=args.workers, incremental=args.incremental,
+                                           restart=args.restart)
+            if args.pickle is not None:
+                parse_repos_from_pickle_file(args.pickle, workers=args.workers, incremental=args.incremental,
+                                             restart=args.restart)
+            if args.directory is not None:
+                parse_repos_from_directory(args.directory, workers=args.workers, incremental=args.incremental)
+            if args.git is not None:
+                parse_repos_from_git(args.git, workers=args.workers, incremental=args.incremental)
+        except RateLimitException:
+            logger.warning("Stopping parser since the ratelimit for today has been reached...")
+            exit(0)
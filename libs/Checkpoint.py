@@ -0,0 +1,97 @@
+import json
+import logging
+import os
+import tempfile
+
+logger = logging.getLogger("Checkpoint")
+
+
+class Checkpoint:
+    """
+    Remembers how far the records of a source (e.g. a crawl log) have been processed, so that an interrupted run can
+    resume there instead of checking all earlier records again. The offset is only advanced for records that have been
+    fully committed and written every interval records (and when the run ends), a lagging checkpoint only means that a
+    few records are looked at twice. The file is replaced atomically, so a killed process leaves the previous
+    checkpoint behind.
+    """
+
+    def __init__(self, path, interval=50):
+        """
+        :param path: path of the checkpoint file
+        :param interval: number of advanced records after which the checkpoint is written
+        """
+        self.path = path
+        self.interval = interval
+        self.offset = 0
+        self.fingerprint = None
+        self._unsaved = 0
+
+    def load(self, fingerprint=None):
+        """
+        Reads the checkpoint.
+
+        :param fingerprint: (optional) identifies the version of the source, e.g. size and modification time of a file
+                            that is rewritten as a whole. The checkpoint is ignored if it was written for another one
+        :return: offset to resume at (0 if there is no valid checkpoint)
+        """
+        self.fingerprint = fingerprint
+        self.offset = 0
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable checkpoint {self.path}: {e}")
+            return 0
+
+        # as read back from JSON, e.g. tuples become lists
+        if state.get("fingerprint") != json.loads(json.dumps(fingerprint)):
+            logger.info(f"Ignoring checkpoint {self.path}, the source has changed")
+            return 0
+        self.offset = state.get("offset", 0)
+        return self.offset
+
+    def advance(self, offset):
+        """
+        Records that all records up to the given offset have been committed.
+
+        :param offset: offset after the last committed record
+        :return: Nothing
+        """
+        self.offset = offset
+        self._unsaved += 1
+        if self._unsaved >= self.interval:
+            self.save()
+
+    def save(self):
+        """
+        Writes the checkpoint, if it has been advanced since it was last written.
+
+        :return: Nothing
+        """
+        if not self._unsaved:
+            return
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        try:
+            handle, temporary = tempfile.mkstemp(dir=directory, prefix=".checkpoint")
+            with os.fdopen(handle, "w") as f:
+                json.dump({"offset": self.offset, "fingerprint": self.fingerprint}, f)
+            os.replace(temporary, self.path)
+            self._unsaved = 0
+        except OSError as e:
+            logger.warning(f"Could not write checkpoint {self.path}: {e}")
+
+    def reset(self):
+        """
+        Removes the checkpoint, the next run starts at the beginning.
+
+        :return: Nothing
+        """
+        self.offset = 0
+        self._unsaved = 0
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,139 @@
+import hashlib
+import json
+import logging
+import mmap
+import os
+import tempfile
+from libs.SqliteStore import SqliteStore
+
+logger = logging.getLogger("DownloadCache")
+
+
+def content_hash(contents):
+    """
+    Hash identifying the contents of a file.
+
+    :param contents: file contents (bytes, text is encoded as UTF-8)
+    :return: hex SHA-256 of the contents
+    """
+    if isinstance(contents, str):
+        contents = contents.encode("utf-8")
+    return hashlib.sha256(contents).hexdigest()
+
+
+def map_file(path):
+    """
+    Maps a file into memory (read only). Its pages are read when they are accessed, e.g. by the tokenizer, instead of
+    copying the whole file first.
+
+    :param path: path of the file
+    :return: mmap of the contents (bytes-like), bytes for an empty file, which can not be mapped
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class DownloadCache:
+    """
+    On-disk cache of downloaded files. The contents are stored once per content hash, so identical files found under
+    many URLs (e.g. in forks) are only stored once. An index maps every URL to the hash of its last contents and the
+    validators of the response (ETag, Last-Modified), which are sent along with the next request of the URL, so that
+    unchanged files are answered with 304 Not Modified instead of being downloaded again. The index is a SqliteStore
+    without a size limit, contents that can not be read or written are skipped like a missing index entry.
+    """
+
+    def __init__(self, directory):
+        """
+        :param directory: directory of the cache, created when the first file is stored
+        """
+        self.directory = directory
+        self._index = SqliteStore(os.path.join(directory, "index.sqlite"), "urls", "Download cache")
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        Creates the cache configured by Cache-Dir in the FETCHER section of the config.
+
+        :param config: ConfigParser of the parser config
+        :return: DownloadCache or None if no cache is configured
+        """
+        if not config.has_section("FETCHER") or not config["FETCHER"].get("Cache-Dir"):
+            return None
+        return cls(config["FETCHER"]["Cache-Dir"])
+
+    def _path(self, digest):
+        return os.path.join(self.directory, "objects", digest[:2], digest)
+
+    def _entry(self, url):
+        # (content hash, etag, last modified) of the URL or None
+        value = self._index.get(url)
+        return json.loads(value) if value is not None else None
+
+    def validators(self, url):
+        """
+        Headers for a conditional request of a cached URL.
+
+        :param url: URL of the file
+        :return: dict of If-None-Match and/or If-Modified-Since headers (empty if the URL is not cached)
+        """
+        entry = self._entry(url)
+        headers = {}
+        if entry is not None and os.path.exists(self._path(entry[0])):
+            if entry[1]:
+                headers["If-None-Match"] = entry[1]
+            if entry[2]:
+                headers["If-Modified-Since"] = entry[2]
+        return headers
+
+    def get(self, url):
+        """
+        Reads the cached contents of a URL.
+
+        :param url: URL of the file
+        :return: contents as memory-mapped bytes (see map_file) or None if not cached
+        """
+        entry = self._entry(url)
+        if entry is None:
+            return None
+        try:
+            return map_file(self._path(entry[0]))
+        except (OSError, ValueError) as e:
+            logger.warning(f"Cached contents of {url} not available: {e}")
+            return None
+
+    def put(self, url, contents, etag=None, last_modified=None):
+        """
+        Stores the downloaded contents of a URL.
+
+        :param url: URL of the file
+        :param contents: contents as bytes
+        :param etag: ETag header of the response
+        :param last_modified: Last-Modified header of the response
+        :return: content hash of the contents
+        """
+        digest = content_hash(contents)
+        try:
+            path = self._path(digest)
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                # written to a temporary file first, so that a killed parser does not leave a partial file behind
+                handle, temporary = tempfile.mkstemp(dir=os.path.dirname(path))
+                with os.fdopen(handle, "wb") as f:
+                    f.write(contents)
+                os.replace(temporary, path)
+        except OSError as e:
+            logger.warning(f"Could not cache {url}: {e}")
+            return digest
+
+        self._index.put(url, json.dumps([digest, etag, last_modified]))
+        return digest
+
+    def close(self):
+        """
+        Closes the index.
+
+        :return: Nothing
+        """
+        self._index.close()
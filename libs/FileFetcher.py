@@ -0,0 +1,159 @@
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from libs.DownloadCache import DownloadCache
+
+logger = logging.getLogger("FileFetcher")
+
+# Responses that are worth another try (rate limits and server errors)
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+class FileFetcher:
+    """
+    Downloads files concurrently. All downloads share one HTTP session, so connections are kept alive and reused.
+    The number of parallel downloads is limited in total and per host. Rate limited (429) and failed (5xx) requests are
+    retried with exponential backoff, honouring the Retry-After header of the server. With a DownloadCache, files are
+    requested conditionally and unchanged files (304 Not Modified) are read from the cache.
+    """
+
+    def __init__(self, workers=8, per_host=4, retries=3, backoff=0.5, timeout=30, cache=None):
+        """
+        :param workers: max. number of parallel downloads
+        :param per_host: max. number of parallel downloads from the same host
+        :param retries: max. number of retries of a single download
+        :param backoff: backoff factor in seconds (waits backoff, 2 * backoff, 4 * backoff, ... between retries)
+        :param timeout: timeout for connecting and reading in seconds
+        :param cache: (optional) DownloadCache
+        """
+        self.workers = workers
+        self.per_host = per_host
+        self.timeout = timeout
+        self.cache = cache
+        # number of downloaded files and of unchanged files read from the cache
+        self.downloaded = 0
+        self.not_modified = 0
+
+        retry = Retry(total=retries, backoff_factor=backoff, status_forcelist=RETRY_STATUS_CODES,
+                      respect_retry_after_header=True, raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="FileFetcher")
+        self._host_limits = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        Creates a fetcher with the settings of the FETCHER section of the config (if present).
+
+        :param config: ConfigParser of the parser config
+        :return: FileFetcher
+        """
+        if not config.has_section("FETCHER"):
+            return cls()
+
+        section = config["FETCHER"]
+        return cls(workers=section.getint("Workers", 8), per_host=section.getint("Per-Host", 4),
+                   retries=section.getint("Retries", 3), backoff=section.getfloat("Backoff", 0.5),
+                   timeout=section.getfloat("Timeout", 30), cache=DownloadCache.from_config(config))
+
+    def _host_limit(self, url):
+        host = urlsplit(str(url)).netloc
+        with self._lock:
+            if host not in self._host_limits:
+                self._host_limits[host] = threading.BoundedSemaphore(self.per_host)
+            return self._host_limits[host]
+
+    def fetch(self, url, binary=False):
+        """
+        Downloads a single file.
+
+        :param url: URL of the file
+        :param binary: return the undecoded bytes of the response instead of text, memory-mapped if they are read from
+                       the cache (see DownloadCache.get)
+        :return: contents of the file as text (or bytes)
+        :raises FileNotFoundError: if the file does not exist (anymore)
+        :raises ConnectionError: if the server does not return the file (after all retries)
+        """
+        headers = self.cache.validators(url) if self.cache is not None else {}
+        with self._host_limit(url):
+            logger.info(f"Fetching file via url {url}...")
+            resp = self.session.get(url=url, timeout=self.timeout, headers=headers)
+
+            if resp.status_code == 304 and headers:
+                contents = self.cache.get(url)
+                if contents is not None:
+                    logger.info(f"File with url {url} has not been modified, using the cached contents")
+                    with self._lock:
+                        self.not_modified += 1
+                    return contents if binary else str(contents, "utf-8", errors="replace")
+                # the cached contents are gone, download them again
+                resp = self.session.get(url=url, timeout=self.timeout)
+
+        if not resp.status_code == 200:
+            if resp.status_code == 404:
+                logger.warning(f"File with url {url} could not be found, skipping...")
+                raise FileNotFoundError(f"File with URL {url} can not be found...")
+            raise ConnectionError(f"Retrieval Exception. Cannot get data from {url}; status: "
+                                  f"{resp.status_code}; message: {resp.text} ")
+        with self._lock:
+            self.downloaded += 1
+        if self.cache is not None:
+            self.cache.put(url, resp.content, resp.headers.get("ETag"), resp.headers.get("Last-Modified"))
+        return resp.content if binary else resp.text
+
+    def fetch_all(self, urls, binary=False):
+        """
+        Downloads many files concurrently. The results are returned in the order of the URLs, while the following
+        downloads continue in the background. Only a bounded number of downloads is started ahead of the consumer.
+
+        :param urls: iterable of URLs
+        :param binary: return the contents as bytes, see fetch()
+        :return: generator of (url, contents, error) tuples. error is the exception raised by fetch() or None
+        """
+        pending = deque()
+        try:
+            for url in urls:
+                pending.append((url, self._executor.submit(self.fetch, url, binary)))
+                if len(pending) >= 2 * self.workers:
+                    yield self._result(*pending.popleft())
+
+            while pending:
+                yield self._result(*pending.popleft())
+        finally:
+            # the consumer stopped early, do not download the rest
+            for _, future in pending:
+                future.cancel()
+
+    @staticmethod
+    def _result(url, future):
+        try:
+            return url, future.result(), None
+        except Exception as e:
+            return url, None, e
+
+    def close(self):
+        """
+        Stops the download threads and closes all connections.
+
+        :return: Nothing
+        """
+        self._executor.shutdown(wait=True)
+        self.session.close()
+        if self.cache is not None:
+            self.cache.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
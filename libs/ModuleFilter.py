@@ -0,0 +1,137 @@
+import logging
+import os
+import re
+
+logger = logging.getLogger("ModuleFilter")
+
+# References of common symbols
+EXCLUDED_SYMBOLS = [
+    r"R",  # Resistors
+    r"D",  # Diode
+    r"C",  # Capacitors
+    r"L",  # Inductors
+    r"F",  # Fuse
+    r"P",  # pins
+    r"S", r"SW",  # Switch
+    r"TP",  # Test pads
+    r"G",  # Graphics
+    r"J",  # Jacks
+    r"FID",  # Fiducial Markers (Reference Points)
+    r"M",  # Mounting Holes/Points
+    r"CON",  # Connectors
+    r"REF",  # Reference points
+    r"BT",  # Batteries
+]
+
+# Values of common components
+COMMON_COMPONENTS = [
+    r"^\d*\.?\d*K$",  # Resistors
+    r"^\d*\.?\d*M$",  # Resistors
+    r"^\d*\.?\d*Mhz$",  # Crystals
+    r"^conn_.*$",  # Connections
+    r"^symbol_.*$",  # Something to be printed
+    r"^resistor_.*$",  # Resistors
+    r"^potentiometer_.*$",  # Potentiometers
+    r"^gauge_.*$"  # Gauges
+]
+
+
+class ModuleFilter:
+    """
+    Removes duplicate and uninteresting modules (common symbols, common components and excluded values) of a KiCad file.
+    The patterns are compiled once and the excluded values are only read again when their file has been changed.
+    """
+
+    def __init__(self, excluded_values_file=None, excluded_symbols=EXCLUDED_SYMBOLS,
+                 common_components=COMMON_COMPONENTS):
+        """
+        :param excluded_values_file: (optional) file with values to exclude (one per row, case insensitive)
+        :param excluded_symbols: references of common symbols to exclude
+        :param common_components: patterns of values of common components to exclude
+        """
+        self.excluded_values_file = excluded_values_file
+
+        # e.g. ^[RrDd...]{1,3}[\d:\*]+$ matching R1, C12, SW3 or FID1
+        pattern = "^[" + "".join(symbol.upper() + symbol.lower() for symbol in excluded_symbols) + r"]{1,3}[\d:\*]+$"
+        self.reference_regex = re.compile(pattern) if excluded_symbols else None
+        self.value_regex = re.compile("(" + ")|(".join(common_components) + ")", re.IGNORECASE)
+
+        self._excluded_values = frozenset()
+        self._mtime = None
+
+    @property
+    def excluded_values(self):
+        """
+        Upper case values to exclude, re-read if the file has been changed since.
+        """
+        if self.excluded_values_file is None:
+            return self._excluded_values
+
+        try:
+            mtime = os.stat(self.excluded_values_file).st_mtime_ns
+        except OSError:
+            mtime = None
+
+        if mtime != self._mtime:
+            self._mtime = mtime
+            if mtime is None:
+                logger.warning(f"File {self.excluded_values_file} not found, no values are excluded")
+                self._excluded_values = frozenset()
+            else:
+                with open(self.excluded_values_file, 'r') as f:
+                    self._excluded_values = frozenset(value.upper() for value in f.read().splitlines())
+                logger.info(f"Loaded {len(self._excluded_values)} excluded values")
+        return self._excluded_values
+
+    def deduplicate(self, modules):
+        """
+        Removes duplicate modules (same name and value), keeping the first one.
+
+        :param modules: list of module dicts
+        :return: module list w/o duplicates
+        """
+        seen = set()
+        # values that can not be hashed (e.g. multiple atoms) are compared one by one
+        seen_unhashable = []
+        reduced = []
+
+        for module in modules:
+            key = (module['module'], module['value'])
+            try:
+                if key in seen:
+                    continue
+                seen.add(key)
+            except TypeError:
+                if key in seen_unhashable:
+                    continue
+                seen_unhashable.append(key)
+            reduced.append(module)
+
+        return reduced
+
+    def clean(self, modules):
+        """
+        Removes the modules of common symbols (by reference), common components (by value) and excluded values.
+        Modules without a text value are removed as well.
+
+        :param modules: list of module dicts
+        :return: the cleaned module list
+        """
+        if self.reference_regex is None:
+            return modules
+
+        reference_match = self.reference_regex.match
+        value_match = self.value_regex.match
+        # like re.match, raises a TypeError for references or values that are not text
+        cleaned_modules = [module for module in modules if not reference_match(module["reference"])
+                           and not value_match(module["value"])]
+
+        excluded_values = self.excluded_values
+        return [module for module in cleaned_modules
+                if isinstance(module["value"], str) and module["value"].upper() not in excluded_values]
+
+    def __call__(self, modules):
+        """
+        Removes duplicates first, then cleans the modules (see deduplicate() and clean()).
+        """
+        return self.clean(self.deduplicate(modules))
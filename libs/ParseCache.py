@@ -0,0 +1,93 @@
+import json
+import logging
+import threading
+import zlib
+from libs.SqliteStore import SqliteStore
+
+logger = logging.getLogger("ParseCache")
+
+# Incremented whenever the extracted modules change for the same contents (e.g. a fix of the tokenizer), so that
+# results of older versions of the parser are not used anymore
+FORMAT_VERSION = 1
+
+
+class ParseCache:
+    """
+    Persistent cache of the modules extracted from KiCad files, keyed by the content hash of the file. The same board
+    is often found under many URLs (forks, vendored copies), with the cache it is only tokenized once. The modules are
+    stored as zlib compressed JSON arrays in a SqliteStore, which evicts the least recently used entries once the
+    summed size exceeds max_bytes.
+    """
+
+    def __init__(self, path, max_bytes=256 * 1024 * 1024):
+        """
+        :param path: path of the SQLite file, created when it is first used
+        :param max_bytes: max. summed size of the stored (compressed) entries
+        """
+        self.hits = 0
+        self.misses = 0
+        self._store = SqliteStore(path, "modules", "Parse cache", max_bytes=max_bytes)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        Creates the cache configured by Path and Max-Size (in MB) in the PARSE_CACHE section of the config.
+
+        :param config: ConfigParser of the parser config
+        :return: ParseCache or None if no cache is configured
+        """
+        if not config.has_section("PARSE_CACHE") or not config["PARSE_CACHE"].get("Path"):
+            return None
+        section = config["PARSE_CACHE"]
+        return cls(section["Path"], max_bytes=int(section.getfloat("Max-Size", 256) * 1024 * 1024))
+
+    @property
+    def hit_rate(self):
+        """
+        Share of the lookups that have been answered by the cache (0 without lookups).
+        """
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def get(self, content_hash):
+        """
+        Looks up the modules of a file.
+
+        :param content_hash: content hash of the file (see DownloadCache.content_hash)
+        :return: list of module tuples or None if not cached
+        """
+        value = self._store.get(content_hash, version=FORMAT_VERSION)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        try:
+            return [tuple(module) for module in json.loads(zlib.decompress(value))]
+        except (zlib.error, ValueError) as e:
+            logger.warning(f"Cached modules of {content_hash} can not be read: {e}")
+            return None
+
+    def put(self, content_hash, modules):
+        """
+        Stores the modules of a file.
+
+        :param content_hash: content hash of the file
+        :param modules: list of module tuples (text, numbers, None or lists of them)
+        :return: Nothing
+        """
+        try:
+            value = zlib.compress(json.dumps(modules, separators=(",", ":")).encode("utf-8"))
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Modules of {content_hash} can not be cached: {e}")
+            return
+        self._store.put(content_hash, value, version=FORMAT_VERSION)
+
+    def close(self):
+        """
+        Closes the SQLite file.
+
+        :return: Nothing
+        """
+        self._store.close()
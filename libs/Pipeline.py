@@ -0,0 +1,279 @@
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger("Pipeline")
+
+# Marks the end of the items in a queue
+_DONE = object()
+
+
+class Stage:
+    """
+    Step of a Pipeline, run by width threads. Items are passed on in the order in which they are finished, which
+    differs from the input order for stages with more than one thread.
+    """
+
+    def __init__(self, name, function, width=1):
+        """
+        :param name: name of the stage, e.g. for the stats
+        :param function: called with each item, returns the item passed to the next stage
+        :param width: number of threads running the function
+        """
+        self.name = name
+        self.function = function
+        self.width = max(1, width)
+        self.items = 0
+        self.busy = 0.0
+        self.max_depth = 0
+        self._depth_sum = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds, depth):
+        with self._lock:
+            self.items += 1
+            self.busy += seconds
+            self.max_depth = max(self.max_depth, depth)
+            self._depth_sum += depth
+
+    @property
+    def mean_depth(self):
+        """
+        Mean number of items waiting in the input queue of the stage, sampled whenever an item is taken.
+        """
+        return self._depth_sum / self.items if self.items else 0.0
+
+
+class Pipeline:
+    """
+    Runs items of a source through a sequence of stages, each in its own threads, connected by bounded queues. A full
+    queue blocks the stage in front of it (backpressure), so at most about queue_size items per stage are in flight.
+    The results of the last stage are returned by iterating over the pipeline, typically by a single consumer that
+    writes them. stop() ends reading the source, the items already read still pass all stages (drain). Exceptions
+    raised by the source or a stage stop the pipeline and are raised to the consumer.
+    """
+
+    def __init__(self, source, stages, queue_size=64):
+        """
+        :param source: iterable of items, read by its own thread
+        :param stages: list of Stage
+        :param queue_size: max. number of items waiting in front of each stage and for the consumer
+        """
+        self.source = source
+        self.stages = stages
+        self.queue_size = queue_size
+        self.read = 0
+        self._queues = [queue.Queue(queue_size) for _ in range(len(stages) + 1)]
+        self._remaining = [stage.width for stage in stages]
+        self._threads = []
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._aborted = threading.Event()
+        self._error = None
+        self._started = None
+
+    def start(self):
+        """
+        Starts the threads of the source and the stages.
+
+        :return: self
+        """
+        self._started = time.perf_counter()
+        self._threads.append(threading.Thread(target=self._read, name="pipeline-source", daemon=True))
+        for index, stage in enumerate(self.stages):
+            for number in range(stage.width):
+                self._threads.append(threading.Thread(target=self._work, args=(index,), daemon=True,
+                                                      name=f"pipeline-{stage.name}-{number}"))
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stops reading the source. The items that have already been read are still processed.
+
+        :return: Nothing
+        """
+        self._stopping.set()
+
+    @property
+    def stopping(self):
+        """
+        True once stop() has been called.
+        """
+        return self._stopping.is_set()
+
+    def close(self):
+        """
+        Aborts the pipeline (the items in flight are dropped) and waits for its threads.
+
+        :return: Nothing
+        """
+        self._stopping.set()
+        self._aborted.set()
+        for thread in self._threads:
+            # threads waiting for a full or an empty queue give up within a moment
+            thread.join()
+        for q in self._queues:
+            self._drain(q)
+
+    def __iter__(self):
+        if self._started is None:
+            self.start()
+        results = self._queues[-1]
+        while True:
+            item = results.get()
+            if item is _DONE:
+                break
+            yield item
+        if self._error is not None:
+            raise self._error
+
+    def get_ready(self, limit):
+        """
+        Takes up to limit results that are ready without waiting, e.g. to write them together with the one returned by
+        iterating.
+
+        :param limit: max. number of results
+        :return: list of results
+        """
+        ready = []
+        results = self._queues[-1]
+        while len(ready) < limit:
+            try:
+                item = results.get_nowait()
+            except queue.Empty:
+                break
+            if item is _DONE:
+                # seen again by the iteration
+                self._put(results, item)
+                break
+            ready.append(item)
+        return ready
+
+    def stats(self):
+        """
+        Stats of the stages, to find the bottleneck: the stage with the highest utilisation (busy time per thread and
+        elapsed time) and the items piling up in front of it.
+
+        :return: list of dicts with name, width, items, items per second, utilisation, max. and mean queue depth
+        """
+        elapsed = max(time.perf_counter() - self._started, 1e-9) if self._started is not None else 1e-9
+        return [{
+            "name": stage.name, "width": stage.width, "items": stage.items, "per_second": stage.items / elapsed,
+            "utilisation": stage.busy / (stage.width * elapsed), "max_depth": stage.max_depth,
+            "mean_depth": stage.mean_depth
+        } for stage in self.stages]
+
+    def report(self):
+        """
+        Stats of the stages as text, one line per stage.
+
+        :return: string
+        """
+        return "\n".join(f"{s['name']:>8} x{s['width']:<3} {s['items']:8d} items {s['per_second']:8.1f}/s  "
+                         f"busy {s['utilisation']:6.1%}  queue max {s['max_depth']:4d} mean {s['mean_depth']:6.1f}"
+                         for s in self.stats())
+
+    def _put(self, q, item):
+        # waits for free space, unless the pipeline is aborted
+        while not self._aborted.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    @staticmethod
+    def _drain(q):
+        try:
+            while True:
+                q.get_nowait()
+        except queue.Empty:
+            pass
+
+    def _fail(self, error):
+        with self._lock:
+            if self._error is None:
+                self._error = error
+        self._stopping.set()
+
+    def _read(self):
+        first = self._queues[0]
+        try:
+            for item in self.source:
+                if self._stopping.is_set() or not self._put(first, item):
+                    break
+                self.read += 1
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            for _ in range(self.stages[0].width if self.stages else 0):
+                self._put(first, _DONE)
+            if not self.stages:
+                self._put(first, _DONE)
+
+    def _work(self, index):
+        stage = self.stages[index]
+        inbox = self._queues[index]
+        outbox = self._queues[index + 1]
+        while True:
+            depth = inbox.qsize()
+            try:
+                item = inbox.get(timeout=0.1)
+            except queue.Empty:
+                if self._aborted.is_set():
+                    return
+                continue
+            if item is _DONE:
+                break
+            if self._error is not None or self._aborted.is_set():
+                # skip the remaining items after an error
+                continue
+            start = time.perf_counter()
+            try:
+                result = stage.function(item)
+            except BaseException as e:
+                self._fail(e)
+                continue
+            stage.record(time.perf_counter() - start, depth)
+            self._put(outbox, result)
+
+        with self._lock:
+            self._remaining[index] -= 1
+            last = self._remaining[index] == 0
+        if last:
+            # the next stage (or the consumer) ends once all threads of this stage have ended
+            for _ in range(self.stages[index + 1].width if index + 1 < len(self.stages) else 1):
+                self._put(outbox, _DONE)
+
+
+class Watermark:
+    """
+    Tracks items finished out of order, e.g. by a Pipeline: returns how far all items have been finished without
+    gaps, so that a checkpoint never skips an item that is still in flight.
+    """
+
+    def __init__(self, first=0):
+        """
+        :param first: sequence number of the first item
+        """
+        self.next = first
+        self._finished = {}
+
+    def finish(self, sequence, value):
+        """
+        Marks an item as finished.
+
+        :param sequence: sequence number of the item (consecutive, starting with first)
+        :param value: value of the item, e.g. its offset in the source
+        :return: value of the last item up to which all items have been finished, or None if that has not changed
+        """
+        self._finished[sequence] = value
+        last = None
+        while self.next in self._finished:
+            last = self._finished.pop(self.next)
+            self.next += 1
+        return last
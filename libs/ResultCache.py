@@ -0,0 +1,173 @@
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy.exc import OperationalError
+from libs.SqliteStore import SqliteStore
+from models.generation import Generation
+
+# The database generation is stored in a single row
+GENERATION_ID = 1
+
+
+def bump_generation(session):
+    """
+    Increments the database generation. Has to be called by every writer that changes searchable data, inside the
+    transaction of the change, so that cached search results of older generations are dropped.
+
+    :param session: session of the writer (not committed here)
+    :return: Nothing
+    """
+    updated = session.query(Generation).filter(Generation.id == GENERATION_ID).update(
+        {Generation.counter: Generation.counter + 1}, synchronize_session=False
+    )
+    if not updated:
+        session.add(Generation(id=GENERATION_ID, counter=1))
+
+
+def get_generation(session):
+    """
+    Reads the current database generation.
+
+    :param session: database session
+    :return: generation counter (0 if nothing has been written yet)
+    """
+    try:
+        counter = session.query(Generation.counter).filter(Generation.id == GENERATION_ID).scalar()
+    except OperationalError:
+        # database without generation table
+        session.rollback()
+        return 0
+    return counter or 0
+
+
+class ResultCache:
+    """
+    Cache for search results. Results are stored per process in an LRU with a maximum number of entries, an
+    approximate upper bound for the used memory and a time to live. Each entry remembers the database generation it
+    was computed for and is dropped as soon as the generation changes. Optionally, a SharedResultCache can be used as
+    second level, so that several processes share their results.
+    """
+
+    def __init__(self, max_entries=256, max_bytes=64 * 1024 * 1024, ttl=600, shared=None):
+        """
+        :param max_entries: max. number of cached results
+        :param max_bytes: max. summed size of the cached results (length of the strings)
+        :param ttl: seconds until a result expires
+        :param shared: optional SharedResultCache used as second level
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.shared = shared
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (generation, expires at, value)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, generation):
+        """
+        Looks up a result.
+
+        :param key: cache key, e.g. the normalised query
+        :param generation: current database generation
+        :return: the cached string or None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] == generation and entry[1] > time.time():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[2]
+                self._remove(key)
+
+        value = self.shared.get(key, generation) if self.shared is not None else None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._store(key, generation, value)
+        return value
+
+    def put(self, key, generation, value):
+        """
+        Stores a result.
+
+        :param key: cache key, e.g. the normalised query
+        :param generation: database generation the result was computed for (read before computing it)
+        :param value: the result (string)
+        :return: Nothing
+        """
+        with self._lock:
+            self._store(key, generation, value)
+        if self.shared is not None:
+            self.shared.put(key, generation, value)
+
+    def clear(self):
+        """
+        Drops all results of this process.
+
+        :return: Nothing
+        """
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _store(self, key, generation, value):
+        # results that would take up most of the cache are not worth it
+        size = len(value)
+        if size > self.max_bytes // 4:
+            return
+
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (generation, time.time() + self.ttl, value)
+        self._bytes += size
+
+        # evict least recently used
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        _, _, value = self._entries.pop(key)
+        self._bytes -= len(value)
+
+
+class SharedResultCache:
+    """
+    Second level of the ResultCache in an SQLite file (see SqliteStore), shared by several processes such as the
+    uwsgi workers. The database generation of a result is stored as the version of its entry.
+    """
+
+    def __init__(self, path, max_bytes=256 * 1024 * 1024, ttl=600):
+        """
+        :param path: path of the SQLite file
+        :param max_bytes: max. summed size of the cached results
+        :param ttl: seconds until a result expires
+        """
+        self.ttl = ttl
+        # the search should rather compute a result than wait for a lock
+        self._store = SqliteStore(path, "results", "Shared result cache", max_bytes=max_bytes, timeout=1)
+
+    def get(self, key, generation):
+        """
+        Looks up a result.
+
+        :param key: cache key
+        :param generation: current database generation
+        :return: the cached string or None
+        """
+        return self._store.get(key, version=generation)
+
+    def put(self, key, generation, value):
+        """
+        Stores a result.
+
+        :param key: cache key
+        :param generation: database generation the result was computed for
+        :param value: the result (string)
+        :return: Nothing
+        """
+        self._store.put(key, value, version=generation, ttl=self.ttl)
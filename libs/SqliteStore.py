@@ -0,0 +1,138 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger("SqliteStore")
+
+# Columns of the table of a store. version is compared on every lookup, entries of another version are stale
+COLUMNS = ("key", "version", "expires", "used", "size", "value")
+
+
+class SqliteStore:
+    """
+    Key-value store in an SQLite file, the common storage of the persistent caches (see SharedResultCache,
+    DownloadCache and ParseCache). The file can be used by several processes at once (WAL journal). If max_bytes is
+    given, the least recently used entries are evicted once the summed size of the values exceeds it. Errors (e.g. a
+    locked file) are logged and treated as misses, a cache must never break its user.
+    """
+
+    def __init__(self, path, table, name, max_bytes=None, timeout=10):
+        """
+        :param path: path of the SQLite file, created (with its directory) when it is first used
+        :param table: name of the table of the entries
+        :param name: name of the cache in the log messages
+        :param max_bytes: (optional) max. summed size of the values (length of the strings or bytes)
+        :param timeout: seconds to wait for a lock held by another process
+        """
+        self.path = path
+        self.table = table
+        self.name = name
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self._connection = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        # connections must not be inherited by forked worker processes
+        if self._connection is None or self._pid != os.getpid():
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None,
+                                               check_same_thread=False)
+            self._pid = os.getpid()
+            self._connection.execute("PRAGMA journal_mode = WAL")
+            columns = tuple(row[1] for row in self._connection.execute(f"PRAGMA table_info({self.table})"))
+            if columns and columns != COLUMNS:
+                # table of an earlier layout, it only holds cached entries
+                self._connection.execute(f"DROP TABLE {self.table}")
+            self._connection.execute(f"CREATE TABLE IF NOT EXISTS {self.table} (key TEXT PRIMARY KEY, "
+                                     f"version INTEGER, expires REAL, used REAL, size INTEGER, value BLOB)")
+            self._connection.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_used ON {self.table} (used, size)")
+        return self._connection
+
+    @property
+    def size(self):
+        """
+        Summed size of the stored values (0 if the file can not be read).
+        """
+        try:
+            with self._lock:
+                return self._size(self._connect())
+        except sqlite3.Error as e:
+            logger.warning(f"{self.name} not available: {e}")
+            return 0
+
+    def _size(self, connection):
+        return connection.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self.table}").fetchone()[0]
+
+    def get(self, key, version=0):
+        """
+        Looks up an entry and marks it as used. Expired entries and those of another version are deleted.
+
+        :param key: key of the entry
+        :param version: version the entry must have been stored with
+        :return: the stored value or None
+        """
+        now = time.time()
+        try:
+            with self._lock:
+                connection = self._connect()
+                row = connection.execute(f"SELECT version, expires, value FROM {self.table} WHERE key = ?",
+                                         (key,)).fetchone()
+                if row is None:
+                    return None
+                if row[0] != version or (row[1] is not None and row[1] <= now):
+                    connection.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                    return None
+                connection.execute(f"UPDATE {self.table} SET used = ? WHERE key = ?", (now, key))
+                return row[2]
+        except sqlite3.Error as e:
+            logger.warning(f"{self.name} not available: {e}")
+            return None
+
+    def put(self, key, value, version=0, ttl=None):
+        """
+        Stores an entry and evicts the least recently used entries if the store is full.
+
+        :param key: key of the entry
+        :param value: string or bytes
+        :param version: version of the entry, see get()
+        :param ttl: (optional) seconds until the entry expires
+        :return: Nothing
+        """
+        # entries that would take up most of the store are not worth it
+        if self.max_bytes is not None and len(value) > self.max_bytes // 4:
+            return
+
+        now = time.time()
+        try:
+            with self._lock:
+                connection = self._connect()
+                connection.execute(f"INSERT OR REPLACE INTO {self.table} (key, version, expires, used, size, value) "
+                                   f"VALUES (?, ?, ?, ?, ?, ?)", (key, version, None if ttl is None else now + ttl,
+                                                                  now, len(value), value))
+                if self.max_bytes is None:
+                    return
+
+                # the other processes using the file write to it as well, the size is read from it
+                while self._size(connection) > self.max_bytes:
+                    # drop the oldest tenth of the entries (at least one) until the store fits again
+                    count = connection.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+                    connection.execute(f"DELETE FROM {self.table} WHERE key IN (SELECT key FROM {self.table} "
+                                       f"ORDER BY used LIMIT ?)", (max(1, count // 10),))
+        except sqlite3.Error as e:
+            logger.warning(f"{self.name} could not store {key}: {e}")
+
+    def close(self):
+        """
+        Closes the SQLite file.
+
+        :return: Nothing
+        """
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
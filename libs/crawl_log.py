@@ -0,0 +1,159 @@
+"""
+Crawl Log
+====================================
+Append-only log of the crawled repositories, replacing the repos.pickle file. Every repository is written as one line
+of JSON as soon as it has been crawled (and synced to disk), so the parser can read the repositories one by one
+instead of loading the whole list into memory, and a crashed crawler loses at most the line it was writing. Such a
+truncated last line is skipped by the reader. Existing pickle files can be converted with ::
+
+    python -m libs.crawl_log repos.pickle repos.jsonl
+"""
+
+import argparse
+import json
+import logging
+import os
+import pickle
+
+logger = logging.getLogger("CrawlLog")
+
+
+def _json_default(value):
+    # e.g. license texts are the raw contents of the license file
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode("utf-8", errors="replace")
+    raise TypeError(f"Object of type {type(value).__name__} can not be written to the crawl log")
+
+
+class CrawlLog:
+    """
+    Writer of a crawl log. The log is opened for appending, existing repositories are kept.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: path of the log file
+        """
+        self.path = path
+        self._file = open(path, "ab")
+
+    @property
+    def offset(self):
+        """
+        Size of the log in bytes, i.e. the offset of the next repository.
+        """
+        return self._file.tell()
+
+    def append(self, repo, sync=True):
+        """
+        Appends a repository and syncs it to disk.
+
+        :param repo: repo dict (see crawler.py)
+        :param sync: sync the log to disk (otherwise only when it is closed)
+        :return: offset after the repository
+        """
+        line = json.dumps(repo, ensure_ascii=False, default=_json_default).encode("utf-8") + b"\n"
+        self._file.write(line)
+        if sync:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        return self._file.tell()
+
+    def truncate(self, offset):
+        """
+        Drops all repositories after the given offset, e.g. the ones of a month that has not been completed.
+
+        :param offset: offset returned by append() or offset
+        :return: Nothing
+        """
+        self._file.flush()
+        self._file.truncate(offset)
+        self._file.seek(offset)
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        """
+        Syncs and closes the log file.
+
+        :return: Nothing
+        """
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_crawl_log(path, offset=0):
+    """
+    Reads the repositories of a crawl log one by one. A truncated last line (e.g. of a crawler that has been killed
+    while writing) is skipped, as are lines that can not be read.
+
+    :param path: path of the log file
+    :param offset: offset to start reading at, e.g. the offset after the last processed repository
+    :return: generator of (offset after the repository, repo dict) tuples
+    """
+    with open(path, "rb") as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b"\n"):
+                logger.warning(f"Skipping the truncated last line of {path} at offset {offset}")
+                return
+            offset += len(line)
+            if not line.strip():
+                continue
+            try:
+                repo = json.loads(line)
+            except ValueError as e:
+                logger.error(f"Skipping unreadable line of {path} before offset {offset}: {e}")
+                continue
+            yield offset, repo
+
+
+def is_record_start(path, offset):
+    """
+    Checks whether a repository of the crawl log starts at the given offset, e.g. before resuming at an offset stored
+    by an earlier run (the log may have been truncated and appended to since).
+
+    :param path: path of the log file
+    :param offset: offset in bytes
+    :return: True if the offset is the start of the log or follows a complete line
+    """
+    if offset == 0:
+        return True
+    try:
+        with open(path, "rb") as f:
+            f.seek(offset - 1)
+            return f.read(1) == b"\n"
+    except (OSError, ValueError):
+        return False
+
+
+def convert_pickle(pickle_file, log_file):
+    """
+    Appends the repositories of a pickle file (written by older versions of the crawler) to a crawl log.
+
+    :param pickle_file: path of the pickle file
+    :param log_file: path of the crawl log
+    :return: number of converted repositories
+    """
+    with open(pickle_file, "rb") as f:
+        list_of_repos = pickle.load(f, encoding="UTF-8")
+
+    with CrawlLog(log_file) as crawl_log:
+        for repo in list_of_repos:
+            crawl_log.append(repo, sync=False)
+    return len(list_of_repos)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Converts a pickle file of the crawler to a crawl log.')
+    parser.add_argument('pickle', type=str, help='pickle file to convert')
+    parser.add_argument('log', type=str, help='crawl log the repositories are appended to')
+    args = parser.parse_args()
+
+    print(f"Converted {convert_pickle(args.pickle, args.log)} repositories")
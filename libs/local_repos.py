@@ -0,0 +1,268 @@
+"""
+Local Repos
+====================================
+Reads repositories from the local file system instead of downloading their KiCad files one by one: a directory tree
+of mirrored repositories or shallow git clones made by the parser. The repositories are described like the ones of the
+crawler (see crawler.py), so they are stored by the same code. Repositories with a GitHub remote get the same URLs as
+crawled ones (raw.githubusercontent.com for the files), other files are identified by file:// URLs.
+"""
+
+import hashlib
+import logging
+import os
+import re
+import subprocess
+import threading
+from urllib.parse import quote
+from pathlib import Path
+from libs.DownloadCache import map_file
+
+logger = logging.getLogger("LocalRepos")
+
+KICAD_EXTENSION = ".kicad_pcb"
+
+# owner and name of a repo in the URLs of a GitHub remote (https or ssh)
+GITHUB_REMOTE = re.compile(r"^(?:https?://|ssh://git@|git@)github\.com[/:]([^/]+)/([^/]+?)(?:\.git)?/?$")
+
+
+def git_blob_sha(contents):
+    """
+    Git blob SHA of file contents, as returned by GitHub for the files of the crawled repos.
+
+    :param contents: file contents as bytes
+    :return: hex SHA-1
+    """
+    return hashlib.sha1(b"blob %d\0" % len(contents) + contents).hexdigest()
+
+
+def _git(directory, *args):
+    # output of a git command, None if git is not installed or the command fails
+    try:
+        result = subprocess.run(["git", "-C", directory, *args], stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                check=True)
+    except (OSError, subprocess.CalledProcessError) as e:
+        logger.debug(f"git {' '.join(args)} failed in {directory}: {e}")
+        return None
+    return result.stdout.decode("utf-8", errors="replace").strip()
+
+
+class LocalFetcher:
+    """
+    Reads the files of local repos, in place of the FileFetcher. The URLs of the files are mapped to their paths by
+    local_repos.
+    """
+
+    def __init__(self):
+        self.paths = {}
+        # same counters as the FileFetcher
+        self.downloaded = 0
+        self.not_modified = 0
+        self._lock = threading.Lock()
+
+    def add(self, url, path):
+        """
+        Maps the URL of a file to its path.
+
+        :param url: URL of the file
+        :param path: path of the file
+        :return: Nothing
+        """
+        self.paths[url] = path
+
+    def fetch(self, url, binary=False):
+        """
+        Reads a single file.
+
+        :param url: URL of the file
+        :param binary: return the bytes (memory-mapped, see map_file) instead of text
+        :return: contents of the file as text (or bytes)
+        :raises FileNotFoundError: if the file does not exist (anymore)
+        """
+        if url not in self.paths:
+            raise FileNotFoundError(f"File with URL {url} is not in a local repo...")
+        contents = map_file(self.paths[url])
+        with self._lock:
+            self.downloaded += 1
+        return contents if binary else str(contents, "utf-8", errors="replace")
+
+    def fetch_all(self, urls, binary=False):
+        """
+        Reads many files one after another.
+
+        :param urls: iterable of URLs
+        :param binary: return the contents as bytes, see fetch()
+        :return: generator of (url, contents, error) tuples. error is the exception raised by fetch() or None
+        """
+        for url in urls:
+            try:
+                yield url, self.fetch(url, binary), None
+            except Exception as e:
+                yield url, None, e
+
+    def close(self):
+        """
+        Forgets the paths of the files.
+
+        :return: Nothing
+        """
+        self.paths.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def find_repos(directory):
+    """
+    Finds the repos in a directory tree: every directory with a .git entry (the walk does not descend into them). A
+    directory tree without any is read as a single repo.
+
+    :param directory: root of the tree
+    :return: sorted list of repo directories
+    """
+    if os.path.exists(os.path.join(directory, ".git")):
+        return [directory]
+
+    repos = []
+    for root, dirs, files in os.walk(directory):
+        if ".git" in dirs or ".git" in files:
+            repos.append(root)
+            dirs[:] = []
+            continue
+        dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+    return sorted(repos) or [directory]
+
+
+def local_repos(directory, fetcher):
+    """
+    Reads the repos of a directory tree (see find_repos).
+
+    :param directory: root of the tree
+    :param fetcher: LocalFetcher the files are added to
+    :return: generator of repo dicts, see crawler.py
+    """
+    for repo_dir in find_repos(directory):
+        repo = local_repo(repo_dir, fetcher)
+        if repo['kicad_urls']:
+            yield repo
+        else:
+            logger.info(f"No KiCad files in {repo_dir}, skipping...")
+
+
+def local_repo(repo_dir, fetcher, repo_url=None):
+    """
+    Reads a single repo: its KiCad files (all directories but hidden ones), their git blob SHAs (for the incremental
+    mode of the parser), the readme and the license.
+
+    :param repo_dir: directory of the repo
+    :param fetcher: LocalFetcher the files are added to
+    :param repo_url: (optional) URL of the repo, otherwise read from the origin remote
+    :return: repo dict, see crawler.py
+    """
+    repo_dir = os.path.abspath(repo_dir)
+    remote = repo_url or _git(repo_dir, "config", "--get", "remote.origin.url") or ""
+    github = GITHUB_REMOTE.match(remote)
+    branch = _git(repo_dir, "rev-parse", "--abbrev-ref", "HEAD") if github else None
+
+    if github and branch and branch != "HEAD":
+        owner, name = github.groups()
+        repo_url = f"https://github.com/{owner}/{name}"
+
+        def file_url(relative):
+            return f"https://raw.githubusercontent.com/{owner}/{name}/{quote(branch)}/{quote(relative)}"
+    else:
+        name = os.path.basename(repo_dir)
+        repo_url = repo_url or Path(repo_dir).as_uri()
+
+        def file_url(relative):
+            return Path(repo_dir, relative).as_uri()
+
+    kicad_urls = []
+    kicad_shas = {}
+    readme, readme_url = 'Could not find readme in repository', ''
+    license_text = 'Could not find license.md in repository, please check for the license before using the ' \
+                   'contents of this repository for your project!'
+    license_url = ''
+
+    for root, dirs, files in os.walk(repo_dir):
+        dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+        for file_name in sorted(files):
+            path = os.path.join(root, file_name)
+            relative = os.path.relpath(path, repo_dir).replace(os.sep, "/")
+            if file_name.endswith(KICAD_EXTENSION):
+                url = file_url(relative)
+                with open(path, "rb") as f:
+                    kicad_shas[url] = git_blob_sha(f.read())
+                kicad_urls.append(url)
+                fetcher.add(url, path)
+            elif root == repo_dir and file_name.lower() == "readme.md":
+                with open(path, encoding="utf-8", errors="replace") as f:
+                    readme, readme_url = f.read(), file_url(relative)
+            elif root == repo_dir and file_name.lower().startswith("license"):
+                with open(path, encoding="utf-8", errors="replace") as f:
+                    license_text, license_url = f.read(), file_url(relative)
+
+    return {
+        'repo_url': repo_url,
+        'repo_name': name,
+        'repo_readme': readme,
+        'repo_readme_url': readme_url,
+        'repo_license': license_text,
+        'repo_license_url': license_url,
+        'kicad_urls': kicad_urls,
+        'kicad_shas': kicad_shas
+        # the description, stars, forks and pushed_at of GitHub are not known locally and left out, so that they are
+        # kept for repos that have been crawled before (see kicad_parser.repo_values). Changed files are found by
+        # their SHAs
+    }
+
+
+def clone_repo(url, clone_dir):
+    """
+    Makes a shallow clone of a git repo (only the last commit), or updates an earlier clone to the last commit.
+
+    :param url: URL of the repo
+    :param clone_dir: directory of the clones, each repo gets a sub directory named after its URL
+    :return: directory of the clone
+    :raises ConnectionError: if the repo can not be cloned
+    """
+    name = re.sub(r"[^A-Za-z0-9._-]+", "_", re.sub(r"^[a-z]+://|\.git/?$", "", url)).strip("_")
+    # absolute, as git runs in clone_dir (-C) and would read a relative path from there
+    directory = os.path.abspath(os.path.join(clone_dir, name))
+
+    if os.path.exists(os.path.join(directory, ".git")):
+        logger.info(f"Updating the clone of {url} in {directory}")
+        if _git(directory, "fetch", "--depth", "1", "origin") is not None and \
+                _git(directory, "reset", "--hard", "FETCH_HEAD") is not None:
+            return directory
+        raise ConnectionError(f"Could not update the clone of {url} in {directory}")
+
+    logger.info(f"Cloning {url} to {directory}")
+    os.makedirs(clone_dir, exist_ok=True)
+    if _git(clone_dir, "clone", "--depth", "1", "--quiet", url, directory) is None:
+        raise ConnectionError(f"Could not clone {url}")
+    return directory
+
+
+def cloned_repos(urls, clone_dir, fetcher):
+    """
+    Clones git repos (see clone_repo) and reads them. Repos that can not be cloned are skipped.
+
+    :param urls: iterable of repo URLs
+    :param clone_dir: directory of the clones
+    :param fetcher: LocalFetcher the files are added to
+    :return: generator of repo dicts, see crawler.py
+    """
+    for url in urls:
+        try:
+            directory = clone_repo(url, clone_dir)
+        except ConnectionError as e:
+            logger.error(f"{e}, skipping...")
+            continue
+        repo = local_repo(directory, fetcher, repo_url=url)
+        if repo['kicad_urls']:
+            yield repo
+        else:
+            logger.info(f"No KiCad files in {url}, skipping...")
@@ -0,0 +1,160 @@
+"""
+Part Matching
+====================================
+Ranks the candidate parts of an item value (the parts whose MPN contains the value) by their edit distance to the
+value. MPNs are compared normalised (upper case, without spaces, dashes, underscores and slashes), so "stm32f103"
+matches "STM32F103" exactly. Most candidates are never scored: an exact match ends the ranking at once, and the MPN of
+a candidate contains the value (it has been found by a substring search), so its edit distance is just the difference
+of their lengths. Only the other candidates are scored, unless their length difference (a lower bound of the edit
+distance) shows that they can not beat the best one.
+
+The scored candidates get the full edit distance of jellyfish rather than one whose computation stops once it exceeds
+the best distance so far: for MPNs (about 10 to 20 characters) the full distance in C takes about 2 microseconds, a
+bounded one in Python about 30, unless the length difference already exceeds the bound (which is pruned above).
+"""
+
+import re
+import sqlite3
+from pathlib import Path
+import jellyfish
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.sql import table, column
+from libs.search_index import has_parts_index, match_parts_statement
+
+# separators that are left out of MPNs when comparing them
+_SEPARATORS = re.compile(r"[\s\-_/]+")
+
+# temporary table holding the values of a page while they are matched
+validate_terms = table("validate_terms", column("position"), column("term"))
+
+# Pages of the index of the parts mapped into memory by each worker process, shared through the page cache
+MMAP_SIZE = 256 * 1024 * 1024
+
+# read-only sessions of the worker processes by database path
+_worker_sessions = {}
+
+
+def normalise_mpn(mpn):
+    """
+    Normalises an MPN (or item value) for comparison.
+
+    :param mpn: MPN
+    :return: MPN in upper case without separators
+    """
+    return _SEPARATORS.sub("", mpn).upper()
+
+
+def confidence(distance, value, mpn):
+    """
+    Confidence of a match: 1 for equal (normalised) MPNs, falling towards 0 the more the MPN differs from the value.
+
+    :param distance: edit distance of the normalised value and MPN
+    :param value: normalised value
+    :param mpn: normalised MPN
+    :return: float between 0 and 1
+    """
+    return 1.0 - distance / max(len(value), len(mpn), 1)
+
+
+def rank_parts(value, related_parts):
+    """
+    Finds the best matching part of an item value: the part with the smallest edit distance between the normalised
+    value and MPN, the one with the smallest id of equally good parts.
+
+    :param value: value of the item
+    :param related_parts: list of (id, mpn) of the candidate parts
+    :return: (id, confidence) of the best part or None without candidates
+    """
+    normalised = normalise_mpn(value)
+    candidates = [(part_id, normalise_mpn(mpn)) for part_id, mpn in related_parts]
+    # the best possible distance, same result as the ranking below
+    exact = [part_id for part_id, mpn in candidates if mpn == normalised]
+    if exact:
+        return min(exact), 1.0
+
+    best = None
+    for part_id, mpn in candidates:
+        if normalised in mpn:
+            # only characters are added to the value, the edit distance is the length difference
+            distance = len(mpn) - len(normalised)
+        else:
+            # e.g. found through a LIKE wildcard in the value. The length difference is a lower bound of the edit
+            # distance, candidates that can not beat the best one are not scored
+            if best is not None and (abs(len(mpn) - len(normalised)), part_id) > best[:2]:
+                continue
+            distance = jellyfish.levenshtein_distance(normalised, mpn)
+        if best is None or (distance, part_id) < best[:2]:
+            best = (distance, part_id, mpn)
+
+    if best is None:
+        return None
+    return best[1], confidence(best[0], normalised, best[2])
+
+
+def related_parts(session, values):
+    """
+    Finds the parts whose MPN contains the value (case-insensitive) for many values at once. The values are written to
+    a temporary table and matched with one statement, using the index of the MPNs if available.
+
+    :param session: database session
+    :param values: list of item values
+    :return: list of (id, mpn) of the parts for each value
+    """
+    session.execute(text(f"CREATE TEMPORARY TABLE IF NOT EXISTS {validate_terms.name} (position INTEGER, term TEXT)"))
+    session.execute(validate_terms.delete())
+    session.execute(validate_terms.insert(), [{"position": position, "term": value}
+                                              for position, value in enumerate(values)])
+
+    if has_parts_index(session):
+        statement = match_parts_statement(validate_terms.name)
+    else:
+        statement = text(f"SELECT terms.position, parts.id, parts.mpn FROM {validate_terms.name} AS terms "
+                         f"JOIN parts ON parts.mpn LIKE '%' || terms.term || '%'")
+
+    parts = [[] for _ in values]
+    for position, part_id, mpn in session.execute(statement):
+        parts[position].append((part_id, mpn))
+    return parts
+
+
+def match_values(session, values):
+    """
+    Matches a page of item values with the parts (see related_parts and rank_parts).
+
+    :param session: database session
+    :param values: list of item values
+    :return: list of dicts with the value (item_value), the id of the best part (part_id) and its confidence, for the
+             values with a match
+    """
+    matches = []
+    for value, candidates in zip(values, related_parts(session, values)):
+        match = rank_parts(value, candidates)
+        if match is not None:
+            matches.append({"item_value": value, "part_id": str(match[0]), "confidence": match[1]})
+    return matches
+
+
+def match_values_read_only(database, values):
+    """
+    Matches a page of item values in a worker process. Each worker opens the database once, read-only and memory
+    mapped, so the workers share the pages of the index instead of reading a copy each. Only the temporary table of
+    the values is written.
+
+    :param database: path of the SQLite database
+    :param values: list of item values
+    :return: see match_values
+    """
+    if database not in _worker_sessions:
+        def connect():
+            connection = sqlite3.connect(f"{Path(database).absolute().as_uri()}?mode=ro", uri=True, timeout=30)
+            connection.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+            return connection
+
+        _worker_sessions[database] = sessionmaker(bind=create_engine("sqlite://", creator=connect))
+    session = _worker_sessions[database]()
+    try:
+        return match_values(session, values)
+    finally:
+        session.rollback()
+        session.close()
@@ -1,2 +1,3 @@
 from .kicad_pcb import *
 from .sexp_parser import *
+from .module_extractor import *
@@ -8,6 +8,7 @@ it is to implement a parser in an almost declarative way.
 A usage demostration is avaiable in `test.py`
 '''
 
+import mmap
 from .sexp_parser import *
 
 __author__ = "Zheng, Lei"
@@ -80,8 +81,16 @@ class KicadPCB(SexpParser):
 
     @staticmethod
     def load(filename):
-        with open(filename,'r') as f:
-            return KicadPCB(parseSexp(f.read()))
+        # the file is memory-mapped and tokenized without reading it into a
+        # string first
+        with open(filename,'rb') as f:
+            try:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # empty files can not be mapped
+                return KicadPCB(parseSexp(f.read()))
+            with data:
+                return KicadPCB(parseSexp(data))
 
     @staticmethod
     def load_contents(file_contents):
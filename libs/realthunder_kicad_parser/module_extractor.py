@@ -0,0 +1,273 @@
+"""
+Module Extractor
+====================================
+Fast path for reading the footprints (modules) of a KiCad board without building the `KicadPCB` object model. Large
+boards consist mostly of tracks, vias and zones, which are skipped by only looking for brackets and quotes. Only the
+top-level ``(module ...)`` forms are turned into (plain) lists and the fields the parser needs are read from them.
+
+The result is identical to reading the fields from `KicadPCB`, including its quirks (lines are joined without
+separator, quotes are kept, numbers are converted). Files with unusual structures, for which the object model would
+behave differently (e.g. duplicate keys or unbalanced brackets), raise `UnsupportedSexp`, so that the caller can fall
+back to `KicadPCB`. Like `parseSexp`, the contents are tokenized in place: UTF-8 encoded bytes (e.g. a memory-mapped
+file) are not decoded as a whole, only the modules are.
+"""
+
+import re
+from .sexp_parser.sexp_parser import _LINE_BREAKS, _STR_SYNTAX, _WHITE_SPACE, _atom, _tokenizer
+
+__all__ = ["scan_modules", "UnsupportedSexp"]
+
+# characters that end an atom token, so that a following quote starts a string
+TOKEN_END = "()^"
+
+# forms of the board for which KicadPCB adds default sub forms (see KicadPCB._defaults)
+FORMS_WITH_DEFAULTS = ("net_class", "zone")
+
+# values of SexpBool
+BOOL_VALUES = ("yes", "Yes", "True", "true", "no", "No", "False", "false")
+
+
+class _Skipping:
+    """
+    Patterns and characters of _skip_form for either str or bytes.
+    """
+
+    def __init__(self, white_space, line_breaks, encode):
+        # characters that matter while skipping a form
+        self.structure = re.compile(encode('[()"]'))
+        # rest of a form whose sub forms only contain atoms, without any quotes (e.g. a track segment)
+        self.flat = re.compile(encode(r'[^()"]*(?:\([^()"]*\)[^()"]*)*\)'))
+        self.open_text = encode("(")
+        self.quote = encode('"')
+        # characters as indexing returns them (int for bytes)
+        self.open, self.close = encode("()")
+        self.token_end = set(encode(TOKEN_END + white_space))
+        # parseSexp joins the lines without separator, line breaks are invisible
+        self.line_breaks = set(encode(line_breaks))
+
+
+_STR_SKIPPING = _Skipping(_WHITE_SPACE, _LINE_BREAKS, lambda s: s)
+
+# UTF-8 encoded bytes only contain ASCII white space and line breaks, see sexp_parser._BYTES_SYNTAX
+_BYTES_SKIPPING = _Skipping("".join(c for c in _WHITE_SPACE if c < "\x80"),
+                            "".join(c for c in _LINE_BREAKS if c < "\x80"), lambda s: s.encode("latin-1"))
+
+
+class UnsupportedSexp(ValueError):
+    """
+    Raised if the file can not be handled by the fast path.
+    """
+
+
+def scan_modules(contents):
+    """
+    Reads the modules of a KiCad board.
+
+    :param contents: file contents (text, or UTF-8 encoded bytes or mmap, invalid bytes are replaced)
+    :return: list of dicts with the keys module, descr, tags, reference and value (as read from KicadPCB)
+    :raises UnsupportedSexp: if the file has to be read with KicadPCB
+    """
+    text, syntax, decode, _ = _tokenizer(contents, False)
+    skipping = _STR_SKIPPING if isinstance(text, str) else _BYTES_SKIPPING
+
+    def atom(token):
+        value = _atom(token, token.lastgroup, syntax)
+        return decode(value) if decode is not None else value
+
+    # the first form is the board, its key is not checked by KicadPCB either
+    token = syntax.token.search(text)
+    if token is None or token.lastgroup != "l":
+        raise UnsupportedSexp("file does not start with a form")
+    token = syntax.token.search(text, token.end())
+    if token is None or token.lastgroup in ("l", "r"):
+        raise UnsupportedSexp("board without key")
+
+    modules = []
+    pos = token.end()
+    while True:
+        token = syntax.token.search(text, pos)
+        if token is None:
+            raise UnsupportedSexp("board is not closed")
+        pos = token.end()
+
+        if token.lastgroup == "r":
+            break
+        if token.lastgroup != "l":
+            # atoms of the board are not relevant
+            continue
+
+        key = syntax.token.search(text, pos)
+        if key is None or key.lastgroup == "l":
+            raise UnsupportedSexp("form without key")
+        if key.lastgroup == "r":
+            # empty form, ignored by KicadPCB
+            pos = key.end()
+            continue
+
+        name = atom(key)
+        end, has_forms = _skip_form(text, key.end(), skipping)
+        if name == "module":
+            # modules are small, each one is decoded as a whole
+            form = text[key.end():end]
+            modules.append(_module_fields(_read_form(decode(form) if decode is not None else form, "module")))
+        elif name in FORMS_WITH_DEFAULTS and not has_forms:
+            # KicadPCB fails to add the defaults of their sub forms
+            raise UnsupportedSexp(f"{name} without sub forms")
+        pos = end
+
+    # parseSexp checks the brackets of the whole file
+    depth = 0
+    for token in syntax.token.finditer(text, pos):
+        if token.lastgroup == "l":
+            depth += 1
+        elif token.lastgroup == "r":
+            depth -= 1
+            if depth < 0:
+                raise UnsupportedSexp("unbalanced brackets")
+    if depth != 0:
+        raise UnsupportedSexp("unbalanced brackets")
+
+    return modules
+
+
+def _read_form(text, key):
+    """
+    Reads a form into nested lists of its atoms (without line numbers).
+
+    :param text: text of the form after its key, up to its closing bracket
+    :param key: key of the form
+    :return: list
+    """
+    stack = []
+    out = [key]
+    for token in _STR_SYNTAX.token.finditer(text):
+        term = token.lastgroup
+        if term == "l":
+            stack.append(out)
+            out = []
+        elif term == "r":
+            if not stack:
+                return out
+            done, out = out, stack.pop()
+            out.append(done)
+        else:
+            out.append(_atom(token, term, _STR_SYNTAX))
+    raise UnsupportedSexp("form is not closed")
+
+
+def _skip_form(text, pos, skipping):
+    """
+    Skips a form without tokenising it. Only brackets and quotes are looked at, brackets inside quoted strings are
+    ignored. As in parseSexp, a quote only starts a string at the beginning of a token.
+
+    :param text: file contents (str or bytes-like)
+    :param pos: position after the key of the form
+    :param skipping: _Skipping of the type of text
+    :return: (position after the form, whether the form contains other forms)
+    """
+    flat = skipping.flat.match(text, pos)
+    if flat is not None:
+        return flat.end(), text.find(skipping.open_text, pos, flat.end()) != -1
+
+    has_forms = False
+    depth = 1
+    # pos is right after the key token, so a quote there starts a new token
+    string_end = pos
+    while True:
+        match = skipping.structure.search(text, pos)
+        if match is None:
+            raise UnsupportedSexp("form is not closed")
+        start = match.start()
+        char = text[start]
+        pos = start + 1
+
+        if char == skipping.open:
+            depth += 1
+            has_forms = True
+        elif char == skipping.close:
+            depth -= 1
+            if depth == 0:
+                return pos, has_forms
+        else:
+            # the character before the quote, line breaks are skipped as they are not part of the joined lines
+            before = start - 1
+            while before >= string_end and text[before] in skipping.line_breaks:
+                before -= 1
+            if before == string_end - 1 or text[before] in skipping.token_end:
+                end = text.find(skipping.quote, pos)
+                if end != -1:
+                    pos = string_end = end + 1
+
+
+def _number(atom):
+    """
+    Converts an atom like parseDefault.
+    """
+    try:
+        return int(atom)
+    except ValueError:
+        pass
+    try:
+        return float(atom)
+    except ValueError:
+        pass
+    return atom
+
+
+def _value(form):
+    """
+    Value of a form with only atoms (e.g. descr), like parseDefault and Sexp.__get__.
+    """
+    values = form[1:]
+    if not values or (len(values) == 1 and values[0] in BOOL_VALUES):
+        raise UnsupportedSexp(f"{form[0]} without value or boolean")
+    if any(isinstance(value, list) for value in values):
+        raise UnsupportedSexp(f"{form[0]} with sub forms")
+    if len(values) == 1:
+        return _number(values[0])
+    return [_number(value) for value in values]
+
+
+def _module_fields(module):
+    """
+    Reads the fields of a module the same way kicad_parser does from KicadPCB_module.
+
+    :param module: module as nested lists
+    :return: dict of module, descr, tags, reference and value
+    """
+    fields = {"module": None, "descr": None, "tags": None, "reference": None, "value": None}
+    name_found = False
+
+    for child in module[1:]:
+        if isinstance(child, str):
+            # positional atoms, "locked" is a flag (KicadPCB_module._default_bools)
+            if child in ("fp_text", "pad"):
+                raise UnsupportedSexp(f"atom {child} in module")
+            if child != "locked" and not name_found:
+                fields["module"] = _number(child)
+                name_found = True
+            continue
+
+        if not child:
+            continue
+        key = child[0]
+        if isinstance(key, list):
+            raise UnsupportedSexp("form without key in module")
+
+        if key in ("descr", "tags"):
+            if fields[key] is not None:
+                raise UnsupportedSexp(f"duplicate {key}")
+            fields[key] = _value(child)
+        elif key == "fp_text":
+            # positional atoms, "hide" is a flag (KicadPCB_gr_text._default_bools)
+            atoms = [_number(atom) for atom in child[1:] if isinstance(atom, str) and atom != "hide"]
+            if not atoms or (atoms[0] in ("reference", "value") and len(atoms) < 2):
+                raise UnsupportedSexp("fp_text without kind or text")
+            if atoms[0] == "reference":
+                fields["reference"] = atoms[1]
+            elif atoms[0] == "value":
+                fields["value"] = atoms[1]
+
+    if not name_found:
+        raise UnsupportedSexp("module without name")
+    return fields
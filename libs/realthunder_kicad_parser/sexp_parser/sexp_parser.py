@@ -22,6 +22,7 @@ import re
 import logging
 import traceback
 import bisect
+import mmap
 from collections import OrderedDict
 
 __author__ = "Zheng, Lei"
@@ -696,19 +697,321 @@ def parseFloat3(obj,sexp):
 def parseFloat4(obj,sexp):
     return parseCopy(obj,sexp,4,float)
 
-def parseSexp(sexp):
+# Characters that str.splitlines() treats as line boundaries. parseSexp()
+# has always joined the lines without separator, so these characters are
+# invisible to the tokenizer: they neither separate nor end a token.
+_LINE_BREAKS = '\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029'
+
+class _Syntax(object):
+    '''Regular expressions of the tokenizer for either str or bytes
+
+        The tokens are the same as the ones of the original rosettacode based
+        regex, except that line breaks inside a token are skipped instead of
+        joining all lines up front. Tokens without line breaks (the common
+        case) are matched by the groups 'q' and 's', the others by 'Q' and
+        'j' and have their line breaks removed.
+    '''
+
+    def __init__(self, white_space, line_breaks, encode):
+        ws = re.escape(encode(white_space))
+        lb = re.escape(encode(line_breaks))
+        self.newline = encode('\n')
+        self.empty = encode('')
+
+        self.token = re.compile(encode(r'''(?x)
+                [%(ws)s]*(?:
+                (?P<l>\()|
+                (?P<r>\))|
+                (?P<q>"[^"%(lb)s]*")|
+                (?P<Q>"[^"]*")|
+                (?P<s>[^(^)%(ws)s]+)(?P<j>(?:[%(lb)s]+[^(^)%(ws)s]+)+)?
+            )''') % {encode('ws'): ws, encode('lb'): lb})
+
+        # line boundaries as counted by str.splitlines(), '\r\n' counts once
+        self.line_break = re.compile(encode('\r\n|[') + lb + encode(']'))
+
+        # line breaks at the start of a match, they belong to the previous line
+        self.line_break_run = re.compile(encode('[') + lb + encode(']*'))
+
+        # line boundaries other than '\n'
+        self.other_line_break = re.compile(encode('[') +
+                re.escape(encode(line_breaks.replace('\n', ''))) + encode(']'))
+
+# white space as matched by '\s' for str
+_WHITE_SPACE = ''.join(chr(c) for c in range(0x10000) if chr(c).isspace())
+
+_STR_SYNTAX = _Syntax(_WHITE_SPACE, _LINE_BREAKS, lambda s: s)
+
+# UTF-8 encoded bytes. White space and line breaks outside of ASCII are
+# multi-byte sequences, which a bytes regex can not treat like characters.
+# Such (rare) input is decoded and tokenized as str instead.
+_BYTES_SYNTAX = _Syntax(
+        ''.join(c for c in _WHITE_SPACE if c < '\x80'),
+        ''.join(c for c in _LINE_BREAKS if c < '\x80'),
+        lambda s: s.encode('latin-1'))
+
+_NON_ASCII_WHITE_SPACE_RE = re.compile(b'|'.join(
+    re.escape(c.encode('utf-8')) for c in _WHITE_SPACE if c >= '\x80'))
+
+_BYTES_TYPES = (bytes,bytearray,memoryview,mmap.mmap)
+
+def _tokenizer(sexp, lines):
+    '''Prepares tokenizing text or UTF-8 encoded bytes (invalid bytes are
+        replaced)
+
+        Returns a tuple ``(sexp, syntax, decode, line_of)``, where ``decode``
+        converts a token to str (None for str input) and ``line_of`` returns
+        the line number of a token match (None if ``lines`` is False). Line
+        numbers have to be requested in the order of the tokens.
+    '''
+
+    if isinstance(sexp,string_types):
+        syntax = _STR_SYNTAX
+        decode = None
+    elif _NON_ASCII_WHITE_SPACE_RE.search(sexp) is not None:
+        sexp = bytes(sexp).decode('utf-8', 'replace')
+        syntax = _STR_SYNTAX
+        decode = None
+    else:
+        syntax = _BYTES_SYNTAX
+        decode = _decode
+
+    if not lines:
+        return sexp, syntax, decode, None
+
+    if (hasattr(sexp, 'count') and
+            syntax.other_line_break.search(sexp) is None):
+        def count_lines(start, end):
+            return sexp.count(syntax.newline, start, end)
+    else:
+        def count_lines(start, end):
+            return len(syntax.line_break.findall(sexp, start, end))
+
+    # line number and position of the last request
+    last = [1, 0]
+    def line_of(token):
+        # like before, the line of the match (including the leading white
+        # space) is used, not the one of the token
+        start = syntax.line_break_run.match(sexp, token.start()).end()
+        last[0] += count_lines(last[1], start)
+        last[1] = start
+        return last[0]
+
+    return sexp, syntax, decode, line_of
+
+def _atom(token, term, syntax):
+    '''Value of an atom token (without line breaks)'''
+    if term == 's' or term == 'q':
+        return token.group(term)
+    if term == 'j':
+        return token.group('s') + syntax.line_break.sub(
+                syntax.empty, token.group('j'))
+    return syntax.line_break.sub(syntax.empty, token.group('Q'))
+
+def _decode(value):
+    # like requests' Response.text, bytes that are not UTF-8 (e.g. Latin-1
+    # boards) are replaced instead of failing the whole file
+    return value.decode('utf-8', 'replace')
+
+def parseSexp(sexp, lines=True):
     """Parses S-expressions and return a ``list`` represention
-        
+
         Code borrowed from: http://rosettacode.org/wiki/S-Expressions, with
         the following modifications,
 
         * Do not parse numbers
         * Do not strip quotes (for easy export back to S-expression)
         * Added line number information for easy debugging
+
+        The text is tokenized in place, line numbers are only counted for
+        the expressions that need one, by counting the line breaks since the
+        previous one. UTF-8 encoded bytes, e.g. a downloaded file or a
+        memory-mapped one (see `mmap`), are tokenized without decoding them
+        as a whole. Equal atoms share one string object.
+
+        :param sexp: S-expression text, UTF-8 encoded bytes-like object, or an
+            iterable of its lines
+        :param lines: whether to insert the line numbers. If False, -1 (the
+            default line of `Sexp`) is inserted instead.
+    """
+
+    if not isinstance(sexp,string_types+_BYTES_TYPES):
+        return parseSexpLines(sexp)
+
+    sexp, syntax, decode, line_of = _tokenizer(sexp, lines)
+
+    atoms = {}
+    stack = []
+    out = []
+    balanced = True
+    for token in syntax.token.finditer(sexp):
+        term = token.lastgroup
+        if term == 'l': # left bracket
+            stack.append(out)
+            out = []
+        elif term == 'r': # right bracket
+            if not stack:
+                # checked after the loop, a memory map can not be closed
+                # while the scanner is alive
+                balanced = False
+                break
+            tmpout, out = out, stack.pop()
+            out.append(tmpout)
+        else:
+            if not out:
+                # insert line number as the first element
+                out.append(-1 if line_of is None else line_of(token))
+            value = _atom(token, term, syntax)
+            if decode is not None:
+                value = decode(value)
+            out.append(atoms.setdefault(value, value))
+
+    assert balanced and not stack, "Trouble with nesting of brackets"
+
+    if not out: return []
+    return out[0]
+
+SEXP_START = 'start'
+SEXP_ATOM = 'atom'
+SEXP_END = 'end'
+
+def iterSexp(sexp, lines=True):
+    """Generates the parsing events of S-expressions
+
+        Tokenizes like `parseSexp()`, but instead of returning the complete
+        list representation, a tuple ``(event, value, line)`` is generated
+        for every token,
+
+        * ``(SEXP_START, None, None)`` for an opening bracket
+        * ``(SEXP_ATOM, <atom>, <line>)`` for an atom. The line number is only
+          given for the atoms that `parseSexp()` inserts the line number for
+          (the first one of an expression), it is None for the others.
+        * ``(SEXP_END, None, None)`` for a closing bracket
+
+        Use `SexpBuilder` to build lists from the events. Unbalanced brackets
+        raise the same ``AssertionError`` as `parseSexp()`, missing closing
+        brackets after all other events. A generator that is not exhausted
+        should be closed before closing a memory map it reads from.
+
+        :param sexp: S-expression text or UTF-8 encoded bytes-like object
+        :param lines: whether to count the line numbers. If False, -1 is
+            given instead.
+    """
+
+    sexp, syntax, decode, line_of = _tokenizer(sexp, lines)
+
+    # unlike parseSexp(), equal atoms are not shared, the table would grow
+    # with the whole input
+    depth = 0
+    first = True
+    balanced = True
+    for token in syntax.token.finditer(sexp):
+        term = token.lastgroup
+        if term == 'l':
+            depth += 1
+            first = True
+            yield SEXP_START, None, None
+        elif term == 'r':
+            if not depth:
+                balanced = False
+                break
+            depth -= 1
+            first = False
+            yield SEXP_END, None, None
+        else:
+            line = None
+            if first:
+                line = -1 if line_of is None else line_of(token)
+                first = False
+            value = _atom(token, term, syntax)
+            if decode is not None:
+                value = decode(value)
+            yield SEXP_ATOM, value, line
+
+    assert balanced and not depth, "Trouble with nesting of brackets"
+
+class SexpBuilder(object):
+    '''Incrementally builds the list representation from `iterSexp()` events
+
+        Without ``depth``, the result is the same as the one of `parseSexp()`.
+        With a ``depth`` of n, the expressions nested n levels deep inside the
+        first top level expression (e.g. the modules and tracks of a board
+        for a depth of 1) are returned by `feed()` as soon as they are closed,
+        instead of adding them to their parent. So they can be processed and
+        dropped one by one, and only the largest of them has to fit into
+        memory at once.
+
+        Attributes:
+            depth (int): nesting depth of the returned expressions
+            result: the first top level expression (without the returned ones)
+                once it is closed, like the result of `parseSexp()`
+    '''
+
+    __slots__ = ('depth','result','_stack','_out','_closed')
+
+    def __init__(self,depth=0):
+        self.depth = depth
+        self.result = []
+        self._stack = []
+        self._out = None
+        self._closed = False
+
+    def feed(self,event,value=None,line=None):
+        '''Feeds an event of `iterSexp()`
+
+            Returns the expression if an expression at ``depth`` has been
+            closed, None otherwise
+        '''
+
+        if self._closed:
+            # parseSexp() only returns the first top level item
+            return None
+
+        if event == SEXP_START:
+            if self._out is not None:
+                self._stack.append(self._out)
+            self._out = []
+        elif event == SEXP_ATOM:
+            if self._out is None:
+                # parseSexp() returns the line number of a top level atom
+                self.result = line
+                self._closed = True
+                return None
+            if line is not None:
+                # the line number of the expression, see iterSexp()
+                self._out.append(line)
+            self._out.append(value)
+        elif event == SEXP_END:
+            done = self._out
+            if not self._stack:
+                self.result = done
+                self._out = None
+                self._closed = True
+                return done if self.depth == 0 else None
+            self._out = self._stack.pop()
+            if len(self._stack) + 1 == self.depth:
+                return done
+            self._out.append(done)
+        else:
+            raise ValueError('unknown event {}'.format(event))
+        return None
+
+    def iterBuild(self,events):
+        '''Feeds all events and generates the returned expressions'''
+        for event in events:
+            sexp = self.feed(*event)
+            if sexp is not None:
+                yield sexp
+
+def parseSexpLines(sexp):
+    """Parses S-expressions given as an iterable of lines
+
+        Original implementation of `parseSexp()`, the lines are joined
+        without separator before tokenizing.
     """
 
-    if not hasattr(parseSexp,'regex'):
-        parseSexp.regex = re.compile(
+    if not hasattr(parseSexpLines,'regex'):
+        parseSexpLines.regex = re.compile(
             r'''(?mx)
                     \s*(?:
                     (?P<l>\()|
@@ -731,7 +1034,7 @@ def parseSexp(sexp):
     out = []
     if logger.isEnabledFor(logging.DEBUG):
         logger.debug("%-6s %-14s %-44s %-s" % tuple("term value out stack".split()))
-    for termtypes in re.finditer(parseSexp.regex, sexp):
+    for termtypes in re.finditer(parseSexpLines.regex, sexp):
         term, value = [(t,v) for t,v in termtypes.groupdict().items() if v][0]
         if logger.isEnabledFor(logging.DEBUG):
             logging.debug("%-7s %-14s %-44r %-r" % (term, value, out, stack))
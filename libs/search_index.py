@@ -0,0 +1,258 @@
+"""
+Search Index
+====================================
+Full-text index for the component search. Items are mirrored into an SQLite FTS5 virtual table using the trigram
+tokenizer, so that substring queries (``LIKE '%STM32%'``) are answered from the index instead of scanning the whole
+``items`` table. The index covers the value, description and tags of an item as well as the MPN of the part it has been
+matched to. A second index over the MPNs of the parts is used by the validator to find the parts matching the values of
+the items.
+
+The indexes are kept in sync by triggers on the ``items`` and ``parts`` tables, so every writer (parser, validator)
+keeps them up to date without further changes. Existing databases can be (re-)indexed with ::
+
+    python -m libs.search_index --rebuild
+"""
+
+import argparse
+from configparser import ConfigParser
+import os
+from sqlalchemy import create_engine, text, select, or_
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.sql import table, column
+
+ITEMS_FTS_TABLE = "items_fts"
+PARTS_FTS_TABLE = "parts_fts"
+
+# lightweight core construct to query the index with SQLAlchemy expressions
+items_fts = table(ITEMS_FTS_TABLE, column("rowid"), column("value"), column("description"), column("tags"),
+                  column("mpn"))
+
+_CREATE_STATEMENTS = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {ITEMS_FTS_TABLE} USING fts5(value, description, tags, mpn, "
+    f"tokenize='trigram')",
+
+    # new items are indexed together with the MPN of their part (if already matched)
+    f"CREATE TRIGGER IF NOT EXISTS {ITEMS_FTS_TABLE}_item_insert AFTER INSERT ON items BEGIN "
+    f"INSERT INTO {ITEMS_FTS_TABLE}(rowid, value, description, tags, mpn) VALUES (new.id, new.value, "
+    f"new.description, new.tags, (SELECT mpn FROM parts WHERE parts.id = CAST(new.part_id AS INTEGER))); END",
+
+    f"CREATE TRIGGER IF NOT EXISTS {ITEMS_FTS_TABLE}_item_delete AFTER DELETE ON items BEGIN "
+    f"DELETE FROM {ITEMS_FTS_TABLE} WHERE rowid = old.id; END",
+
+    # e.g. the validator assigning a part to an item
+    f"CREATE TRIGGER IF NOT EXISTS {ITEMS_FTS_TABLE}_item_update AFTER UPDATE OF value, description, tags, part_id "
+    f"ON items BEGIN "
+    f"DELETE FROM {ITEMS_FTS_TABLE} WHERE rowid = old.id; "
+    f"INSERT INTO {ITEMS_FTS_TABLE}(rowid, value, description, tags, mpn) VALUES (new.id, new.value, "
+    f"new.description, new.tags, (SELECT mpn FROM parts WHERE parts.id = CAST(new.part_id AS INTEGER))); END",
+
+    # the items of a part are found by the index of their part_id (also declared by models/items.py) instead of a scan
+    # of all items, e.g. for every MPN changed by the validator
+    "CREATE INDEX IF NOT EXISTS ix_items_part_id ON items (part_id)",
+    f"CREATE TRIGGER IF NOT EXISTS {ITEMS_FTS_TABLE}_part_update AFTER UPDATE OF mpn ON parts BEGIN "
+    f"UPDATE {ITEMS_FTS_TABLE} SET mpn = new.mpn WHERE rowid IN (SELECT id FROM items WHERE part_id = new.id); END",
+
+    f"CREATE TRIGGER IF NOT EXISTS {ITEMS_FTS_TABLE}_part_delete AFTER DELETE ON parts BEGIN "
+    f"UPDATE {ITEMS_FTS_TABLE} SET mpn = NULL WHERE rowid IN (SELECT id FROM items WHERE part_id = old.id); END",
+]
+
+_CREATE_PARTS_STATEMENTS = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {PARTS_FTS_TABLE} USING fts5(mpn, tokenize='trigram')",
+
+    f"CREATE TRIGGER IF NOT EXISTS {PARTS_FTS_TABLE}_insert AFTER INSERT ON parts BEGIN "
+    f"INSERT INTO {PARTS_FTS_TABLE}(rowid, mpn) VALUES (new.id, new.mpn); END",
+
+    f"CREATE TRIGGER IF NOT EXISTS {PARTS_FTS_TABLE}_delete AFTER DELETE ON parts BEGIN "
+    f"DELETE FROM {PARTS_FTS_TABLE} WHERE rowid = old.id; END",
+
+    f"CREATE TRIGGER IF NOT EXISTS {PARTS_FTS_TABLE}_update AFTER UPDATE OF mpn ON parts BEGIN "
+    f"DELETE FROM {PARTS_FTS_TABLE} WHERE rowid = old.id; "
+    f"INSERT INTO {PARTS_FTS_TABLE}(rowid, mpn) VALUES (new.id, new.mpn); END",
+]
+
+
+def is_supported(connection):
+    """
+    Checks whether the database behind the given engine/connection supports the FTS5 trigram tokenizer
+    (SQLite >= 3.34 compiled with FTS5).
+
+    :param connection: engine or connection
+    :return: True if the index can be created
+    """
+    if connection.dialect.name != "sqlite":
+        return False
+
+    try:
+        connection.execute(text("CREATE VIRTUAL TABLE temp.fts_probe USING fts5(probe, tokenize='trigram')"))
+        connection.execute(text("DROP TABLE temp.fts_probe"))
+    except OperationalError:
+        return False
+    return True
+
+
+def has_search_index(bind, name=ITEMS_FTS_TABLE):
+    """
+    Checks whether the search index exists in the database.
+
+    :param bind: engine, connection or session
+    :param name: name of the index table (default: the index of the items)
+    :return: True if the index table exists
+    """
+    dialect = bind.dialect if hasattr(bind, "dialect") else bind.get_bind().dialect
+    if dialect.name != "sqlite":
+        return False
+
+    found = bind.execute(
+        text("SELECT name FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {"name": name}
+    ).first()
+    return found is not None
+
+
+def has_parts_index(bind):
+    """
+    Checks whether the index of the part MPNs exists in the database.
+
+    :param bind: engine, connection or session
+    :return: True if the index table exists
+    """
+    return has_search_index(bind, PARTS_FTS_TABLE)
+
+
+def create_search_index(engine):
+    """
+    Creates the search index and its triggers, if they do not exist yet. A newly created index is populated from the
+    existing items once. Does nothing on databases that do not support FTS5.
+
+    :param engine: SQLAlchemy engine
+    :return: True if the index is available afterwards
+    """
+    with engine.begin() as connection:
+        if not is_supported(connection):
+            return False
+
+        existed = has_search_index(connection)
+        for statement in _CREATE_STATEMENTS:
+            connection.execute(text(statement))
+
+        if not existed:
+            _populate(connection)
+
+        parts_existed = has_parts_index(connection)
+        for statement in _CREATE_PARTS_STATEMENTS:
+            connection.execute(text(statement))
+
+        if not parts_existed:
+            _populate_parts(connection)
+    return True
+
+
+def rebuild_search_index(engine):
+    """
+    Drops all index entries and re-indexes every item. Used for databases that were filled before the index existed.
+
+    :param engine: SQLAlchemy engine
+    :return: number of indexed items
+    """
+    if not create_search_index(engine):
+        raise RuntimeError("The database does not support FTS5 trigram indexes (SQLite >= 3.34 required)")
+
+    with engine.begin() as connection:
+        connection.execute(text(f"DELETE FROM {ITEMS_FTS_TABLE}"))
+        connection.execute(text(f"DELETE FROM {PARTS_FTS_TABLE}"))
+        _populate_parts(connection)
+        return _populate(connection)
+
+
+def _populate(connection):
+    """
+    Indexes all items.
+
+    :param connection: open connection (inside a transaction)
+    :return: number of indexed items
+    """
+    result = connection.execute(text(
+        f"INSERT INTO {ITEMS_FTS_TABLE}(rowid, value, description, tags, mpn) "
+        f"SELECT items.id, items.value, items.description, items.tags, parts.mpn FROM items "
+        f"LEFT OUTER JOIN parts ON parts.id = CAST(items.part_id AS INTEGER)"
+    ))
+    return result.rowcount
+
+
+def _populate_parts(connection):
+    """
+    Indexes the MPNs of all parts.
+
+    :param connection: open connection (inside a transaction)
+    :return: number of indexed parts
+    """
+    result = connection.execute(text(f"INSERT INTO {PARTS_FTS_TABLE}(rowid, mpn) SELECT id, mpn FROM parts"))
+    return result.rowcount
+
+
+def matching_item_ids(pattern, columns=("value",)):
+    """
+    Builds a sub-select of the ids of all items where one of the given columns matches the LIKE pattern.
+
+    :param pattern: LIKE pattern, e.g. "%STM32%"
+    :param columns: indexed columns to match against (value, description, tags, mpn)
+    :return: selectable of item ids
+    """
+    return select([items_fts.c.rowid]).where(or_(*[items_fts.c[name].like(pattern) for name in columns]))
+
+
+def match_terms_statement(terms_table, matches_table):
+    """
+    Builds the statement matching many query terms at once. The terms are read from terms_table (position, term) and
+    the pairs of (position, item id) of all matching items are inserted into matches_table. The terms are forced to be
+    the outer loop (CROSS JOIN), so that every term is looked up in the index instead of scanning it.
+
+    :param terms_table: name of the table holding the terms
+    :param matches_table: name of the table receiving the matches
+    :return: text statement
+    """
+    return text(
+        f"INSERT INTO {matches_table} (position, item_id) "
+        f"SELECT terms.position, {ITEMS_FTS_TABLE}.rowid FROM {terms_table} AS terms "
+        f"CROSS JOIN {ITEMS_FTS_TABLE} ON {ITEMS_FTS_TABLE}.value LIKE '%' || terms.term || '%'"
+    )
+
+
+def match_parts_statement(terms_table):
+    """
+    Builds the statement finding the parts whose MPN contains one of many terms (case-insensitive), e.g. the values of
+    items to be validated. Like match_terms_statement, every term is looked up in the index of the parts.
+
+    :param terms_table: name of the table holding the terms (position, term)
+    :return: text statement selecting (position, part id, mpn) rows
+    """
+    return text(
+        f"SELECT terms.position, {PARTS_FTS_TABLE}.rowid, {PARTS_FTS_TABLE}.mpn FROM {terms_table} AS terms "
+        f"CROSS JOIN {PARTS_FTS_TABLE} ON {PARTS_FTS_TABLE}.mpn LIKE '%' || terms.term || '%'"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Maintains the full-text search index of the parser database.')
+    parser.add_argument('--rebuild', "-r", action="store_true",
+                        help='drop and rebuild the index from the items table')
+    parser.add_argument('--database', "-d", type=str, nargs="?",
+                        help='database uri (default: the one from the parser config)')
+    args = parser.parse_args()
+
+    database_uri = args.database
+    if database_uri is None:
+        config = ConfigParser()
+        if os.path.exists('config/parser.config'):
+            config.read('config/parser.config')
+        else:
+            config.read('config/default_parser.config')
+        database_uri = config["DATABASE"]["database-uri"]
+
+    db_engine = create_engine(database_uri)
+    if args.rebuild:
+        print(f"Indexed {rebuild_search_index(db_engine)} items.")
+    elif create_search_index(db_engine):
+        print("Search index is available.")
+    else:
+        print("The database does not support the search index.")
@@ -1,3 +1,32 @@
+from sqlalchemy import inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
+
+
+def add_missing_columns(engine):
+    """
+    Adds the columns (and indexes) of the models that are missing in existing tables, as create_all() only creates
+    missing tables. Upgrades databases built by older versions in place, the new columns are NULL for existing rows.
+
+    :param engine: SQLAlchemy engine (after create_all())
+    :return: list of the added columns as "table.column"
+    """
+    inspector = inspect(engine)
+    added = []
+
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+                    added.append(f"{table.name}.{column.name}")
+
+            existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    index.create(connection)
+
+    return added
@@ -8,6 +8,10 @@ class File(Base):
     url = Column(String)
     uuid = Column(String)
     repo_id = Column(String)
+    # SHA-256 of the contents, identical files (e.g. in forks) are only parsed once
+    content_hash = Column(String, index=True)
+    # git blob SHA reported by the crawler
+    sha = Column(String)
 
     def __repr__(self):
         return f"<File(id='{self.id}', url='{self.url}', uuid='{self.uuid}', repo_id='{self.repo_id}')>"
@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer
+from .base import Base
+
+
+class Generation(Base):
+    __tablename__ = 'generation'
+    id = Column(Integer, primary_key=True)
+    counter = Column(Integer, default=0)
+
+    def __repr__(self):
+        return f"<Generation(id={self.id}, counter={self.counter})>"
+
+    def __str__(self):
+        return f"<Generation(id={self.id}, counter={self.counter})>"
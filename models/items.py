@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey
 from .base import Base
 
 
@@ -10,9 +10,13 @@ class Item(Base):
     description = Column(String)
     tags = Column(String)
     reference = Column(String)
-    value = Column(String)
-    part_id = Column(String, ForeignKey("parts.id"))
-    file_id = Column(String, ForeignKey('files.id'))
+    value = Column(String, index=True)
+    part_id = Column(String, ForeignKey("parts.id"), index=True)
+    # how closely the MPN of the part matches the value (1 for equal MPNs), see libs/part_matching.py
+    part_confidence = Column(Float)
+    # time of the last validation (UTC), items that have not been validated yet are NULL
+    validated_at = Column(DateTime)
+    file_id = Column(String, ForeignKey('files.id'), index=True)
 
     def __repr__(self):
         return f"<Item(id={self.id}, uuid={self.uuid}, module={self.module}, description={self.description}, " \
@@ -1,5 +1,6 @@
 import uuid as uuid
-from sqlalchemy import Column, Integer, String, ForeignKey
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
 from .base import Base
 
 
@@ -12,6 +13,8 @@ class Part(Base):
     aisler_id = Column(String, unique=True)
     mpn = Column(String)
     datasheet = Column(String)
+    # time the part was added or last changed (UTC), see the incremental validation
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     def __repr__(self):
         return f"<Part(id='{self.id}', description='{self.description}', manufacturer='{self.manufacturer}', " \
@@ -15,6 +15,8 @@ class Repo(Base):
     readme_url = Column(String)
     forks = Column(Integer)
     stars = Column(Integer)
+    # time of the last push (ISO 8601) when the repo was crawled, see the incremental mode of the parser
+    pushed_at = Column(String)
 
     def __repr__(self):
         return f"<Repo(id={self.id}, repo_url={self.repo_url}, repo_uuid={self.repo_uuid}, description=" \
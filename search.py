@@ -1,19 +1,72 @@
+import csv
+import io
 import json
+from collections import OrderedDict
 from models.items import Item
 from models.files import File
 from models.repos import Repo
-from models.base import Base
+from models.base import Base, add_missing_columns
 from models.part import Part
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from libs.search_index import has_search_index, matching_item_ids, match_terms_statement
+from libs.ResultCache import ResultCache, SharedResultCache, get_generation
+from configparser import ConfigParser
+from sqlalchemy import create_engine, func, or_, and_, text, select
+from sqlalchemy.sql import table, column
+from sqlalchemy.orm import sessionmaker, Bundle
 import os.path
 
 # Init SQLAlchemy
 engine = create_engine('sqlite:///./database/parser_database.sqlite?check_same_thread=false')
 Base.metadata.create_all(engine)
+add_missing_columns(engine)
 Session = sessionmaker(bind=engine)
 session = Session()
 
+# Init result cache
+config = ConfigParser()
+# check whether we have a custom config file
+if os.path.exists('config/search.config'):
+    config.read('config/search.config')
+else:
+    config.read('config/default_search.config')
+
+cache_config = config["CACHE"] if config.has_section("CACHE") else {}
+shared_cache = None
+if cache_config.get("Shared-Path"):
+    shared_cache = SharedResultCache(cache_config["Shared-Path"],
+                                     max_bytes=int(cache_config.get("Shared-Max-Bytes", 256 * 1024 * 1024)),
+                                     ttl=int(cache_config.get("TTL", 600)))
+result_cache = ResultCache(max_entries=int(cache_config.get("Max-Entries", 256)),
+                           max_bytes=int(cache_config.get("Max-Bytes", 64 * 1024 * 1024)),
+                           ttl=int(cache_config.get("TTL", 600)),
+                           shared=shared_cache)
+
+# Repositories per page of the paginated search
+RESULTS_PER_PAGE = 20
+MAX_RESULTS_PER_PAGE = 100
+
+# Rows fetched per round trip of the streaming search
+STREAM_BATCH_SIZE = 500
+
+# Max. number of terms of a batch (BOM) search
+MAX_BATCH_TERMS = 500
+
+# Header names of BOM columns that hold the part numbers, in order of preference
+BOM_COLUMNS = ["mpn", "manufacturer part number", "mfr part number", "mfr. part #", "part number", "value", "part"]
+
+# Temporary tables used by the batch search
+batch_terms = table("search_batch_terms", column("position"), column("term"))
+batch_matches = table("search_batch_matches", column("position"), column("item_id"))
+batch_repos = table("search_batch_repos", column("position"), column("repo_id"), column("rank"), column("total"))
+
+# Columns needed for building the results. They are loaded as light-weight tuples instead of ORM objects, which is
+# considerably faster for queries with many results
+ITEM_COLUMNS = Bundle("Item", Item.id, Item.value, Item.description, Item.tags)
+FILE_COLUMNS = Bundle("File", File.id, File.url)
+REPO_COLUMNS = Bundle("Repo", Repo.id, Repo.name, Repo.description, Repo.license, Repo.license_url, Repo.readme,
+                      Repo.stars, Repo.forks, Repo.repo_url)
+PART_COLUMNS = Bundle("Part", Part.id, Part.mpn, Part.manufacturer, Part.description, Part.datasheet)
+
 
 def preprocess_query(query: str, split: str = None):
     """
@@ -80,16 +133,18 @@ def build_file_item_object(item: Item, file: File, part: Part = None):
         'component': item.value
     }
 
-    if item.tags is not None:
-        if item.tags.startswith("\""):
-            item.tags = item.tags[1:]
+    # Note: strip the quotes on a copy, assigning to the item would mark it as modified in the session
+    tags = item.tags
+    if tags is not None:
+        if tags.startswith("\""):
+            tags = tags[1:]
 
-        if item.tags.endswith("\""):
-            item.tags = item.tags[:-1]
+        if tags.endswith("\""):
+            tags = tags[:-1]
 
         result.update(
             {
-                'tags': item.tags.split(";"),
+                'tags': tags.split(";"),
             }
         )
     else:
@@ -120,99 +175,365 @@ def build_file_item_object(item: Item, file: File, part: Part = None):
     return result
 
 
-def search(query: str, separator: str = None, session=session):
+def group_by_repo(item_results):
     """
-    Interface for querying parts from the database.
+    Groups the found items by their repository.
 
-    :param session: override for session
-    :param separator: separator of items (e.g. ", "; default whitespaces)
-    :param query: query string (e.g. "ASDF123 ASDF21")
-    :return:
+    :param item_results: rows of (Item, File, Repo, Part) columns, Part columns are None if there is no part
+    :return: list of repository objects with their files and tags
     """
-    try:
-        query_items = preprocess_query(query, split=separator)
+    # here all repos are saved, keyed by their id
+    repos = OrderedDict()
 
-        # for now limit to one item
-        if len(query_items) > 0:
-            query_items = query_items[0]
+    for row in item_results:
+        repo_obj = repos.get(row.Repo.id)
+
+        if repo_obj is None:
+            # build repo repres.
+            repo_obj = build_repo_object(row.Repo)
+            repos[row.Repo.id] = repo_obj
         else:
-            return "[]"
+            # keep the previous ordering: a repo moves behind the others whenever another item of it is found
+            repos.move_to_end(row.Repo.id)
 
-        # Fetch items corresponding to the query
-        item_results = (
-            session.query(
-                Item, File, Part  # Select info from Items, Files & Parts
-            )
-            .filter(Item.value.ilike(f"%{query_items}%"))  # Search for query str
-            # .filter(Item.part_id == Part.id)  # search for MPN (depricated)
-            .filter(File.id == Item.file_id)  # Select file info from Files table
-            .join(Part, Item.part_id == Part.id, isouter=True)  # Join info about parts if avail.
-            .all()  # fetch all results
+        # append file info repr. to repo
+        part = row.Part if row.Part.id is not None else None
+        files_data = build_file_item_object(row.Item, row.File, part)
+        repo_obj["files"].append(files_data)
+        repo_obj["tags"].extend(files_data["tags"])
+
+    repo_list = list(repos.values())
+    for repo_obj in repo_list:
+        # remove duplicate tags, keep the order they were found in
+        repo_obj["tags"] = list(dict.fromkeys(repo_obj["tags"]))
+
+    return repo_list
+
+
+def iter_grouped_by_repo(item_results):
+    """
+    Groups found items by their repository, for rows that are already ordered by repository.
+
+    :param item_results: iterable of (Item, File, Repo, Part) columns ordered by repository
+    :return: generator of repository objects, each one is yielded as soon as all of its files have been read
+    """
+    repo_obj = None
+
+    for row in item_results:
+        if repo_obj is None or repo_obj["repo_id"] != row.Repo.id:
+            if repo_obj is not None:
+                repo_obj["tags"] = list(dict.fromkeys(repo_obj["tags"]))
+                yield repo_obj
+            repo_obj = build_repo_object(row.Repo)
+
+        part = row.Part if row.Part.id is not None else None
+        files_data = build_file_item_object(row.Item, row.File, part)
+        repo_obj["files"].append(files_data)
+        repo_obj["tags"].extend(files_data["tags"])
+
+    if repo_obj is not None:
+        repo_obj["tags"] = list(dict.fromkeys(repo_obj["tags"]))
+        yield repo_obj
+
+
+def build_item_filter(query_item: str, session=session):
+    """
+    Builds the filter for items matching a query term. Uses the full-text index if the database has one, else falls
+    back to a LIKE scan of the items table.
+
+    :param query_item: (preprocessed) query term
+    :param session: session used for checking the database
+    :return: filter expression on Item
+    """
+    if has_search_index(session):
+        return Item.id.in_(matching_item_ids(f"%{query_item}%"))
+    return Item.value.ilike(f"%{query_item}%")
+
+
+def first_query_term(query: str, separator: str = None):
+    """
+    Preprocesses the query and returns the term that is searched for.
+
+    :param query: query string
+    :param separator: separator of items (default whitespaces)
+    :return: the (first) query term or None if the query is empty
+    """
+    query_items = preprocess_query(query, split=separator)
+
+    # for now limit to one item
+    if len(query_items) > 0:
+        return query_items[0]
+    return None
+
+
+def relevance_score():
+    """
+    SQL expression of the relevance of a repository. Same as sort_by_relevance(): forks and stars combined.
+
+    :return: SQLAlchemy expression
+    """
+    return func.coalesce(Repo.forks, 0) + func.coalesce(Repo.stars, 0)
+
+
+def query_matching_items(query_item: str, session=session):
+    """
+    Builds the query for all items matching the query term together with their files, repos and parts.
+
+    :param query_item: (preprocessed) query term
+    :param session: database session
+    :return: query of (Item, File, Repo, Part) columns
+    """
+    return (
+        session.query(
+            ITEM_COLUMNS, FILE_COLUMNS, REPO_COLUMNS, PART_COLUMNS  # Select info from Items, Files, Repos & Parts
         )
+        .filter(build_item_filter(query_item, session))  # Search for query str
+        # .filter(Item.part_id == Part.id)  # search for MPN (depricated)
+        .filter(File.id == Item.file_id)  # Select file info from Files table
+        .filter(Repo.id == File.repo_id)  # Select repo info from Repos table
+        .join(Part, Item.part_id == Part.id, isouter=True)  # Join info about parts if avail.
+    )
 
-        # here all repos are saved
-        repo_list = []
 
-        # Update info for each item
-        for item in item_results:
-            # fetch ids of repos already visited
-            saved_repo_ids = [str(repo['repo_id']) for repo in repo_list]
+def query_matching_repos(query_item: str, session=session):
+    """
+    Builds the query for the ids and relevance scores of all repositories that contain a matching item, most relevant
+    first.
 
-            # if we don't know the info, fetch from db
-            if str(item.File.repo_id) not in saved_repo_ids:
-                # query the repo info
-                repo = session.query(Repo).filter(Repo.id == item.File.repo_id).one()
+    :param query_item: (preprocessed) query term
+    :param session: database session
+    :return: query of (id, score)
+    """
+    matching_repo_ids = (
+        session.query(File.repo_id)
+        .filter(File.id == Item.file_id)
+        .filter(build_item_filter(query_item, session))
+    )
+    score = relevance_score()
+    return (
+        session.query(Repo.id, score.label("score"))
+        .filter(Repo.id.in_(matching_repo_ids.subquery()))
+        .order_by(score.desc(), Repo.id)
+    )
+
+
+def encode_cursor(score: int, repo_id: int):
+    """
+    Builds the cursor pointing behind the given repository.
 
-                # build repo repres.
-                repo_obj = build_repo_object(repo)
+    :param score: relevance score of the repository
+    :param repo_id: id of the repository
+    :return: cursor string
+    """
+    return f"{score}:{repo_id}"
 
-                # append file info repr. to repo
-                files_data = build_file_item_object(item.Item, item.File, item.Part)
-                repo_obj["files"].append(files_data)
 
-                repo_obj["tags"].extend(files_data["tags"])
-                repo_obj["tags"] = list(set(repo_obj["tags"]))
+def decode_cursor(cursor: str):
+    """
+    Reads a cursor built by encode_cursor().
 
-                # save to list
-                repo_list.append(repo_obj)
-            else:
-                # find the repo
-                repo_obj = [repo for repo in repo_list if str(repo['repo_id']) == str(item.File.repo_id)]
+    :param cursor: cursor string
+    :return: (score, repo id)
+    """
+    try:
+        score, repo_id = cursor.split(":")
+        return int(score), int(repo_id)
+    except ValueError:
+        raise ValueError(f"Invalid cursor '{cursor}'")
 
-                if len(repo_obj) <= 0:
-                    raise Exception("Something went wrong.")
-                else:
-                    repo_obj = repo_obj[0]
 
-                # find the corresponding index
-                repo_index = repo_list.index(repo_obj)
+def fetch_page(query_item: str, limit: int, offset: int = 0, cursor: str = None, session=session):
+    """
+    Fetches one page of repositories (ranked in the database) and the matching files of only these repositories.
+
+    :param query_item: (preprocessed) query term
+    :param limit: max. number of repositories
+    :param offset: number of repositories to skip (ignored if a cursor is given)
+    :param cursor: cursor returned with the previous page
+    :param session: database session
+    :return: (list of repository objects, cursor of the next page or None)
+    """
+    repos_query = query_matching_repos(query_item, session)
+    if cursor is not None:
+        # keyset pagination: continue behind the last repository of the previous page
+        last_score, last_id = decode_cursor(cursor)
+        score = relevance_score()
+        repos_query = repos_query.filter(or_(score < last_score, and_(score == last_score, Repo.id > last_id)))
+    elif offset > 0:
+        repos_query = repos_query.offset(offset)
+
+    page = repos_query.limit(limit).all()
+    if not page:
+        return [], None
+
+    item_results = (
+        query_matching_items(query_item, session)
+        .filter(File.repo_id.in_([str(repo_id) for repo_id, _ in page]))
+        .order_by(Item.id)
+        .all()
+    )
+
+    # keep the ranking of the database
+    ranks = {repo_id: rank for rank, (repo_id, _) in enumerate(page)}
+    repo_list = sorted(group_by_repo(item_results), key=lambda repo: ranks[repo['repo_id']])
+
+    next_cursor = encode_cursor(page[-1].score, page[-1].id) if len(page) == limit else None
+    return repo_list, next_cursor
+
+
+def cached(key: str, compute, session=session):
+    """
+    Returns the cached result for the key or computes and caches it. Only results from the database of the website
+    are cached (overridden sessions, e.g. in tests, always compute). Cached results are invalidated as soon as the
+    parser or validator writes to the database (see libs.ResultCache.bump_generation).
+
+    :param key: cache key, built from the normalised query
+    :param compute: function computing the result as json string (errors are raised, so they are never cached)
+    :param session: session used for the query
+    :return: json string
+    """
+    if session.get_bind() is not engine:
+        return compute()
 
-                # pop from list
-                repo_obj = repo_list.pop(repo_index)
+    # the generation has to be read before computing, so that a concurrent write invalidates the result
+    generation = get_generation(session)
+    value = result_cache.get(key, generation)
+    if value is None:
+        value = compute()
+        result_cache.put(key, generation, value)
+    return value
 
-                # update files in object
-                files_data = build_file_item_object(item.Item, item.File, item.Part)
-                repo_obj["files"].append(files_data)
 
-                repo_obj["tags"].extend(files_data["tags"])
-                repo_obj["tags"] = list(set(repo_obj["tags"]))
+def search(query: str, separator: str = None, session=session):
+    """
+    Interface for querying parts from the database.
 
-                # re-add to list
-                repo_list.append(repo_obj)
+    :param session: override for session
+    :param separator: separator of items (e.g. ", "; default whitespaces)
+    :param query: query string (e.g. "ASDF123 ASDF21")
+    :return:
+    """
+    try:
+        query_item = first_query_term(query, separator)
+        if query_item is None:
+            return "[]"
+
+        def compute():
+            # Fetch items corresponding to the query together with their files, repos and parts in one go
+            item_results = query_matching_items(query_item, session).order_by(Item.id).all()
 
-        # sort by relevance
-        result_dict = sort_by_relevance(repo_list)
+            repo_list = group_by_repo(item_results)
 
-        print("res: ", result_dict)
+            # sort by relevance
+            result_dict = sort_by_relevance(repo_list)
+
+            return json.dumps(
+                {
+                    "status": "OK",
+                    "results": result_dict
+                }
+            )
 
+        return cached(f"search:{query_item}", compute, session)
+    except Exception as ex:
         return json.dumps(
             {
-                "status": "OK",
-                "results": result_dict
+                "status": "ERROR",
+                "info": f"{ex}",
+                "trace": ex.args
             }
         )
+    finally:
+        session.close()
+
+
+def search_page(query: str, separator: str = None, limit: int = RESULTS_PER_PAGE, offset: int = 0,
+                cursor: str = None, session=session):
+    """
+    Paginated interface for querying parts from the database. Only one page of repositories (ranked by relevance in
+    the database) and their files is fetched, so memory and latency do not depend on how broad the query is.
+
+    :param query: query string (e.g. "ASDF123")
+    :param separator: separator of items (e.g. ", "; default whitespaces)
+    :param limit: repositories per page (capped at MAX_RESULTS_PER_PAGE)
+    :param offset: number of repositories to skip
+    :param cursor: cursor from the previous page, preferred over offset for deep pages
+    :param session: override for session
+    :return: result dict with the repositories of the page, the total number of repositories and the next cursor
+    """
+    limit = max(1, min(limit, MAX_RESULTS_PER_PAGE))
+    offset = max(0, offset)
+
+    try:
+        result = {
+            "status": "OK",
+            "results": [],
+            "total": 0,
+            "limit": limit,
+            "offset": offset,
+            "next_cursor": None
+        }
+
+        query_item = first_query_term(query, separator)
+        if query_item is None:
+            return result
+
+        def compute():
+            result["total"] = query_matching_repos(query_item, session).order_by(None).count()
+            result["results"], result["next_cursor"] = fetch_page(query_item, limit, offset, cursor, session)
+            return json.dumps(result)
+
+        return json.loads(cached(f"page:{query_item}:{limit}:{offset}:{cursor}", compute, session))
     except Exception as ex:
-        return json.dumps(
+        return {
+            "status": "ERROR",
+            "info": f"{ex}",
+            "trace": ex.args
+        }
+    finally:
+        session.close()
+
+
+def search_stream(query: str, separator: str = None, batch_size: int = STREAM_BATCH_SIZE, session=None):
+    """
+    Streaming interface for querying parts from the database. Yields the same JSON document as search(), but emits
+    the repositories one by one, most relevant first. The rows are ranked in the database and fetched in batches, so
+    only the repository currently being built is held in memory. The cursor stays open between the chunks, so the
+    stream uses a session of its own (closed when the stream ends) instead of the one shared by the other searches.
+
+    :param query: query string (e.g. "ASDF123")
+    :param separator: separator of items (e.g. ", "; default whitespaces)
+    :param batch_size: rows fetched per database round trip
+    :param session: override for session (default: a new session)
+    :return: generator of JSON text chunks
+    """
+    if session is None:
+        session = Session()
+    started = False
+    try:
+        query_item = first_query_term(query, separator)
+
+        yield '{"status": "OK", "results": ['
+        started = True
+
+        if query_item is not None:
+            item_results = (
+                query_matching_items(query_item, session)
+                .order_by(relevance_score().desc(), Repo.id, Item.id)
+                .yield_per(batch_size)
+            )
+
+            first = True
+            for repo_obj in iter_grouped_by_repo(item_results):
+                yield ("" if first else ", ") + json.dumps(repo_obj)
+                first = False
+
+        yield ']}'
+    except Exception as ex:
+        if started:
+            # the document has already been started, there is no way to report the error in it
+            raise
+        yield json.dumps(
             {
                 "status": "ERROR",
                 "info": f"{ex}",
@@ -223,6 +544,157 @@ def search(query: str, separator: str = None, session=session):
         session.close()
 
 
+def parse_bom(bom: str):
+    """
+    Reads the query terms from a BOM. Accepts one part per line or a CSV file (comma, semicolon or tab separated).
+    If the CSV has a header, the column with the part numbers is chosen by its name (see BOM_COLUMNS), else the first
+    column is used.
+
+    :param bom: contents of the BOM
+    :return: list of unique (preprocessed) query terms, in the order of the BOM
+    """
+    lines = [line for line in bom.splitlines() if line.strip()]
+    if not lines:
+        return []
+
+    try:
+        dialect = csv.Sniffer().sniff(lines[0], delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    rows = list(csv.reader(lines, dialect))
+
+    # find the column holding the part numbers
+    column_index = 0
+    header = [cell.strip().lower() for cell in rows[0]]
+    for name in BOM_COLUMNS:
+        if name in header:
+            column_index = header.index(name)
+            rows = rows[1:]
+            break
+
+    terms = []
+    for row in rows:
+        if len(row) <= column_index:
+            continue
+        term = first_query_term(row[column_index])
+        if term is not None:
+            terms.append(term)
+
+    # remove duplicates, keep the order of the BOM
+    return list(dict.fromkeys(terms))
+
+
+def match_batch_terms(query_items, limit, session=session):
+    """
+    Finds the items matching each of the query terms with a few set-based statements: the terms are written to a
+    temporary table and matched against the items in one statement. The repositories of each term are ranked in the
+    database (like sort_by_relevance(group_by_repo(...))), only the items of the most relevant ones are fetched.
+
+    :param query_items: list of (preprocessed) query terms
+    :param limit: max. number of repositories per term
+    :param session: database session
+    :return: (dict of the number of matching repositories by position of the term, query of (position of the term,
+             rank of the repository, Item, File, Repo, Part columns) ordered by term and item)
+    """
+    session.execute(text(f"CREATE TEMPORARY TABLE IF NOT EXISTS {batch_terms.name} (position INTEGER, term TEXT)"))
+    session.execute(text(f"CREATE TEMPORARY TABLE IF NOT EXISTS {batch_matches.name} "
+                         f"(position INTEGER, item_id INTEGER)"))
+    session.execute(text(f"CREATE TEMPORARY TABLE IF NOT EXISTS {batch_repos.name} "
+                         f"(position INTEGER, repo_id INTEGER, rank INTEGER, total INTEGER)"))
+    session.execute(batch_terms.delete())
+    session.execute(batch_matches.delete())
+    session.execute(batch_repos.delete())
+
+    session.execute(batch_terms.insert(), [{"position": position, "term": term}
+                                           for position, term in enumerate(query_items)])
+
+    if has_search_index(session):
+        session.execute(match_terms_statement(batch_terms.name, batch_matches.name))
+    else:
+        session.execute(text(
+            f"INSERT INTO {batch_matches.name} (position, item_id) SELECT terms.position, items.id FROM items "
+            f"JOIN {batch_terms.name} AS terms ON items.value LIKE '%' || terms.term || '%'"
+        ))
+
+    # ties keep the order of group_by_repo: the repository whose last matching item comes first
+    session.execute(text(
+        f"INSERT INTO {batch_repos.name} (position, repo_id, rank, total) SELECT position, repo_id, rank, total FROM "
+        f"(SELECT matches.position, repos.id AS repo_id, ROW_NUMBER() OVER (PARTITION BY matches.position "
+        f"ORDER BY COALESCE(repos.forks, 0) + COALESCE(repos.stars, 0) DESC, MAX(items.id)) AS rank, "
+        f"COUNT(*) OVER (PARTITION BY matches.position) AS total "
+        f"FROM {batch_matches.name} AS matches JOIN items ON items.id = matches.item_id "
+        f"JOIN files ON files.id = items.file_id JOIN repos ON repos.id = files.repo_id "
+        f"GROUP BY matches.position, repos.id) WHERE rank <= :limit"
+    ), {"limit": limit})
+    totals = dict(session.execute(select([batch_repos.c.position, batch_repos.c.total]).distinct()).fetchall())
+
+    return totals, (
+        session.query(batch_matches.c.position, batch_repos.c.rank, ITEM_COLUMNS, FILE_COLUMNS, REPO_COLUMNS,
+                      PART_COLUMNS)
+        .select_from(batch_matches)
+        .join(Item, Item.id == batch_matches.c.item_id)
+        .filter(File.id == Item.file_id)
+        .filter(Repo.id == File.repo_id)
+        .filter(batch_repos.c.position == batch_matches.c.position)
+        .filter(batch_repos.c.repo_id == Repo.id)
+        .join(Part, Item.part_id == Part.id, isouter=True)
+        .order_by(batch_matches.c.position, Item.id)
+    )
+
+
+def search_batch(queries, limit: int = RESULTS_PER_PAGE, session=session):
+    """
+    Interface for querying many parts at once, e.g. all parts of a BOM. All terms are resolved together instead of
+    one search per term.
+
+    :param queries: list of query strings (one part each)
+    :param limit: max. number of repositories per term (most relevant first)
+    :param session: override for session
+    :return: result dict with one result group (term, total number of repositories, repositories) per term
+    """
+    try:
+        query_items = list(dict.fromkeys(term for term in (first_query_term(query) for query in queries)
+                                         if term is not None))
+        if len(query_items) > MAX_BATCH_TERMS:
+            raise ValueError(f"Too many parts, at most {MAX_BATCH_TERMS} can be searched at once")
+
+        totals = {}
+        rows_by_term = {position: [] for position in range(len(query_items))}
+        ranks = {}
+        if query_items:
+            totals, rows = match_batch_terms(query_items, limit, session)
+            for row in rows:
+                rows_by_term[row.position].append(row)
+                ranks[row.position, row.Repo.id] = row.rank
+
+        results = []
+        for position, query_item in enumerate(query_items):
+            # keep the ranking of the database
+            repo_list = sorted(group_by_repo(rows_by_term[position]),
+                               key=lambda repo: ranks[position, repo['repo_id']])
+            results.append(
+                {
+                    "term": query_item,
+                    "total": totals.get(position, 0),
+                    "results": repo_list
+                }
+            )
+
+        return {
+            "status": "OK",
+            "results": results
+        }
+    except Exception as ex:
+        return {
+            "status": "ERROR",
+            "info": f"{ex}",
+            "trace": ex.args
+        }
+    finally:
+        session.rollback()
+        session.close()
+
+
 if __name__ == "__main__":
     print("Searching...")
     print("Result:", search("STM32"))
@@ -0,0 +1,99 @@
+"""
+Shared fixtures for the tests.
+"""
+import hashlib
+import os
+import sys
+import threading
+from collections import Counter
+from email.utils import formatdate, parsedate_to_datetime
+from urllib.parse import urlsplit
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import pytest
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """
+    Local stand-in for the file hosts (e.g. raw.githubusercontent.com). Serves
+
+    - /files/<name>: the file <name> of the files directory (fixtures by default, 404 if it does not exist), with ETag
+      and Last-Modified. Conditional requests of unchanged files are answered with 304 Not Modified
+    - /status/<code>: an empty response with the given status code
+    - /flaky/<n>/<code>/<name>: <code> (with Retry-After: 0) for the first n requests, then the fixture file <name>
+    """
+
+    def do_GET(self):
+        self.server.requests[self.path] += 1
+        parts = urlsplit(self.path).path.strip("/").split("/")
+
+        if parts[0] == "status":
+            self.respond(int(parts[1]))
+        elif parts[0] == "flaky" and self.server.requests[self.path] <= int(parts[1]):
+            self.respond(int(parts[2]), headers={"Retry-After": "0"})
+        elif parts[0] in ("files", "flaky"):
+            path = os.path.join(self.server.files_dir, parts[-1])
+            if not os.path.exists(path):
+                self.respond(404)
+                return
+            with open(path, "rb") as f:
+                body = f.read()
+            mtime = int(os.stat(path).st_mtime)
+            headers = {"ETag": f'"{hashlib.sha256(body).hexdigest()}"',
+                       "Last-Modified": formatdate(mtime, usegmt=True)}
+            if "If-None-Match" in self.headers:
+                not_modified = self.headers["If-None-Match"] == headers["ETag"]
+            else:
+                not_modified = "If-Modified-Since" in self.headers and \
+                    parsedate_to_datetime(self.headers["If-Modified-Since"]).timestamp() >= mtime
+            if not_modified:
+                self.server.not_modified[self.path] += 1
+                self.respond(304, headers=headers)
+            else:
+                self.respond(200, body, headers)
+        else:
+            self.respond(404)
+
+    def respond(self, code, body=b"", headers=None):
+        self.send_response(code)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def no_parse_cache(monkeypatch):
+    """
+    Disables the persistent parse cache of the parser, so that the tests do not depend on earlier runs. Tests of the
+    cache set their own one.
+    """
+    if "kicad_parser" in sys.modules:
+        monkeypatch.setattr(sys.modules["kicad_parser"], "parse_cache", None)
+
+
+@pytest.fixture
+def file_server():
+    """
+    Starts the local stand-in for the file hosts.
+
+    :return: server, with base_url, the directory of the served files (files_dir) and Counters of the requested paths
+             (requests) and of the paths answered with 304 Not Modified (not_modified)
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    server.files_dir = FIXTURES_DIR
+    server.requests = Counter()
+    server.not_modified = Counter()
+    server.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    yield server
+
+    server.shutdown()
+    server.server_close()
@@ -1,3 +1,5 @@
+import io
+import json
 import os
 import tempfile
 import pytest
@@ -25,3 +27,42 @@ def test_index(client):
     rv = client.get('/')
 
     print(rv)
+
+
+def test_search_api(client):
+    """Testing the paginated and the streaming search API"""
+
+    rv = client.get('/api/search?q=DEMO123&limit=5')
+    page = json.loads(rv.data)
+
+    assert rv.status_code == 200
+    assert page["status"] == "OK"
+    assert page["limit"] == 5
+    assert len(page["results"]) <= 5
+
+    rv = client.get('/api/search/stream?q=DEMO123')
+    streamed = json.loads(rv.data)
+
+    assert rv.status_code == 200
+    assert streamed["status"] == "OK"
+    assert len(streamed["results"]) == page["total"]
+
+    rv = client.get('/?q=DEMO123&page=2')
+    assert rv.status_code == 200
+
+
+def test_bom_api(client):
+    """Testing the BOM upload"""
+
+    bom = "Reference;Quantity;MPN\nU1;1;DEMO123\nU2;1;ESP8266\n"
+
+    rv = client.post('/api/bom', data={'bom': (io.BytesIO(bom.encode('utf-8')), 'bom.csv')},
+                     content_type='multipart/form-data')
+    results = json.loads(rv.data)
+
+    assert rv.status_code == 200
+    assert results["status"] == "OK"
+    assert [group["term"] for group in results["results"]] == ["DEMO123", "ESP8266"]
+
+    rv = client.post('/api/bom', data="DEMO123\n")
+    assert [group["term"] for group in json.loads(rv.data)["results"]] == ["DEMO123"]
@@ -0,0 +1,143 @@
+"""
+This file supplies tests for resuming interrupted parser runs.
+"""
+import pickle
+import pytest
+import kicad_parser as kp
+from libs.Checkpoint import Checkpoint
+from libs.FileFetcher import FileFetcher
+from libs.crawl_log import CrawlLog
+from models.base import Base
+from models.files import File
+from models.repos import Repo
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+
+def crawled_repo(server, number):
+    return {
+        "repo_url": f"https://github.com/test/repo{number}", "repo_name": f"repo{number}",
+        "repo_description": "Test repo", "repo_readme": "Readme", "repo_readme_url": None, "repo_license": None,
+        "repo_license_url": None, "stars": 1, "forks": 2,
+        "kicad_urls": [f"{server.base_url}/files/demo.kicad_pcb?repo={number}"]
+    }
+
+
+@pytest.fixture
+def parser_db(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'parser.sqlite'}")
+    Base.metadata.create_all(engine)
+    monkeypatch.setattr(kp, "Session", sessionmaker(bind=engine))
+    return sessionmaker(bind=engine)
+
+
+def test_checkpoint(tmp_path):
+    """
+    Testing if the checkpoint is written every interval records and ignored for another version of the source
+    """
+    path = str(tmp_path / "repos.checkpoint")
+    checkpoint = Checkpoint(path, interval=2)
+    assert checkpoint.load(fingerprint=(1, 2)) == 0
+
+    checkpoint.advance(10)
+    assert Checkpoint(path).load(fingerprint=(1, 2)) == 0
+    checkpoint.advance(20)
+    assert Checkpoint(path).load(fingerprint=(1, 2)) == 20
+    checkpoint.advance(30)
+    checkpoint.save()
+    assert Checkpoint(path).load(fingerprint=(1, 2)) == 30
+    assert Checkpoint(path).load(fingerprint=(1, 3)) == 0
+
+    with open(path, "w") as f:
+        f.write('{"offset": 4')
+    assert Checkpoint(path).load(fingerprint=(1, 2)) == 0
+
+
+def test_resume_crawl_log(file_server, parser_db, tmp_path, monkeypatch):
+    """
+    Testing if an interrupted run resumes after the last stored repo without looking at the earlier ones
+    """
+    path = str(tmp_path / "repos.jsonl")
+    with CrawlLog(path) as crawl_log:
+        for number in range(4):
+            crawl_log.append(crawled_repo(file_server, number))
+
+    # one repo at a time and in order
+    monkeypatch.setattr(kp, "PLAN_BATCH", 1)
+    monkeypatch.setattr(kp, "PIPELINE_FETCHERS", 1)
+    monkeypatch.setattr(kp, "WRITE_BATCH", 1)
+    insert_repo = kp.insert_repo
+
+    def interrupted(session, repo, list_of_results):
+        if repo["repo_name"] == "repo2":
+            raise KeyboardInterrupt
+        return insert_repo(session, repo, list_of_results)
+
+    monkeypatch.setattr(kp, "insert_repo", interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        with FileFetcher() as fetcher:
+            kp.parse_repos_from_crawl_log(path, fetcher=fetcher)
+    monkeypatch.setattr(kp, "insert_repo", insert_repo)
+
+    planned = []
+    plan_repos = kp.plan_repos
+    monkeypatch.setattr(kp, "plan_repos", lambda repos, *args: planned.extend(repos) or plan_repos(repos, *args))
+    file_server.requests.clear()
+    with FileFetcher() as fetcher:
+        kp.parse_repos_from_crawl_log(path, fetcher=fetcher)
+
+    assert [repo["repo_name"] for repo in planned] == ["repo2", "repo3"]
+    assert sum(file_server.requests.values()) == 2
+    session = parser_db()
+    assert sorted(name for name, in session.query(Repo.name)) == ["repo0", "repo1", "repo2", "repo3"]
+    session.close()
+
+    # new repos appended by the crawler are parsed by the next run
+    with CrawlLog(path) as crawl_log:
+        crawl_log.append(crawled_repo(file_server, 4))
+    planned.clear()
+    with FileFetcher() as fetcher:
+        kp.parse_repos_from_crawl_log(path, fetcher=fetcher)
+    assert [repo["repo_name"] for repo in planned] == ["repo4"]
+
+
+def test_resume_changed_sources(file_server, parser_db, tmp_path, monkeypatch):
+    """
+    Testing if the checkpoint is ignored for rewritten pickle files, rewritten crawl logs and with restart
+    """
+    planned = []
+    plan_repos = kp.plan_repos
+    monkeypatch.setattr(kp, "plan_repos", lambda repos, *args: planned.extend(repos) or plan_repos(repos, *args))
+
+    def parse(function, source, **kwargs):
+        planned.clear()
+        with FileFetcher() as fetcher:
+            function(source, fetcher=fetcher, **kwargs)
+        return [repo["repo_name"] for repo in planned]
+
+    pickle_file = str(tmp_path / "repos.pickle")
+    with open(pickle_file, "wb") as f:
+        pickle.dump([crawled_repo(file_server, number) for number in range(2)], f)
+    assert parse(kp.parse_repos_from_pickle_file, pickle_file) == ["repo0", "repo1"]
+    assert parse(kp.parse_repos_from_pickle_file, pickle_file) == []
+
+    with open(pickle_file, "wb") as f:
+        pickle.dump([crawled_repo(file_server, number) for number in range(3)], f)
+    assert parse(kp.parse_repos_from_pickle_file, pickle_file) == ["repo0", "repo1", "repo2"]
+    assert parse(kp.parse_repos_from_pickle_file, pickle_file, restart=True) == ["repo0", "repo1", "repo2"]
+
+    path = str(tmp_path / "repos.jsonl")
+    with CrawlLog(path) as crawl_log:
+        crawl_log.append(crawled_repo(file_server, 3))
+    assert parse(kp.parse_repos_from_crawl_log, path) == ["repo3"]
+
+    # the crawler drops the repo and appends a longer one, the checkpoint points into its line
+    with CrawlLog(path) as crawl_log:
+        crawl_log.truncate(0)
+        crawl_log.append(dict(crawled_repo(file_server, 4), repo_readme="A much longer readme " * 10))
+    assert parse(kp.parse_repos_from_crawl_log, path) == ["repo4"]
+
+    session = parser_db()
+    assert sorted(name for name, in session.query(Repo.name)) == [f"repo{number}" for number in range(5)]
+    assert session.query(File).count() == 5
+    session.close()
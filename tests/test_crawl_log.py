@@ -0,0 +1,109 @@
+"""
+This file supplies tests for the crawl log, the line-delimited replacement of the repos.pickle file.
+"""
+import pickle
+import kicad_parser as kp
+from libs.FileFetcher import FileFetcher
+from libs.crawl_log import CrawlLog, read_crawl_log, convert_pickle
+from models.base import Base
+from models.files import File
+from models.repos import Repo
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+
+def crawled_repo(number, kicad_urls=()):
+    return {
+        "repo_url": f"https://github.com/test/repo{number}", "repo_name": f"repo{number}",
+        "repo_description": "Test repo", "repo_readme": "Readme Ä", "repo_readme_url": None,
+        "repo_license": b"MIT License", "repo_license_url": None, "stars": 1, "forks": 2,
+        "kicad_urls": list(kicad_urls)
+    }
+
+
+def test_append_and_read(tmp_path):
+    """
+    Testing if the repos are read back in order, with their offsets (license texts may be bytes)
+    """
+    path = str(tmp_path / "repos.jsonl")
+    with CrawlLog(path) as crawl_log:
+        offsets = [crawl_log.append(crawled_repo(number)) for number in range(3)]
+
+    records = list(read_crawl_log(path))
+    assert [offset for offset, _ in records] == offsets
+    assert [repo["repo_url"] for _, repo in records] == [crawled_repo(number)["repo_url"] for number in range(3)]
+    assert records[0][1]["repo_license"] == "MIT License" and records[0][1]["repo_readme"] == "Readme Ä"
+
+    assert [repo["repo_name"] for _, repo in read_crawl_log(path, offsets[0])] == ["repo1", "repo2"]
+
+
+def test_truncated_tail_skipped(tmp_path):
+    """
+    Testing if a partially written last line (killed crawler) and broken lines are skipped
+    """
+    path = tmp_path / "repos.jsonl"
+    with CrawlLog(str(path)) as crawl_log:
+        crawl_log.append(crawled_repo(0))
+    with open(path, "ab") as f:
+        f.write(b"{broken\n")
+    with CrawlLog(str(path)) as crawl_log:
+        crawl_log.append(crawled_repo(1))
+    with open(path, "ab") as f:
+        f.write(b'{"repo_url": "https://github.com/test/re')
+
+    assert [repo["repo_name"] for _, repo in read_crawl_log(str(path))] == ["repo0", "repo1"]
+
+
+def test_truncate(tmp_path):
+    """
+    Testing if repos after an offset are dropped and new ones are appended after it
+    """
+    path = str(tmp_path / "repos.jsonl")
+    with CrawlLog(path) as crawl_log:
+        offset = crawl_log.append(crawled_repo(0))
+        crawl_log.append(crawled_repo(1))
+
+    with CrawlLog(path) as crawl_log:
+        crawl_log.truncate(offset)
+        crawl_log.append(crawled_repo(2))
+
+    assert [repo["repo_name"] for _, repo in read_crawl_log(path)] == ["repo0", "repo2"]
+
+
+def test_convert_pickle(tmp_path):
+    """
+    Testing if the repos of a pickle file are converted
+    """
+    repos = [crawled_repo(number) for number in range(5)]
+    with open(tmp_path / "repos.pickle", "wb") as f:
+        pickle.dump(repos, f)
+
+    assert convert_pickle(str(tmp_path / "repos.pickle"), str(tmp_path / "repos.jsonl")) == 5
+    assert [repo for _, repo in read_crawl_log(str(tmp_path / "repos.jsonl"))] == \
+        [dict(repo, repo_license="MIT License") for repo in repos]
+
+
+def test_parse_crawl_log(file_server, tmp_path, monkeypatch):
+    """
+    Testing if the parser reads the repos of a crawl log, also across several batches
+    """
+    engine = create_engine(f"sqlite:///{tmp_path / 'parser.sqlite'}")
+    Base.metadata.create_all(engine)
+    monkeypatch.setattr(kp, "Session", sessionmaker(bind=engine))
+    monkeypatch.setattr(kp, "PLAN_BATCH", 2)
+
+    path = str(tmp_path / "repos.jsonl")
+    with CrawlLog(path) as crawl_log:
+        for number in range(5):
+            crawl_log.append(crawled_repo(number, [f"{file_server.base_url}/files/demo.kicad_pcb?repo={number}"]))
+        # the same repo again
+        crawl_log.append(crawled_repo(0, [f"{file_server.base_url}/files/demo.kicad_pcb?repo=0"]))
+
+    with FileFetcher() as fetcher:
+        kp.parse_repos_from_crawl_log(path, fetcher=fetcher)
+
+    session = sessionmaker(bind=engine)()
+    assert session.query(Repo).count() == 5
+    assert session.query(File).count() == 5
+    assert {license for license, in session.query(Repo.license)} == {"MIT License"}
+    session.close()
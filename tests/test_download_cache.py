@@ -0,0 +1,138 @@
+"""
+This file supplies tests for the content-addressed download cache: unchanged files are answered with 304 Not Modified
+and read from the cache, identical files are stored and parsed only once.
+"""
+import os
+import pickle
+import kicad_parser as kp
+from libs.DownloadCache import DownloadCache, content_hash
+from libs.FileFetcher import FileFetcher
+from models.base import Base, add_missing_columns
+from models.files import File
+from models.items import Item
+from models.repos import Repo
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.orm import sessionmaker
+from tests.conftest import FIXTURES_DIR
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), "rb") as f:
+        return f.read()
+
+
+def test_not_modified_served_from_cache(file_server, tmp_path):
+    """
+    Testing if a file is only downloaded once and then read from the cache
+    """
+    url = f"{file_server.base_url}/files/demo.kicad_pcb"
+    expected = read_fixture("demo.kicad_pcb")
+
+    for _ in range(2):
+        with FileFetcher(cache=DownloadCache(str(tmp_path / "cache"))) as fetcher:
+            assert bytes(fetcher.fetch(url, binary=True)) == expected
+            assert fetcher.fetch(url) == expected.decode("utf-8")
+
+    assert file_server.requests["/files/demo.kicad_pcb"] == 4
+    assert file_server.not_modified["/files/demo.kicad_pcb"] == 3
+    assert fetcher.downloaded == 0 and fetcher.not_modified == 2
+
+
+def test_contents_stored_once(file_server, tmp_path):
+    """
+    Testing if the same contents under different URLs are stored once
+    """
+    cache = DownloadCache(str(tmp_path / "cache"))
+    with FileFetcher(cache=cache) as fetcher:
+        for number in range(3):
+            fetcher.fetch(f"{file_server.base_url}/files/demo.kicad_pcb?fork={number}", binary=True)
+
+    objects = [name for _, _, names in os.walk(tmp_path / "cache" / "objects") for name in names]
+    assert objects == [content_hash(read_fixture("demo.kicad_pcb"))]
+    assert bytes(cache.get(f"{file_server.base_url}/files/demo.kicad_pcb?fork=2")) == read_fixture("demo.kicad_pcb")
+
+
+def test_missing_contents_downloaded_again(file_server, tmp_path):
+    """
+    Testing if a file is downloaded again when its cached contents have been removed, and if a changed file (different
+    ETag) is not answered with 304
+    """
+    url = f"{file_server.base_url}/files/demo.kicad_pcb"
+    cache = DownloadCache(str(tmp_path / "cache"))
+    with FileFetcher(cache=cache) as fetcher:
+        fetcher.fetch(url)
+        digest = content_hash(read_fixture("demo.kicad_pcb"))
+        os.remove(tmp_path / "cache" / "objects" / digest[:2] / digest)
+        assert fetcher.fetch(url) == read_fixture("demo.kicad_pcb").decode("utf-8")
+
+        cache.put(url, b"(kicad_pcb)", etag='"changed"')
+        assert fetcher.fetch(url) == read_fixture("demo.kicad_pcb").decode("utf-8")
+
+    assert file_server.requests["/files/demo.kicad_pcb"] == 3
+    assert file_server.not_modified["/files/demo.kicad_pcb"] == 0
+    assert bytes(cache.get(url)) == read_fixture("demo.kicad_pcb")
+
+
+def test_identical_files_parsed_once(file_server, tmp_path, monkeypatch):
+    """
+    Testing if identical files of different repos (forks) are parsed once and get the same items
+    """
+    engine = create_engine(f"sqlite:///{tmp_path / 'parser.sqlite'}")
+    Base.metadata.create_all(engine)
+    monkeypatch.setattr(kp, "Session", sessionmaker(bind=engine))
+
+    parsed = []
+    read_modules = kp.read_modules
+    monkeypatch.setattr(kp, "read_modules", lambda contents: parsed.append(contents) or read_modules(contents))
+
+    repos = [{
+        "repo_url": f"https://github.com/fork{number}/repo", "repo_name": "repo", "repo_description": "Test repo",
+        "repo_readme": "Readme", "repo_readme_url": None, "repo_license": None, "repo_license_url": None,
+        "stars": 1, "forks": 2, "kicad_urls": [f"{file_server.base_url}/files/demo.kicad_pcb?fork={number}"]
+    } for number in range(3)]
+    pickle_file = tmp_path / "repos.pickle"
+    with open(pickle_file, "wb") as f:
+        pickle.dump(repos, f)
+
+    with FileFetcher(cache=DownloadCache(str(tmp_path / "cache"))) as fetcher:
+        kp.parse_repos_from_pickle_file(str(pickle_file), fetcher=fetcher)
+
+    assert len(parsed) == 1
+
+    session = sessionmaker(bind=engine)()
+    assert session.query(Repo).count() == 3
+    assert {digest for digest, in session.query(File.content_hash)} == {content_hash(read_fixture("demo.kicad_pcb"))}
+    items = [sorted((item.module, item.reference, item.value)
+                    for item in session.query(Item).filter_by(file_id=file.id)) for file in session.query(File)]
+    assert items[0] and items[0] == items[1] == items[2]
+
+
+def test_add_missing_columns(tmp_path):
+    """
+    Testing if columns added to the models are added to existing databases
+    """
+    engine = create_engine(f"sqlite:///{tmp_path / 'parser.sqlite'}")
+    engine.execute("CREATE TABLE files (id INTEGER PRIMARY KEY, uuid VARCHAR, url VARCHAR, repo_id VARCHAR)")
+    engine.execute("INSERT INTO files (uuid, url) VALUES ('uuid', 'url')")
+    Base.metadata.create_all(engine)
+
+    assert add_missing_columns(engine) == ["files.content_hash", "files.sha"]
+    assert add_missing_columns(engine) == []
+    assert "ix_files_content_hash" in {index["name"] for index in inspect(engine).get_indexes("files")}
+    assert engine.execute("SELECT url, content_hash FROM files").fetchall() == [("url", None)]
+
+
+def test_items_of_file_use_index(tmp_path):
+    """
+    Testing if the items of a file (shared by identical files, replaced by updates) are found without a table scan,
+    also in databases built by older versions
+    """
+    engine = create_engine(f"sqlite:///{tmp_path / 'parser.sqlite'}")
+    engine.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, uuid VARCHAR, module VARCHAR, description VARCHAR, "
+                   "tags VARCHAR, reference VARCHAR, value VARCHAR, part_id VARCHAR, file_id VARCHAR)")
+    Base.metadata.create_all(engine)
+    add_missing_columns(engine)
+
+    assert "ix_items_file_id" in {index["name"] for index in inspect(engine).get_indexes("items")}
+    plan = engine.execute("EXPLAIN QUERY PLAN DELETE FROM items WHERE file_id = '1'").fetchall()
+    assert "ix_items_file_id" in " ".join(row[-1] for row in plan)
@@ -0,0 +1,98 @@
+"""
+This file supplies tests for the concurrent download of KiCad files.
+"""
+import os
+import pickle
+import pytest
+import kicad_parser as kp
+from libs.FileFetcher import FileFetcher
+from models.base import Base
+from models.files import File
+from models.items import Item
+from models.repos import Repo
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from tests.conftest import FIXTURES_DIR
+
+
+def test_fetch_file(file_server):
+    """
+    Testing if a file is downloaded
+    """
+    with open(os.path.join(FIXTURES_DIR, "demo.kicad_pcb")) as f:
+        expected = f.read()
+
+    with FileFetcher() as fetcher:
+        assert fetcher.fetch(f"{file_server.base_url}/files/demo.kicad_pcb") == expected
+        assert fetcher.fetch(f"{file_server.base_url}/files/demo.kicad_pcb", binary=True) == expected.encode()
+
+
+def test_fetch_errors(file_server):
+    """
+    Testing if missing files and server errors raise the same errors as before
+    """
+    with FileFetcher(retries=1, backoff=0) as fetcher:
+        with pytest.raises(FileNotFoundError):
+            fetcher.fetch(f"{file_server.base_url}/files/missing.kicad_pcb")
+
+        with pytest.raises(ConnectionError, match=".*status: 500*."):
+            fetcher.fetch(f"{file_server.base_url}/status/500")
+
+    # the request and one retry
+    assert file_server.requests["/status/500"] == 2
+
+
+def test_fetch_retries(file_server):
+    """
+    Testing if rate limited and failed requests are retried
+    """
+    with FileFetcher(retries=3, backoff=0) as fetcher:
+        assert fetcher.fetch(f"{file_server.base_url}/flaky/2/503/demo.kicad_pcb")
+        assert fetcher.fetch(f"{file_server.base_url}/flaky/1/429/demo.kicad_pcb")
+
+    assert file_server.requests["/flaky/2/503/demo.kicad_pcb"] == 3
+    assert file_server.requests["/flaky/1/429/demo.kicad_pcb"] == 2
+
+
+def test_fetch_all_keeps_order(file_server):
+    """
+    Testing if concurrent downloads are returned in order, together with their errors
+    """
+    urls = [f"{file_server.base_url}/files/demo.kicad_pcb", f"{file_server.base_url}/files/missing.kicad_pcb"] * 20
+
+    with FileFetcher(workers=4, per_host=2) as fetcher:
+        results = list(fetcher.fetch_all(urls))
+
+    assert [url for url, _, _ in results] == urls
+    assert all(contents and error is None for _, contents, error in results[::2])
+    assert all(contents is None and isinstance(error, FileNotFoundError) for _, contents, error in results[1::2])
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_parse_repos_from_local_files(file_server, tmp_path, monkeypatch, workers):
+    """
+    Testing if the parser stores the repos and files served by the stand-in (also with parse worker processes)
+    """
+    engine = create_engine(f"sqlite:///{tmp_path / 'parser.sqlite'}")
+    Base.metadata.create_all(engine)
+    monkeypatch.setattr(kp, "Session", sessionmaker(bind=engine))
+
+    repos = [{
+        "repo_url": f"https://github.com/test/repo{number}", "repo_name": f"repo{number}",
+        "repo_description": "Test repo", "repo_readme": "Readme", "repo_readme_url": None, "repo_license": None,
+        "repo_license_url": None, "stars": 1, "forks": 2,
+        "kicad_urls": [f"{file_server.base_url}/files/demo.kicad_pcb?repo={number}",
+                       f"{file_server.base_url}/files/missing.kicad_pcb?repo={number}"]
+    } for number in range(3)]
+    pickle_file = tmp_path / "repos.pickle"
+    with open(pickle_file, "wb") as f:
+        pickle.dump(repos, f)
+
+    with FileFetcher() as fetcher:
+        kp.parse_repos_from_pickle_file(str(pickle_file), fetcher=fetcher, workers=workers)
+
+    session = sessionmaker(bind=engine)()
+    assert session.query(Repo).count() == 3
+    assert session.query(File).count() == 3
+    values = sorted(value for value, in session.query(Item.value).distinct())
+    assert values == ["ATMEGA328P-AU", "ESP-12E", "STM32F103C8Tx"]
@@ -0,0 +1,135 @@
+"""
+This file supplies tests for the incremental mode of the parser, which updates repos that changed since the last run.
+"""
+import os
+import pickle
+import pytest
+import kicad_parser as kp
+from libs.FileFetcher import FileFetcher
+from models.base import Base
+from models.files import File
+from models.items import Item
+from models.repos import Repo
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from tests.conftest import FIXTURES_DIR
+
+
+@pytest.fixture
+def parser_db(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'parser.sqlite'}")
+    Base.metadata.create_all(engine)
+    monkeypatch.setattr(kp, "Session", sessionmaker(bind=engine))
+    return sessionmaker(bind=engine)
+
+
+@pytest.fixture
+def board_server(file_server, tmp_path):
+    """
+    Serves boards from a temporary directory, initially a.kicad_pcb and b.kicad_pcb (with a different MCU).
+    """
+    with open(os.path.join(FIXTURES_DIR, "demo.kicad_pcb")) as f:
+        contents = f.read()
+    file_server.files_dir = str(tmp_path / "boards")
+    os.mkdir(file_server.files_dir)
+    write_board(file_server, "a.kicad_pcb", contents)
+    write_board(file_server, "b.kicad_pcb", contents.replace("ESP-12E", "ESP-WROOM-32"))
+    file_server.demo = contents
+    return file_server
+
+
+def write_board(server, name, contents):
+    with open(os.path.join(server.files_dir, name), "w") as f:
+        f.write(contents)
+
+
+def parse(server, tmp_path, names, pushed_at, shas, stars=1, incremental=True):
+    repo = {
+        "repo_url": "https://github.com/test/repo", "repo_name": "repo", "repo_description": "Test repo",
+        "repo_readme": "Readme", "repo_readme_url": None, "repo_license": None, "repo_license_url": None,
+        "stars": stars, "forks": 2, "pushed_at": pushed_at,
+        "kicad_urls": [f"{server.base_url}/files/{name}" for name in names],
+        "kicad_shas": {f"{server.base_url}/files/{name}": sha for name, sha in zip(names, shas)},
+    }
+    pickle_file = tmp_path / "repos.pickle"
+    with open(pickle_file, "wb") as f:
+        pickle.dump([repo], f)
+
+    server.requests.clear()
+    with FileFetcher() as fetcher:
+        kp.parse_repos_from_pickle_file(str(pickle_file), fetcher=fetcher, incremental=incremental)
+
+
+def stored_values(session_factory):
+    session = session_factory()
+    try:
+        return {url.rsplit("/", 1)[1]: sorted(value for value, in session.query(Item.value).filter_by(file_id=file_id))
+                for file_id, url in session.query(File.id, File.url)}
+    finally:
+        session.close()
+
+
+def test_changed_files_updated(board_server, parser_db, tmp_path):
+    """
+    Testing if changed and added files are parsed again, removed files are deleted and the stars are updated
+    """
+    parse(board_server, tmp_path, ["a.kicad_pcb", "b.kicad_pcb"], "2020-01-01T00:00:00", ["sha-a", "sha-b"])
+    assert stored_values(parser_db) == {"a.kicad_pcb": ["ATMEGA328P-AU", "ESP-12E", "STM32F103C8Tx"],
+                                        "b.kicad_pcb": ["ATMEGA328P-AU", "ESP-WROOM-32", "STM32F103C8Tx"]}
+
+    write_board(board_server, "a.kicad_pcb", board_server.demo.replace("ATMEGA328P-AU", "ATMEGA32U4-AU"))
+    write_board(board_server, "c.kicad_pcb", board_server.demo)
+    parse(board_server, tmp_path, ["a.kicad_pcb", "c.kicad_pcb"], "2020-02-01T00:00:00", ["sha-a2", "sha-c"],
+          stars=5)
+
+    assert stored_values(parser_db) == {"a.kicad_pcb": ["ATMEGA32U4-AU", "ESP-12E", "STM32F103C8Tx"],
+                                        "c.kicad_pcb": ["ATMEGA328P-AU", "ESP-12E", "STM32F103C8Tx"]}
+    session = parser_db()
+    assert [(repo.stars, repo.pushed_at) for repo in session.query(Repo)] == [(5, "2020-02-01T00:00:00")]
+    assert session.query(Item).filter(Item.file_id.notin_(session.query(File.id))).count() == 0
+    session.close()
+
+
+def test_unchanged_repos_not_touched(board_server, parser_db, tmp_path):
+    """
+    Testing if unchanged repos and files are not downloaded again and only the stars and forks are updated
+    """
+    parse(board_server, tmp_path, ["a.kicad_pcb", "b.kicad_pcb"], "2020-01-01T00:00:00", ["sha-a", "sha-b"])
+    session = parser_db()
+    item_ids = sorted(item_id for item_id, in session.query(Item.id))
+    session.close()
+
+    # same push
+    parse(board_server, tmp_path, ["a.kicad_pcb", "b.kicad_pcb"], "2020-01-01T00:00:00", ["sha-a", "sha-b"])
+    assert sum(board_server.requests.values()) == 0
+
+    parse(board_server, tmp_path, ["a.kicad_pcb", "b.kicad_pcb"], "2020-01-01T00:00:00", ["sha-a", "sha-b"], stars=7)
+    assert sum(board_server.requests.values()) == 0
+
+    # new push, but only b.kicad_pcb has changed
+    parse(board_server, tmp_path, ["a.kicad_pcb", "b.kicad_pcb"], "2020-03-01T00:00:00", ["sha-a", "sha-b2"],
+          stars=7)
+    assert dict(board_server.requests) == {"/files/b.kicad_pcb": 1}
+
+    # without SHAs (older crawler), unchanged files are recognised by their contents
+    parse(board_server, tmp_path, ["a.kicad_pcb", "b.kicad_pcb"], "2020-04-01T00:00:00", [None, None], stars=7)
+    assert dict(board_server.requests) == {"/files/a.kicad_pcb": 1, "/files/b.kicad_pcb": 1}
+
+    session = parser_db()
+    assert sorted(item_id for item_id, in session.query(Item.id)) == item_ids
+    assert [repo.stars for repo in session.query(Repo)] == [7]
+    session.close()
+
+
+def test_parsed_repos_skipped_without_incremental(board_server, parser_db, tmp_path):
+    """
+    Testing if repos that have already been parsed are still skipped without the incremental mode
+    """
+    parse(board_server, tmp_path, ["a.kicad_pcb"], "2020-01-01T00:00:00", ["sha-a"], incremental=False)
+    parse(board_server, tmp_path, ["b.kicad_pcb"], "2020-02-01T00:00:00", ["sha-b"], stars=5, incremental=False)
+
+    assert sum(board_server.requests.values()) == 0
+    assert list(stored_values(parser_db)) == ["a.kicad_pcb"]
+    session = parser_db()
+    assert [repo.stars for repo in session.query(Repo)] == [1]
+    session.close()
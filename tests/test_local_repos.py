@@ -0,0 +1,201 @@
+"""
+This file supplies tests for parsing repos from local directories and git clones.
+"""
+import os
+import shutil
+import subprocess
+import pytest
+import kicad_parser as kp
+from libs.local_repos import LocalFetcher, clone_repo, find_repos, git_blob_sha, local_repo
+from models.base import Base
+from models.files import File
+from models.items import Item
+from models.repos import Repo
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "demo.kicad_pcb")
+
+requires_git = pytest.mark.skipif(shutil.which("git") is None, reason="git is not installed")
+
+
+def git(directory, *args):
+    subprocess.run(["git", "-C", str(directory), "-c", "user.name=Test", "-c", "user.email=test@example.com", *args],
+                   check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def make_repo(directory, remote=None):
+    os.makedirs(directory / "hardware")
+    shutil.copy(FIXTURE, directory / "hardware" / "board.kicad_pcb")
+    (directory / "README.md").write_text("Test readme")
+    git(directory, "init", "--quiet", "--initial-branch=main")
+    if remote is not None:
+        git(directory, "remote", "add", "origin", remote)
+    git(directory, "add", ".")
+    git(directory, "commit", "--quiet", "-m", "Board")
+
+
+@pytest.fixture
+def parser_db(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'parser.sqlite'}")
+    Base.metadata.create_all(engine)
+    monkeypatch.setattr(kp, "Session", sessionmaker(bind=engine))
+    return sessionmaker(bind=engine)
+
+
+def test_git_blob_sha():
+    """
+    Testing if the SHAs of the files are the ones of git (and GitHub)
+    """
+    assert git_blob_sha(b"") == "e69de29bb2d1d6434b8b29ae775ad8c2e48c5391"
+    assert git_blob_sha(b"hello\n") == "ce013625030ba8dba906f756967f9e9ca394464a"
+
+
+def test_plain_directory(tmp_path, parser_db):
+    """
+    Testing if a directory without git is parsed as a single repo with file URLs
+    """
+    os.makedirs(tmp_path / "boards" / "sub")
+    shutil.copy(FIXTURE, tmp_path / "boards" / "sub" / "demo.kicad_pcb")
+    os.makedirs(tmp_path / "boards" / ".hidden")
+    shutil.copy(FIXTURE, tmp_path / "boards" / ".hidden" / "ignored.kicad_pcb")
+
+    assert find_repos(str(tmp_path / "boards")) == [str(tmp_path / "boards")]
+    kp.parse_repos_from_directory(str(tmp_path / "boards"))
+
+    session = parser_db()
+    assert [(repo.name, repo.repo_url) for repo in session.query(Repo)] == [
+        ("boards", (tmp_path / "boards").as_uri())]
+    assert [file.url for file in session.query(File)] == [(tmp_path / "boards" / "sub" / "demo.kicad_pcb").as_uri()]
+    assert session.query(Item).count() > 0
+    session.close()
+
+
+def test_memory_mapped_files_in_worker_processes(tmp_path, parser_db):
+    """
+    Testing if the memory-mapped files of a directory are parsed by worker processes, and empty files skipped
+    """
+    os.makedirs(tmp_path / "boards")
+    shutil.copy(FIXTURE, tmp_path / "boards" / "demo.kicad_pcb")
+    (tmp_path / "boards" / "empty.kicad_pcb").write_bytes(b"")
+
+    fetcher = LocalFetcher()
+    local_repo(str(tmp_path / "boards"), fetcher)
+    with open(FIXTURE, "rb") as f:
+        assert bytes(fetcher.fetch((tmp_path / "boards" / "demo.kicad_pcb").as_uri(), binary=True)) == f.read()
+
+    kp.parse_repos_from_directory(str(tmp_path / "boards"), workers=2)
+
+    session = parser_db()
+    assert [file.url for file in session.query(File)] == [(tmp_path / "boards" / "demo.kicad_pcb").as_uri()]
+    assert session.query(Item).count() > 0
+    session.close()
+
+
+@requires_git
+def test_mirrored_repos(tmp_path, parser_db):
+    """
+    Testing if the git repos of a directory tree get the URLs of GitHub and unchanged repos are skipped
+    """
+    make_repo(tmp_path / "mirror" / "test" / "board", remote="git@github.com:test/board.git")
+    make_repo(tmp_path / "mirror" / "other", remote="https://example.com/other.git")
+
+    fetcher = LocalFetcher()
+    repo = local_repo(str(tmp_path / "mirror" / "test" / "board"), fetcher)
+    url = "https://raw.githubusercontent.com/test/board/main/hardware/board.kicad_pcb"
+    assert repo["repo_url"] == "https://github.com/test/board" and repo["kicad_urls"] == [url]
+    with open(FIXTURE, "rb") as f:
+        assert repo["kicad_shas"] == {url: git_blob_sha(f.read())}
+    assert repo["repo_readme"] == "Test readme"
+
+    kp.parse_repos_from_directory(str(tmp_path / "mirror"))
+    session = parser_db()
+    assert sorted(name for name, in session.query(Repo.name)) == ["board", "other"]
+    assert session.query(File).count() == 2
+    items = session.query(Item).count()
+    session.close()
+
+    # the SHAs are unchanged, nothing is read again
+    kp.parse_repos_from_directory(str(tmp_path / "mirror"), incremental=True)
+    session = parser_db()
+    assert session.query(File).count() == 2 and session.query(Item).count() == items
+    session.close()
+
+
+@requires_git
+def test_git_clones(tmp_path, parser_db):
+    """
+    Testing if git repos are cloned, parsed and updated by the next run
+    """
+    make_repo(tmp_path / "origin")
+    clone_dir = tmp_path / "clones"
+    kp.parse_repos_from_git([str(tmp_path / "origin"), str(tmp_path / "missing")], clone_dir=str(clone_dir))
+
+    session = parser_db()
+    assert [repo.repo_url for repo in session.query(Repo)] == [str(tmp_path / "origin")]
+    assert session.query(Item).count() > 0
+    session.close()
+
+    os.remove(tmp_path / "origin" / "hardware" / "board.kicad_pcb")
+    git(tmp_path / "origin", "commit", "--quiet", "-am", "Remove board")
+    (tmp_path / "origin" / "empty.kicad_pcb").write_text("")
+    git(tmp_path / "origin", "add", ".")
+    git(tmp_path / "origin", "commit", "--quiet", "-m", "Empty board")
+    kp.parse_repos_from_git([str(tmp_path / "origin")], incremental=True, clone_dir=str(clone_dir))
+
+    session = parser_db()
+    assert session.query(File).count() == 0 and session.query(Item).count() == 0
+    session.close()
+
+
+@requires_git
+def test_clone_to_relative_directory(tmp_path, monkeypatch):
+    """
+    Testing if a relative clone directory is read from the working directory, not from inside itself
+    """
+    make_repo(tmp_path / "origin")
+    monkeypatch.chdir(tmp_path)
+    directory = clone_repo(str(tmp_path / "origin"), os.path.join("cache", "clones"))
+
+    assert os.path.dirname(directory) == str(tmp_path / "cache" / "clones")
+    assert os.path.exists(os.path.join(directory, "hardware", "board.kicad_pcb"))
+    assert not os.path.exists(tmp_path / "cache" / "clones" / "cache")
+
+    # the update of the clone finds it again
+    assert clone_repo(str(tmp_path / "origin"), os.path.join("cache", "clones")) == directory
+
+
+@requires_git
+def test_mirror_of_crawled_repo(tmp_path, parser_db, monkeypatch):
+    """
+    Testing if a mirror of a crawled repo keeps the stars, forks, description and pushed_at of GitHub, and is skipped
+    once all of its files are stored
+    """
+    session = parser_db()
+    session.add(Repo(repo_url="https://github.com/test/board", name="board", description="Crawled", stars=42, forks=7,
+                     pushed_at="2020-01-01T00:00:00Z"))
+    session.commit()
+    session.close()
+    make_repo(tmp_path / "mirror", remote="https://github.com/test/board.git")
+
+    kp.parse_repos_from_directory(str(tmp_path / "mirror"), incremental=True)
+    session = parser_db()
+    repo = session.query(Repo).one()
+    assert (repo.description, repo.stars, repo.forks, repo.pushed_at) == ("Crawled", 42, 7, "2020-01-01T00:00:00Z")
+    assert repo.readme == "Test readme" and session.query(File).count() == 1
+    session.close()
+
+    updates = []
+    apply_repo_update = kp.apply_repo_update
+    monkeypatch.setattr(kp, "apply_repo_update", lambda *args: updates.append(args) or apply_repo_update(*args))
+    kp.parse_repos_from_directory(str(tmp_path / "mirror"), incremental=True)
+    assert updates == []
+
+    # a changed readme is updated, the information of GitHub is still kept
+    (tmp_path / "mirror" / "README.md").write_text("New readme")
+    kp.parse_repos_from_directory(str(tmp_path / "mirror"), incremental=True)
+    assert len(updates) == 1
+    session = parser_db()
+    repo = session.query(Repo).one()
+    assert (repo.readme, repo.stars, repo.description) == ("New readme", 42, "Crawled")
+    session.close()
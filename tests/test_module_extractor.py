@@ -0,0 +1,142 @@
+"""
+This file supplies tests for the fast module extractor. Its results have to be identical to reading the modules from
+the full KicadPCB object model.
+"""
+import mmap
+import os
+import pytest
+import kicad_parser as kp
+from libs.realthunder_kicad_parser import KicadPCB, scan_modules, UnsupportedSexp
+from tests.conftest import FIXTURES_DIR
+
+# Boards with the quirks of the full parser: quotes are kept, numbers are converted, lines are joined without
+# separator, "locked" and "hide" are flags, brackets and quotes inside strings and atoms
+TRICKY_BOARDS = [
+    '(kicad_pcb (version 20171130)\n'
+    '  (net 1 "Net-(U1-Pad1)")\n'
+    '  (zone (net 1) (net_name "/A)(B") (polygon (pts (xy 1 2) (xy 3 4))))\n'
+    '  (module locked Package_TO_SOT_THT:TO-220-3 (layer F.Cu)\n'
+    '    (descr "TO-220, (vertical)")\n'
+    '    (tags TO-220 3)\n'
+    '    (fp_text reference U1 (at 0 0) (layer F.SilkS) hide)\n'
+    '    (fp_text value 7805 (at 0 1) (layer F.Fab))\n'
+    '    (fp_text user %R (at 0 2) (layer F.Fab))\n'
+    '  )\n'
+    '  (segment (start 1 2) (end 3 4) (width 0.25) (layer F.Cu) (net 1))\n'
+    '  (module Crystal:HC49 (fp_text value 16MHz) (fp_text reference\nY1)\n'
+    '    (descr multi\nword) (tags a"b "c(d)"))\n'
+    '  (gr_text "text with quotes( and brackets" (at 1 2))\n'
+    ')\n',
+
+    '(kicad_pcb (version 4) (module A:B (fp_text value 1.5e3)) (module "Quoted:Name" (fp_text value ""))\n)',
+
+    '(kicad_pcb (version 4))',
+]
+
+
+def test_identical_to_object_model_for_fixture():
+    """
+    Testing if the fixture board gives the same modules as the full parser
+    """
+    with open(os.path.join(FIXTURES_DIR, "demo.kicad_pcb")) as f:
+        contents = f.read()
+
+    assert scan_modules(contents) == kp.load_modules(contents)
+    assert len(scan_modules(contents)) == 6
+
+
+@pytest.mark.parametrize("contents", TRICKY_BOARDS)
+def test_identical_to_object_model_for_quirks(contents):
+    """
+    Testing if boards with quirks give the same modules as the full parser
+    """
+    assert scan_modules(contents) == kp.load_modules(contents)
+
+
+@pytest.mark.parametrize("contents", TRICKY_BOARDS + [
+    # the quote after the line break continues the atom "a", the bracket inside is not skipped as a string
+    '(kicad_pcb (gr_text a\n"b (c" (at 1 2))) (module A:B (fp_text reference U1) (fp_text value X1)))',
+    '(kicad_pcb (gr_text "a"\r\n"b (c" (at 1 2)) (module A:B (fp_text reference U1) (fp_text value X1)))',
+])
+def test_memory_mapped_board(tmp_path, contents):
+    """
+    Testing if a memory-mapped board, tokenized in place, gives the same modules as its text
+    """
+    path = tmp_path / "board.kicad_pcb"
+    path.write_bytes(contents.encode("utf-8"))
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        assert scan_modules(mapped) == scan_modules(contents) == kp.load_modules(contents)
+
+
+@pytest.mark.parametrize("contents", [
+    '(kicad_pcb (module A:B (fp_text reference U1) (fp_text value X1) (descr one) (descr two)))',
+    '(kicad_pcb (module A:B (fp_text reference U1) (fp_text value X1) (descr (nested form))))',
+])
+def test_unsupported_boards_fall_back(contents):
+    """
+    Testing if modules the fast path can not read are read with the full parser
+    """
+    with pytest.raises(UnsupportedSexp):
+        scan_modules(contents)
+
+    (name, descr, tags, reference, value), = kp.extract_modules(contents)
+    assert (name, tags, reference, value) == ("A:B", None, "U1", "X1")
+    assert type(descr) is type(kp.load_modules(contents)[0]["descr"])
+
+
+@pytest.mark.parametrize("contents", [
+    '(kicad_pcb (zone 1))',
+    '(kicad_pcb (module A:B)',
+    '(kicad_pcb (module A:B)))',
+    'sdc',
+    '',
+])
+def test_broken_boards_fall_back(contents):
+    """
+    Testing if broken boards are left to the full parser, so that its errors are kept
+    """
+    with pytest.raises(UnsupportedSexp):
+        scan_modules(contents)
+
+    with pytest.raises(Exception) as expected:
+        kp.load_modules(contents)
+    with pytest.raises(expected.type):
+        kp.extract_modules(contents)
+
+
+@pytest.mark.parametrize("contents", TRICKY_BOARDS + [
+    '(kicad_pcb (zone 1))',
+    '(kicad_pcb (zone 1) (module A:B (fp_text value X1)))',
+    '(kicad_pcb (module A:B)',
+    '(kicad_pcb () (module) (module (a)) ((x)) (module A:B (fp_text reference U1) (segment (a 1))))',
+    '(kicad_pcb (module (tags a b) (segment (a 1)))',
+    'sdc',
+    '',
+])
+def test_streamed_modules_identical_to_object_model(contents):
+    """
+    Testing if reading the modules one by one gives the same modules (and errors) as reading the whole board
+    """
+    try:
+        expected = [kp.module_fields(module) for module in KicadPCB.load_contents(contents).module]
+    except Exception as e:
+        with pytest.raises(type(e)):
+            kp.load_modules(contents)
+        return
+
+    assert repr(kp.load_modules(contents)) == repr(expected)
+
+
+@pytest.mark.parametrize("descr", ['"Capteur \xe0 effet Hall"', '(nested "\xe0")'])
+def test_non_utf8_board(descr):
+    """
+    Testing if bytes that are not UTF-8 (a Latin-1 board) are replaced, on the fast path and the full parser
+    """
+    contents = f'(kicad_pcb (version 4) (module A:B (descr {descr}) (fp_text reference U1) (fp_text value A1324\xe9)))'
+    (name, _, _, reference, value), = kp.extract_modules(contents.encode("latin-1"))
+    assert (name, reference, value) == ("A:B", "U1", "A1324\ufffd")
+
+    # the description is left out, read as a form by the full parser it does not compare equal
+    decoded = contents.encode("latin-1").decode("utf-8", errors="replace")
+    assert [module[2:] for module in kp.read_modules(contents.encode("latin-1"))] == \
+        [module[2:] for module in kp.read_modules(decoded)]
@@ -0,0 +1,61 @@
+"""
+This file supplies tests for removing duplicate and common modules of KiCad files.
+"""
+import os
+import pytest
+from libs.ModuleFilter import ModuleFilter
+
+
+def module(name, reference, value):
+    return {"module": name, "descr": None, "tags": None, "reference": reference, "value": value}
+
+
+def test_deduplicate():
+    """
+    Testing if only the first module of the same name and value is kept, also for values that can not be hashed
+    """
+    modules = [module("A", "U1", "X"), module("A", "U2", "X"), module("B", "U3", "X"), module("A", "U4", ["Y", 1]),
+               module("A", "U5", ["Y", 1])]
+
+    assert ModuleFilter().deduplicate(modules) == [modules[0], modules[2], modules[3]]
+
+
+def test_clean(tmp_path):
+    """
+    Testing if common symbols, common components and excluded values are removed
+    """
+    excluded = tmp_path / "excluded_values.txt"
+    excluded.write_text("GND\nsda\n")
+    modules = [module("A", "R1", "STM32"), module("A", "SW12", "STM32"), module("A", "U1", "10K"),
+               module("A", "U2", "conn_01x02"), module("A", "U3", "gnd"), module("A", "U4", "SDA"),
+               module("A", "U6", "STM32"), module("A", "RU7", "ESP32")]
+
+    assert ModuleFilter(str(excluded)).clean(modules) == [modules[6], modules[7]]
+
+
+def test_clean_without_text():
+    """
+    Testing if references and values that are not text still raise a TypeError, which skips the file
+    """
+    with pytest.raises(TypeError):
+        ModuleFilter().clean([module("A", None, "STM32")])
+    with pytest.raises(TypeError):
+        ModuleFilter().clean([module("A", "U1", 5)])
+
+
+def test_excluded_values_reloaded(tmp_path):
+    """
+    Testing if the excluded values are read again after the file has been changed
+    """
+    excluded = tmp_path / "excluded_values.txt"
+    module_filter = ModuleFilter(str(excluded))
+    modules = [module("A", "U1", "STM32"), module("A", "U2", "ESP32")]
+
+    assert module_filter.clean(modules) == modules
+
+    excluded.write_text("stm32\n")
+    assert module_filter.clean(modules) == [modules[1]]
+
+    excluded.write_text("ESP32\n")
+    os.utime(excluded, ns=(0, os.stat(excluded).st_mtime_ns + 1))
+    assert module_filter.clean(modules) == [modules[0]]
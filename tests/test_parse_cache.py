@@ -0,0 +1,83 @@
+"""
+This file supplies tests for the persistent cache of the modules read from KiCad files.
+"""
+import os
+import pytest
+import kicad_parser as kp
+from libs.DownloadCache import content_hash
+from libs.ParseCache import ParseCache
+from tests.conftest import FIXTURES_DIR
+
+
+def test_get_put(tmp_path):
+    """
+    Testing if the modules are returned as stored, also after re-opening the cache
+    """
+    modules = [("Package_QFP:LQFP-48", "LQFP, 48 Pin", None, "U1", "STM32"), ("A", ["B", 1], 2, "U2", 7805.5)]
+
+    cache = ParseCache(str(tmp_path / "parsed.sqlite"))
+    assert cache.get("hash") is None
+    cache.put("hash", modules)
+    assert cache.get("hash") == [modules[0], ("A", ["B", 1], 2, "U2", 7805.5)]
+    cache.close()
+
+    cache = ParseCache(str(tmp_path / "parsed.sqlite"))
+    assert cache.get("hash") == [modules[0], ("A", ["B", 1], 2, "U2", 7805.5)]
+    assert (cache.hits, cache.misses, cache.hit_rate) == (1, 0, 1.0)
+
+
+def test_least_recently_used_evicted(tmp_path):
+    """
+    Testing if the least recently used entries are evicted once the cache is full
+    """
+    cache = ParseCache(str(tmp_path / "parsed.sqlite"), max_bytes=2000)
+    modules = [[(f"Module{n}-{i}", os.urandom(8).hex(), None, f"U{i}", "STM32") for i in range(5)] for n in range(20)]
+
+    for n, entry in enumerate(modules):
+        cache.put(f"hash{n}", entry)
+        # the first entry is used all the time
+        assert cache.get("hash0") == modules[0]
+
+    assert cache.get("hash19") == modules[19]
+    assert cache.get("hash1") is None
+    assert cache._store.size <= 2000
+
+
+def test_parsed_once(tmp_path, monkeypatch):
+    """
+    Testing if a file is only read once and the cached modules are filtered like freshly read ones
+    """
+    with open(os.path.join(FIXTURES_DIR, "demo.kicad_pcb"), "rb") as f:
+        contents = f.read()
+    expected = kp.extract_modules(contents)
+
+    monkeypatch.setattr(kp, "parse_cache", ParseCache(str(tmp_path / "parsed.sqlite")))
+    parsed = []
+    read_modules = kp.read_modules
+    monkeypatch.setattr(kp, "read_modules", lambda contents: parsed.append(contents) or read_modules(contents))
+
+    assert kp.cached_extract_modules(contents) == expected
+    assert kp.cached_extract_modules(contents) == expected
+    downloads = [(f"url{n}", contents, None) for n in range(3)]
+    assert [modules for _, modules, _, _ in kp.extract_all(downloads, parse_cache=kp.parse_cache)] == [expected] * 3
+
+    assert len(parsed) == 1
+    assert (kp.parse_cache.hits, kp.parse_cache.misses) == (4, 1)
+    assert kp.parse_cache.get(content_hash(contents)) == read_modules(contents)
+
+
+def test_empty_files_raise(tmp_path, monkeypatch):
+    """
+    Testing if files without relevant modules still raise a TypeError when read from the cache
+    """
+    # not a KiCad file, would raise an AssertionError if it was parsed again
+    contents = b"(a (b c)"
+    cache = ParseCache(str(tmp_path / "parsed.sqlite"))
+    cache.put(content_hash(contents), [("A", None, None, "R1", "10K")])
+
+    (_, modules, error, _), = kp.extract_all([("url", contents, None)], parse_cache=cache)
+    assert modules is None and isinstance(error, TypeError)
+
+    monkeypatch.setattr(kp, "parse_cache", cache)
+    with pytest.raises(TypeError):
+        kp.cached_extract_modules(contents)
@@ -26,6 +26,7 @@ else:
     print("Do not understand the db file config. Continuing nevertheless...")
 
 # Init SQLAlchemy
+kp.init_parser()
 engine = create_engine(config["DATABASE"]["database-uri"])
 
 # Init SQLAlchemy
@@ -221,3 +222,22 @@ def test_from_file_contents_with_emptyWrongParameters():
         if data is None:
             check = False
         assert check is True
+
+
+# Test Suite for storing parsed files
+# Mark key used: storeRepo
+# Command to run Test Cases for Test Suite 1
+# Positive Test Cases: pytest -m storeRepo tests/test_parser.py
+
+
+@pytest.mark.storeRepo
+def test_item_row_validation():
+    """
+    Test Case 13: Testing that numbers are stored as text and modules with other fields are rejected
+    """
+    row = kp.item_row(("Package_TO_SOT_THT:TO-220-3_Vertical", None, '"TO-220"', "U1", 7805))
+    assert row["value"] == "7805"
+    assert row["description"] is None
+    assert row["module"] == "Package_TO_SOT_THT:TO-220-3_Vertical"
+
+    assert kp.item_row(("Package_QFP:LQFP-48", None, None, "U1", ["STM32", "F103"])) is None
@@ -0,0 +1,220 @@
+"""
+This file supplies tests for the staged pipeline of the parser.
+"""
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import threading
+import time
+import pytest
+import kicad_parser as kp
+from libs.FileFetcher import FileFetcher
+from libs.Pipeline import Pipeline, Stage, Watermark
+from models.base import Base
+from models.files import File
+from models.items import Item
+from models.repos import Repo
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+
+def test_pipeline_results():
+    """
+    Testing if all items pass all stages and the stats count them
+    """
+    pipeline = Pipeline(range(100), [Stage("double", lambda x: 2 * x, width=4), Stage("inc", lambda x: x + 1)],
+                        queue_size=4)
+    assert sorted(pipeline) == [2 * x + 1 for x in range(100)]
+    pipeline.close()
+
+    stats = pipeline.stats()
+    assert [(s["name"], s["width"], s["items"]) for s in stats] == [("double", 4, 100), ("inc", 1, 100)]
+    assert all(s["max_depth"] <= 4 for s in stats)
+    assert "double" in pipeline.report()
+
+
+def test_pipeline_backpressure():
+    """
+    Testing if a slow consumer keeps the source from reading ahead more than the queues hold
+    """
+    pipeline = Pipeline(range(1000), [Stage("identity", lambda x: x)], queue_size=2).start()
+    time.sleep(0.3)
+    # two queues of two items, one item held by the stage and one by the source
+    assert pipeline.read <= 6
+    pipeline.close()
+
+
+def test_pipeline_errors():
+    """
+    Testing if an error of a stage is raised to the consumer and ends the pipeline
+    """
+    def fail(x):
+        if x == 5:
+            raise ValueError("broken item")
+        return x
+
+    pipeline = Pipeline(range(1000), [Stage("fail", fail, width=2)], queue_size=2)
+    with pytest.raises(ValueError):
+        list(pipeline)
+    pipeline.close()
+    assert pipeline.read < 1000
+
+
+def test_pipeline_stop_drains():
+    """
+    Testing if the items read before stop() are still returned
+    """
+    release = threading.Event()
+
+    def wait(x):
+        release.wait()
+        return x
+
+    pipeline = Pipeline(range(1000), [Stage("wait", wait)], queue_size=2).start()
+    time.sleep(0.2)
+    pipeline.stop()
+    release.set()
+    results = list(pipeline)
+    pipeline.close()
+    assert results == list(range(pipeline.read))
+    assert pipeline.read < 1000
+
+
+def test_watermark():
+    """
+    Testing if the watermark only moves past items that have all been finished
+    """
+    watermark = Watermark()
+    assert watermark.finish(1, "b") is None
+    assert watermark.finish(2, "c") is None
+    assert watermark.finish(0, "a") == "c"
+    assert watermark.finish(4, "e") is None
+    assert watermark.finish(3, "d") == "e"
+
+
+def test_parse_repos_batches(file_server, tmp_path, monkeypatch):
+    """
+    Testing if the repos are stored with all of their files when written in batches by the pipeline
+    """
+    engine = create_engine(f"sqlite:///{tmp_path / 'parser.sqlite'}")
+    Base.metadata.create_all(engine)
+    monkeypatch.setattr(kp, "Session", sessionmaker(bind=engine))
+    monkeypatch.setattr(kp, "PLAN_BATCH", 3)
+    monkeypatch.setattr(kp, "WRITE_BATCH", 4)
+
+    repos = [{
+        "repo_url": f"https://github.com/test/repo{number}", "repo_name": f"repo{number}",
+        "repo_description": "Test repo", "repo_readme": "Readme", "repo_readme_url": None, "repo_license": None,
+        "repo_license_url": None, "stars": 1, "forks": 2,
+        "kicad_urls": [f"{file_server.base_url}/files/demo.kicad_pcb?repo={number}&file={file}" for file in range(2)]
+    } for number in range(10)]
+    # a repo found twice is only stored once
+    repos.append(dict(repos[0]))
+
+    with FileFetcher(workers=4) as fetcher:
+        kp.parse_repos(enumerate(repos, 1), fetcher=fetcher)
+
+    session = sessionmaker(bind=engine)()
+    assert sorted(name for name, in session.query(Repo.name)) == sorted(f"repo{number}" for number in range(10))
+    assert session.query(Item).count() > 0
+    assert session.query(File).count() == 20
+    session.close()
+
+
+def test_parser_import_has_no_side_effects(tmp_path):
+    """
+    Testing if running the top level of the parser, as done by each spawned parse worker (as __mp_main__), neither
+    creates the database nor the log file
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    os.makedirs(tmp_path / "config")
+    shutil.copy(os.path.join(root, "config", "default_parser.config"), tmp_path / "config")
+    code = f"import runpy, sys; sys.path.insert(0, {root!r}); " \
+           f"runpy.run_path({os.path.join(root, 'kicad_parser.py')!r}, run_name='__mp_main__')"
+
+    subprocess.run([sys.executable, "-c", code], cwd=str(tmp_path), check=True)
+    assert os.listdir(tmp_path) == ["config"]
+
+
+def test_parse_repos_skips_unreadable_files(file_server, tmp_path, monkeypatch):
+    """
+    Testing if a Latin-1 board is stored with replaced characters and files that can not be read are skipped without
+    stopping the run
+    """
+    engine = create_engine(f"sqlite:///{tmp_path / 'parser.sqlite'}")
+    Base.metadata.create_all(engine)
+    monkeypatch.setattr(kp, "Session", sessionmaker(bind=engine))
+    file_server.files_dir = str(tmp_path)
+    (tmp_path / "latin1.kicad_pcb").write_bytes(
+        b'(kicad_pcb (version 4) (module A:B (fp_text reference U1) (fp_text value A1324\xe9)))')
+
+    repo = {"repo_url": "https://github.com/test/latin1", "repo_name": "latin1", "repo_description": "Test repo",
+            "repo_readme": "Readme", "repo_readme_url": None, "repo_license": None, "repo_license_url": None,
+            "stars": 1, "forks": 2, "kicad_urls": [f"{file_server.base_url}/files/latin1.kicad_pcb"]}
+    with FileFetcher(workers=2) as fetcher:
+        kp.parse_repos(enumerate([repo], 1), fetcher=fetcher)
+
+    session = sessionmaker(bind=engine)()
+    assert [value for value, in session.query(Item.value)] == ["A1324\ufffd"]
+    session.close()
+
+    job = kp.RepoJob(0, 1, repo, repo["kicad_urls"], None)
+    job.results = [("a", None, UnicodeDecodeError("utf-8", b"\xe9", 0, 1, "invalid"), None),
+                   ("b", None, ValueError("broken board"), None), ("c", [("A:B", None, None, "U1", "X")], None, "d")]
+    assert kp.job_results(job) == [("c", [("A:B", None, None, "U1", "X")], "d")]
+
+
+def test_parse_repos_interrupted_with_pool(file_server, tmp_path, monkeypatch):
+    """
+    Testing if a first CTRL+C, which the terminal sends to the parse workers as well, stores the repos in flight
+    instead of breaking the pool
+    """
+    engine = create_engine(f"sqlite:///{tmp_path / 'parser.sqlite'}")
+    Base.metadata.create_all(engine)
+    monkeypatch.setattr(kp, "Session", sessionmaker(bind=engine))
+    monkeypatch.setattr(kp, "PLAN_BATCH", 2)
+    monkeypatch.setattr(kp, "PIPELINE_QUEUE_SIZE", 2)
+    monkeypatch.setattr(kp, "PIPELINE_FETCHERS", 1)
+
+    pools = []
+    parse_pool = kp.parse_pool
+
+    def started_pool(workers):
+        pools.append(parse_pool(workers))
+        # the workers are started on demand, keep all of them busy once
+        list(pools[-1].map(time.sleep, [0.2] * workers))
+        return pools[-1]
+
+    fetch_job = kp.fetch_job
+
+    def interrupting_fetch(fetcher, job):
+        job = fetch_job(fetcher, job)
+        if job.sequence == 2:
+            # like the terminal, interrupt the whole process group
+            for process in pools[0]._processes.values():
+                os.kill(process.pid, signal.SIGINT)
+            os.kill(os.getpid(), signal.SIGINT)
+            time.sleep(0.2)
+        return job
+
+    monkeypatch.setattr(kp, "parse_pool", started_pool)
+    monkeypatch.setattr(kp, "fetch_job", interrupting_fetch)
+
+    repos = [{
+        "repo_url": f"https://github.com/test/repo{number}", "repo_name": f"repo{number}",
+        "repo_description": "Test repo", "repo_readme": "Readme", "repo_readme_url": None, "repo_license": None,
+        "repo_license_url": None, "stars": 1, "forks": 2,
+        "kicad_urls": [f"{file_server.base_url}/files/demo.kicad_pcb?repo={number}&file={file}" for file in range(2)]
+    } for number in range(40)]
+
+    with FileFetcher(workers=2) as fetcher:
+        kp.parse_repos(enumerate(repos, 1), fetcher=fetcher, workers=2)
+
+    session = sessionmaker(bind=engine)()
+    stored = session.query(Repo).count()
+    assert 3 <= stored < len(repos)
+    assert session.query(File).count() == 2 * stored
+    assert session.query(Item).count() > 0
+    session.close()
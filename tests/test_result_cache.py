@@ -0,0 +1,114 @@
+"""
+This file supplies tests for the search result cache.
+"""
+import sqlite3
+import time
+from libs.ResultCache import ResultCache, SharedResultCache, bump_generation, get_generation
+from models.base import Base
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+
+def test_cache_lru_eviction():
+    """
+    Testing if the least recently used result is evicted first
+    """
+    cache = ResultCache(max_entries=2)
+    cache.put("a", 0, "A")
+    cache.put("b", 0, "B")
+    assert cache.get("a", 0) == "A"
+
+    cache.put("c", 0, "C")
+    assert cache.get("b", 0) is None
+    assert cache.get("a", 0) == "A"
+    assert cache.get("c", 0) == "C"
+
+
+def test_cache_size_bound():
+    """
+    Testing if the summed size of the results is bounded
+    """
+    cache = ResultCache(max_bytes=40)
+    for key in range(5):
+        cache.put(key, 0, "x" * 10)
+
+    assert [cache.get(key, 0) for key in range(5)].count(None) == 1
+
+    # results that are too large are not cached at all
+    cache.put("large", 0, "x" * 20)
+    assert cache.get("large", 0) is None
+
+
+def test_cache_ttl_and_generation():
+    """
+    Testing if results expire and are invalidated by a new database generation
+    """
+    cache = ResultCache(ttl=0)
+    cache.put("a", 0, "A")
+    assert cache.get("a", 0) is None
+
+    cache = ResultCache()
+    cache.put("a", 0, "A")
+    assert cache.get("a", 1) is None
+    assert cache.get("a", 0) is None
+    assert cache.misses == 2
+
+
+def test_shared_cache(tmp_path):
+    """
+    Testing if results are shared between caches (i.e. processes) using the same file
+    """
+    path = str(tmp_path / "cache.sqlite")
+    first = ResultCache(shared=SharedResultCache(path))
+    second = ResultCache(shared=SharedResultCache(path))
+
+    first.put("a", 3, "A")
+    assert second.get("a", 3) == "A"
+    assert second.hits == 1
+    assert second.get("a", 4) is None
+
+    # the shared cache evicts the least recently used results
+    shared = SharedResultCache(path, max_bytes=40)
+    for key in "bcdef":
+        shared.put(key, 0, "x" * 10)
+        time.sleep(0.01)
+    assert shared.get("b", 0) is None
+    assert shared.get("f", 0) == "x" * 10
+
+    # results that would take up most of the cache are not stored
+    shared.put("g", 0, "x" * 11)
+    assert shared.get("g", 0) is None
+
+
+def test_shared_cache_of_earlier_layout(tmp_path):
+    """
+    Testing if a cache file written by an earlier version is emptied instead of failing every lookup
+    """
+    path = str(tmp_path / "cache.sqlite")
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE results (key TEXT PRIMARY KEY, generation INTEGER, expires REAL, used REAL, "
+                       "size INTEGER, value TEXT)")
+    connection.execute("INSERT INTO results VALUES ('a', 1, 1e12, 0, 1, 'A')")
+    connection.commit()
+    connection.close()
+
+    shared = SharedResultCache(path)
+    assert shared.get("a", 1) is None
+    shared.put("a", 1, "B")
+    assert shared.get("a", 1) == "B"
+
+
+def test_generation_counter():
+    """
+    Testing if writers bump the database generation
+    """
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+
+    assert get_generation(session) == 0
+    bump_generation(session)
+    session.commit()
+    bump_generation(session)
+    session.commit()
+    assert get_generation(session) == 2
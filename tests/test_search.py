@@ -2,14 +2,30 @@
 This file supplies tests for the Search connector component.
 """
 import json
+import sqlite3
+from pathlib import Path
 import search
-from models.base import Base
+from models.base import Base, add_missing_columns
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 
-test_engine = create_engine('sqlite:///./database/parser_database.testing.sqlite')
-Base.metadata.create_all(test_engine)
-test_session = sessionmaker(bind=test_engine)
+TESTING_DATABASE = Path("./database/parser_database.testing.sqlite")
+
+
+def testing_engine():
+    # in-memory copy of the known database, so that migrating it to the current models leaves the fixture unchanged
+    connection = sqlite3.connect(":memory:", check_same_thread=False)
+    source = sqlite3.connect(f"{TESTING_DATABASE.absolute().as_uri()}?mode=ro", uri=True)
+    source.backup(connection)
+    source.close()
+    engine = create_engine("sqlite://", creator=lambda: connection, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    add_missing_columns(engine)
+    return engine
+
+
+test_session = sessionmaker(bind=testing_engine())
 test_session = test_session()
 
 
@@ -85,3 +101,194 @@ def test_search_for_fail_on_no_connection():
     print("Expected:\n", expected_result)
 
     assert result == expected_result
+
+
+def test_search_with_index_matches_like_search():
+    """
+    Testing if the full-text index returns the same results as the plain LIKE search and follows item updates.
+    """
+    from libs.search_index import create_search_index, has_search_index
+    from models.files import File
+    from models.items import Item
+    from models.part import Part
+    from models.repos import Repo
+
+    like_engine = create_engine('sqlite:///')
+    index_engine = create_engine('sqlite:///')
+    sessions = []
+
+    for engine in (like_engine, index_engine):
+        Base.metadata.create_all(engine)
+        session = sessionmaker(bind=engine)()
+        session.add(Repo(id=1, repo_url="https://github.com/a/b", name="b", forks=1, stars=2))
+        session.add(File(id=1, url="https://github.com/a/b/board.kicad_pcb", repo_id="1"))
+        session.add(Part(id=1, mpn="STM32F103C8T6", aisler_id="p1"))
+        session.add(Item(id=1, value="STM32F103C8T6", tags="MCU", file_id="1", part_id="1"))
+        session.add(Item(id=2, value="stm32f4", file_id="1"))
+        session.add(Item(id=3, value="ESP8266", file_id="1"))
+        session.commit()
+        sessions.append(session)
+
+    assert create_search_index(index_engine)
+    assert has_search_index(index_engine)
+    assert not has_search_index(like_engine)
+
+    for query in ("STM32", "stm32f1", "8266", "ST", "NOTFOUND"):
+        assert search.search(query, session=sessions[0]) == search.search(query, session=sessions[1])
+
+    # the index has to follow updates of the items
+    for session in sessions:
+        item = session.query(Item).filter(Item.id == 3).one()
+        item.value = "ESP32-WROOM"
+        session.commit()
+
+    assert '"ESP32-WROOM"' in search.search("ESP32", session=sessions[1])
+    assert search.search("ESP8266", session=sessions[1]) == search.search("ESP8266", session=sessions[0])
+
+
+def test_search_index_finds_items_of_part():
+    """
+    Testing if the trigger following changed MPNs finds the items of the part through an index, also in databases
+    built before the index existed
+    """
+    from libs.search_index import create_search_index
+    from sqlalchemy import inspect
+
+    engine = create_engine('sqlite:///')
+    engine.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, uuid VARCHAR, module VARCHAR, description VARCHAR, "
+                   "tags VARCHAR, reference VARCHAR, value VARCHAR, part_id VARCHAR, file_id VARCHAR)")
+    Base.metadata.create_all(engine)
+    engine.execute("INSERT INTO parts (id, mpn) VALUES (1, 'STM32F103')")
+    engine.execute("INSERT INTO items (id, value, part_id) VALUES (1, 'STM32', '1')")
+
+    assert create_search_index(engine)
+    assert "ix_items_part_id" in {index["name"] for index in inspect(engine).get_indexes("items")}
+    plan = engine.execute("EXPLAIN QUERY PLAN SELECT id FROM items WHERE part_id = 1").fetchall()
+    assert "ix_items_part_id" in " ".join(row[-1] for row in plan)
+
+    engine.execute("UPDATE parts SET mpn = 'STM32F405' WHERE id = 1")
+    assert engine.execute("SELECT mpn FROM items_fts WHERE rowid = 1").scalar() == "STM32F405"
+
+
+def test_search_page_and_stream_match_search():
+    """
+    Testing if the paginated and the streaming search return the same repositories as search(), ranked by relevance.
+    """
+    from models.files import File
+    from models.items import Item
+    from models.repos import Repo
+
+    engine = create_engine('sqlite:///')
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    for repo_id, stars in enumerate([5, 50, 0, 7, 50], start=1):
+        session.add(Repo(id=repo_id, repo_url=f"https://github.com/a/{repo_id}", name=str(repo_id), forks=1,
+                         stars=stars))
+        session.add(File(id=repo_id, url=f"https://github.com/a/{repo_id}/board.kicad_pcb", repo_id=str(repo_id)))
+        session.add(Item(value="ESP8266", tags="WIFI", file_id=str(repo_id)))
+        session.add(Item(value="ESP8266EX", file_id=str(repo_id)))
+    session.commit()
+
+    results = json.loads(search.search("esp8266", session=session))["results"]
+
+    # two pages via cursor and via offset
+    first = search.search_page("esp8266", limit=3, session=session)
+    second = search.search_page("esp8266", limit=3, cursor=first["next_cursor"], session=session)
+    by_offset = search.search_page("esp8266", limit=3, offset=3, session=session)
+
+    assert first["total"] == 5
+    assert [repo["repo_id"] for repo in first["results"]] == [2, 5, 4]
+    assert second["results"] == by_offset["results"]
+    assert second["next_cursor"] is None
+
+    paged = first["results"] + second["results"]
+    streamed = json.loads("".join(search.search_stream("esp8266", session=session)))["results"]
+
+    assert paged == streamed
+    assert sorted(paged, key=lambda repo: repo["repo_id"]) == sorted(results, key=lambda repo: repo["repo_id"])
+
+    assert search.search_page("esp8266", cursor="invalid", session=session)["status"] == "ERROR"
+
+
+def test_search_stream_uses_own_session(tmp_path, monkeypatch):
+    """
+    Testing if a stream keeps its cursor when the session shared by the other searches is closed in the meantime
+    """
+    from models.files import File
+    from models.items import Item
+    from models.repos import Repo
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'search.sqlite'}")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    for repo_id in range(1, 6):
+        session.add(Repo(id=repo_id, repo_url=f"https://github.com/a/{repo_id}", name=str(repo_id), forks=1,
+                         stars=repo_id))
+        session.add(File(id=repo_id, url=f"https://github.com/a/{repo_id}/board.kicad_pcb", repo_id=str(repo_id)))
+        session.add(Item(value="ESP8266", file_id=str(repo_id)))
+    session.commit()
+    session.close()
+    monkeypatch.setattr(search, "Session", sessionmaker(bind=engine))
+
+    stream = search.search_stream("esp8266", batch_size=1)
+    chunks = [next(stream), next(stream)]
+    # e.g. another request of the same worker
+    search.session.close()
+    chunks.extend(stream)
+    assert [repo["repo_id"] for repo in json.loads("".join(chunks))["results"]] == [5, 4, 3, 2, 1]
+
+
+def test_search_batch_for_demo_out():
+    """
+    Testing if the batch search returns the same result groups as single searches
+    """
+    bom = "Ref,MPN\nU1,demo123\nU2,DEMO1234\nU3,NOTEXISTING\nU4,demo123\n"
+    terms = search.parse_bom(bom)
+
+    assert terms == ["DEMO123", "DEMO1234", "NOTEXISTING"]
+
+    result = search.search_batch(terms, session=test_session)
+
+    assert result["status"] == "OK"
+    for group in result["results"]:
+        single = json.loads(search.search(group["term"], session=test_session))["results"]
+        assert group["total"] == len(single)
+        assert group["results"] == single
+
+
+def test_search_batch_limits_repos_per_term():
+    """
+    Testing if the batch search returns the most relevant repositories of each term (ranked and limited in the
+    database) in the order of single searches, with the total number of repositories
+    """
+    import random
+    from libs.search_index import create_search_index
+    from models.files import File
+    from models.items import Item
+    from models.repos import Repo
+
+    rng = random.Random(3)
+    for indexed in (False, True):
+        engine = create_engine('sqlite:///')
+        Base.metadata.create_all(engine)
+        session = sessionmaker(bind=engine)()
+        for repo_id in range(1, 31):
+            session.add(Repo(id=repo_id, repo_url=f"https://github.com/a/{repo_id}", name=str(repo_id),
+                             forks=rng.choice([0, 1, 3]), stars=rng.choice([0, 2, 5])))
+            for file_id in (2 * repo_id, 2 * repo_id + 1):
+                session.add(File(id=file_id, url=f"https://github.com/a/{repo_id}/{file_id}.kicad_pcb",
+                                 repo_id=str(repo_id)))
+        for _ in range(200):
+            session.add(Item(value=rng.choice(["10K", "100K", "STM32F103", "ESP8266", "NE555"]),
+                             file_id=str(rng.randint(2, 61))))
+        session.commit()
+        if indexed:
+            assert create_search_index(engine)
+
+        terms = ["10K", "STM32", "NE555", "NOTFOUND"]
+        result = search.search_batch(terms, limit=4, session=session)
+        assert result["status"] == "OK"
+        for group in result["results"]:
+            single = json.loads(search.search(group["term"], session=session))["results"]
+            assert group["total"] == len(single)
+            assert group["results"] == single[:4]
@@ -0,0 +1,113 @@
+"""
+This file supplies tests for the S-expression tokenizer. parseSexp has to give the same nested lists (including the
+line numbers) as the original implementation, which joined all lines before tokenizing.
+"""
+import os
+import pytest
+from benchmarks.synthetic import build_board
+from libs.realthunder_kicad_parser import KicadPCB
+from libs.realthunder_kicad_parser.sexp_parser import parseSexp, parseSexpLines, iterSexp, SexpBuilder, SEXP_START, \
+    SEXP_ATOM, SEXP_END
+from tests.conftest import FIXTURES_DIR
+from tests.test_module_extractor import TRICKY_BOARDS
+
+# line breaks inside and between tokens, white space before line breaks, other line boundaries and stray characters
+TRICKY_TEXTS = [
+    '(a\nb "c\nd" e\n"f")',
+    '(  \n  key (x\r\ny)\r\n  (\n\n  key2 1))',
+    '\xa0\r\nab\x851  ',
+    '(a ^ (^b c) d^"e f")',
+    '(a\x0bb (c\x1fd)\x0c(e))',
+    '(unclosed "string\n(a b))',
+    '(gr_text "\u00c4\u00df \u2028\u00a0x\u3000y" (a\u00a0b))',
+    '',
+    '   \n  ',
+]
+
+
+def test_identical_for_fixture():
+    """
+    Testing if the fixture board is tokenized like before
+    """
+    with open(os.path.join(FIXTURES_DIR, "demo.kicad_pcb")) as f:
+        contents = f.read()
+
+    assert parseSexp(contents) == parseSexpLines(contents.splitlines(False))
+
+
+@pytest.mark.parametrize("contents", TRICKY_BOARDS + TRICKY_TEXTS + [
+    build_board(20, num_segments=100),
+    build_board(5, num_segments=10).replace("\n", "\r\n"),
+])
+def test_identical_for_quirks(contents):
+    """
+    Testing if texts with quirks are tokenized like before
+    """
+    assert parseSexp(contents) == parseSexpLines(contents.splitlines(False))
+    assert parseSexp(contents.encode("utf-8")) == parseSexpLines(contents.splitlines(False))
+
+
+@pytest.mark.parametrize("contents", ['(a (b c)', '(a) b)'])
+def test_unbalanced_brackets(contents):
+    """
+    Testing if unbalanced brackets are still rejected
+    """
+    with pytest.raises(AssertionError):
+        parseSexp(contents)
+    with pytest.raises(AssertionError):
+        parseSexp(contents.encode("utf-8"))
+
+
+def test_without_line_numbers():
+    """
+    Testing if the line numbers can be left out
+    """
+    assert parseSexp('(a (b c)\n (d))') == [1, 'a', [1, 'b', 'c'], [2, 'd']]
+    assert parseSexp('(a (b c)\n (d))', lines=False) == [-1, 'a', [-1, 'b', 'c'], [-1, 'd']]
+
+
+def test_load_memory_mapped_file():
+    """
+    Testing if a board loaded from a (memory-mapped) file is the same as one loaded from its contents
+    """
+    path = os.path.join(FIXTURES_DIR, "demo.kicad_pcb")
+    with open(path) as f:
+        contents = f.read()
+
+    from_file = KicadPCB.load(path)
+    from_contents = KicadPCB.load_contents(contents)
+    assert [(module[0], module.descr, module._line) for module in from_file.module] == \
+        [(module[0], module.descr, module._line) for module in from_contents.module]
+
+
+def test_events():
+    """
+    Testing if the events give the tokens and the line numbers of the expressions
+    """
+    assert list(iterSexp('(a (b c)\n (d))')) == [
+        (SEXP_START, None, None), (SEXP_ATOM, 'a', 1),
+        (SEXP_START, None, None), (SEXP_ATOM, 'b', 1), (SEXP_ATOM, 'c', None), (SEXP_END, None, None),
+        (SEXP_START, None, None), (SEXP_ATOM, 'd', 2), (SEXP_END, None, None),
+        (SEXP_END, None, None),
+    ]
+
+    with pytest.raises(AssertionError):
+        list(iterSexp('(a (b c)'))
+
+
+@pytest.mark.parametrize("contents", TRICKY_BOARDS + [text for text in TRICKY_TEXTS if text.startswith("(")] + [
+    build_board(5, num_segments=10),
+])
+def test_builder(contents):
+    """
+    Testing if the builder gives the same lists as parseSexp, also when returning the nested expressions one by one
+    """
+    expected = parseSexp(contents)
+
+    builder = SexpBuilder()
+    assert list(builder.iterBuild(iterSexp(contents.encode("utf-8")))) == [expected]
+    assert builder.result == expected
+
+    builder = SexpBuilder(depth=1)
+    assert list(builder.iterBuild(iterSexp(contents))) == [value for value in expected if isinstance(value, list)]
+    assert builder.result == [value for value in expected if not isinstance(value, list)]
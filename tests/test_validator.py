@@ -0,0 +1,274 @@
+"""
+This file supplies tests for matching the found items with parts.
+"""
+import os
+import random
+import shutil
+import subprocess
+import sys
+from concurrent.futures import Future
+import jellyfish
+import pytest
+import validator
+from libs.part_matching import normalise_mpn, rank_parts
+from libs.search_index import create_search_index
+from models.base import Base
+from models.files import File
+from models.items import Item
+from models.part import Part
+from models.repos import Repo
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+MPNS = ["STM32F103C8T6", "STM32F103RBT6", "STM32F405RGT6", "ESP8266EX", "ESP32-WROOM-32", "NE555P", "LM358DR",
+        "ATMEGA328P-AU", "ATMEGA32U4-AU", "CH340G", "AMS1117-3.3", "TPS7A4700RGWR", "BC547B", "1N4148W"]
+
+
+def expected_part(value, parts):
+    # all parts containing the value are scored: the closest normalised MPN, the first one on ties
+    related = [(part_id, mpn) for part_id, mpn in sorted(parts.items()) if value.lower() in mpn.lower()]
+    scored = [(jellyfish.levenshtein_distance(normalise_mpn(value), normalise_mpn(mpn)), part_id)
+              for part_id, mpn in related]
+    return min(scored)[1] if scored else None
+
+
+def test_rank_parts():
+    """
+    Testing if exact and normalised matches win and the pruned ranking finds the closest part
+    """
+    assert rank_parts("STM32", []) is None
+    # equal normalised MPNs are exact matches, the first one wins like on other ties
+    assert rank_parts("STM32F103", [(3, "STM32F103C8T6"), (2, "STM32F103"), (1, "stm32f103")]) == (1, 1.0)
+    assert rank_parts("stm32f103", [(3, "STM32F103"), (2, "STM32-F103")]) == (2, 1.0)
+    assert rank_parts("esp32-wroom", [(1, "ESP32-WROOM-32"), (2, "ESP32 WROOM")]) == (2, 1.0)
+    part_id, confidence = rank_parts("STM32F103", [(1, "STM32F103C8T6"), (2, "STM32F103RBT6X"), (3, "XSTM32F103")])
+    assert part_id == 3 and confidence == pytest.approx(0.9)
+    # equally close parts, the first one wins
+    assert rank_parts("F103", [(5, "F103AB"), (4, "XF103Y")])[0] == 4
+
+    rng = random.Random(1)
+    for _ in range(200):
+        value = rng.choice(["STM32", "F10", "ESP", "32", "A"])
+        related = [(number, "".join(rng.choice("STMF3210-ESP ") for _ in range(rng.randint(0, 8))) + value +
+                    "".join(rng.choice("STMF3210C8T6") for _ in range(rng.randint(0, 8)))) for number in range(20)]
+        assert rank_parts(value, related)[0] == expected_part(value, dict(related))
+
+
+def parts_db(tmp_path, monkeypatch, indexed=True):
+    engine = create_engine(f"sqlite:///{tmp_path / 'parser.sqlite'}")
+    Base.metadata.create_all(engine)
+    if indexed:
+        assert create_search_index(engine)
+    monkeypatch.setattr(validator, "Session", sessionmaker(bind=engine))
+    monkeypatch.setattr(validator, "VALIDATE_BATCH", 7)
+    monkeypatch.setattr(validator, "VALIDATE_CHECKPOINT", str(tmp_path / "validator.checkpoint"))
+
+    session = sessionmaker(bind=engine)()
+    session.add(Repo(id=1, repo_url="https://github.com/a/b", name="b", forks=1, stars=2))
+    session.add(File(id=1, url="https://github.com/a/b/board.kicad_pcb", repo_id="1"))
+    for part_id, mpn in enumerate(MPNS, 1):
+        session.add(Part(id=part_id, mpn=mpn, aisler_id=f"p{part_id}"))
+    session.commit()
+    return session
+
+
+@pytest.mark.parametrize("indexed", [False, True])
+def test_validate_parts(tmp_path, monkeypatch, indexed):
+    """
+    Testing if every item gets the closest part containing its value, with and without the index of the MPNs
+    """
+    session = parts_db(tmp_path, monkeypatch, indexed)
+    rng = random.Random(4)
+    parts = {number + 1: mpn for number, mpn in enumerate(MPNS)}
+    values = ["STM32F103", "stm32", "ESP32", "555", "LM358DR", "atmega", "AMS1117", "10k", "", "BC547B", "F4",
+              "NOTFOUND"]
+
+    for number in range(60):
+        session.add(Item(id=number + 1, value=rng.choice(values), file_id="1"))
+    # items of other files are not validated
+    session.add(Item(id=100, value="NE555P", file_id="2"))
+    session.commit()
+
+    validator.validate_parts()
+
+    for item in session.query(Item).filter(Item.file_id == "1"):
+        part_id = expected_part(item.value, parts) if item.value else None
+        assert item.part_id == (str(part_id) if part_id is not None else None), item.value
+        assert (item.part_confidence is None) == (part_id is None)
+    assert session.query(Item).filter(Item.value == "LM358DR").first().part_confidence == 1.0
+    assert session.query(Item).filter(Item.id == 100).one().part_id is None
+
+    # a new part is found through the index of the MPNs and replaces a worse match
+    session.add(Part(id=50, mpn="STM32", aisler_id="p50"))
+    session.commit()
+    validator.validate_parts()
+    session.expire_all()
+    assert {item.part_id for item in session.query(Item).filter(Item.value == "stm32")} <= {"50"}
+    session.close()
+
+
+def test_validate_parts_workers(tmp_path, monkeypatch):
+    """
+    Testing if a pool of workers finds the same parts as a single process
+    """
+    session = parts_db(tmp_path, monkeypatch)
+    values = [mpn[:length] for mpn in MPNS for length in (4, 6, 8, 20)]
+    for number, value in enumerate(values):
+        session.add(Item(id=number + 1, value=value, file_id="1"))
+    session.commit()
+
+    validator.validate_parts()
+    single = sorted((item.id, item.part_id, item.part_confidence) for item in session.query(Item))
+    session.query(Item).update({Item.part_id: None, Item.part_confidence: None})
+    session.commit()
+
+    validator.validate_parts(workers=2)
+    session.expire_all()
+    assert sorted((item.id, item.part_id, item.part_confidence) for item in session.query(Item)) == single
+    session.close()
+
+
+def test_matched_pages_cancels_pending(tmp_path, monkeypatch):
+    """
+    Testing if the pages matched ahead are cancelled when the consumer stops
+    """
+    session = parts_db(tmp_path, monkeypatch)
+    futures = []
+
+    class Pool:
+        def submit(self, function, *args):
+            futures.append(Future())
+            if len(futures) == 1:
+                futures[0].set_result([])
+            return futures[-1]
+
+    pages = validator.matched_pages(session, [["a"], ["b"], ["c"]], Pool(), workers=1)
+    assert next(pages) == (["a"], [])
+    pages.close()
+    assert [future.cancelled() for future in futures] == [False, True]
+    session.close()
+
+
+def test_validator_import_has_no_side_effects(tmp_path):
+    """
+    Testing if running the top level of the validator, as done by each spawned worker (as __mp_main__), does not
+    create the database
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    os.makedirs(tmp_path / "config")
+    os.makedirs(tmp_path / "database")
+    shutil.copy(os.path.join(root, "config", "default_parser.config"), tmp_path / "config")
+    code = f"import runpy, sys; sys.path.insert(0, {root!r}); " \
+           f"runpy.run_path({os.path.join(root, 'validator.py')!r}, run_name='__mp_main__')"
+
+    subprocess.run([sys.executable, "-c", code], cwd=str(tmp_path), check=True)
+    assert os.listdir(tmp_path / "database") == []
+
+
+def test_validate_parts_resume(tmp_path, monkeypatch):
+    """
+    Testing if a killed run resumes after the last written page, and the next run starts at the beginning again
+    """
+    session = parts_db(tmp_path, monkeypatch)
+    for number, mpn in enumerate(MPNS):
+        session.add(Item(id=number + 1, value=mpn, file_id="1"))
+    session.commit()
+
+    matched = []
+    match_values = validator.match_values
+
+    def killed(page_session, values):
+        if len(matched) == 1:
+            raise KeyboardInterrupt
+        matched.append(values)
+        return match_values(page_session, values)
+
+    monkeypatch.setattr(validator, "match_values", killed)
+    with pytest.raises(KeyboardInterrupt):
+        validator.validate_parts()
+    assert session.query(Item).filter(Item.part_id.isnot(None)).count() == 7
+
+    monkeypatch.setattr(validator, "match_values", lambda *args: matched.append(args[1]) or match_values(*args))
+    matched.clear()
+    validator.validate_parts()
+    assert [value for values in matched for value in values] == sorted(MPNS)[7:]
+    assert session.query(Item).filter(Item.part_confidence == 1.0).count() == len(MPNS)
+
+    matched.clear()
+    validator.validate_parts()
+    assert len(matched) == 2
+    session.close()
+
+
+def test_validate_parts_incremental(tmp_path, monkeypatch):
+    """
+    Testing if only new items and items that may match added or updated parts are validated again
+    """
+    session = parts_db(tmp_path, monkeypatch)
+    for number, value in enumerate(["STM32F103", "stm32f4", "NE555", "CH340", "BC547"]):
+        session.add(Item(id=number + 1, value=value, file_id="1"))
+    session.commit()
+
+    matched = []
+    match_values = validator.match_values
+    monkeypatch.setattr(validator, "match_values", lambda *args: matched.extend(args[1]) or match_values(*args))
+
+    validator.validate_parts(incremental=True)
+    assert sorted(matched) == ["BC547", "CH340", "NE555", "STM32F103", "stm32f4"]
+    assert session.query(Item).filter(Item.validated_at.is_(None)).count() == 0
+
+    matched.clear()
+    validator.validate_parts(incremental=True)
+    assert matched == []
+
+    # a new item, a new part for an existing value and an update of a part
+    session.add(Item(id=10, value="LM358", file_id="1"))
+    session.add(Part(id=50, mpn="STM32F405", aisler_id="p50"))
+    session.query(Part).filter(Part.mpn == "NE555P").one().mpn = "NE555N"
+    session.commit()
+
+    matched.clear()
+    validator.validate_parts(incremental=True)
+    assert sorted(matched) == ["LM358", "NE555", "stm32f4"]
+    session.expire_all()
+    assert session.query(Item).filter(Item.id == 2).one().part_id == "50"
+    assert session.query(Item).filter(Item.id == 3).one().part_confidence < 1.0
+
+    # the MPN of the matched part does not contain the value anymore
+    assert session.query(Item).filter(Item.id == 5).one().part_id == "13"
+    session.query(Part).filter(Part.id == 13).one().mpn = "BC548B"
+    session.commit()
+
+    matched.clear()
+    validator.validate_parts(incremental=True)
+    assert matched == ["BC547"]
+    session.expire_all()
+    assert session.query(Item).filter(Item.id == 5).one().part_id is None
+
+
+def api_part(aisler_id, mpn, datasheet="https://example.com/datasheet.pdf"):
+    return {"id": aisler_id, "attributes": {"mpn": mpn, "manufacturer": "ST", "datasheet": datasheet,
+                                            "description": f"{mpn} part"}}
+
+
+def test_insert_response_parts(tmp_path, monkeypatch):
+    """
+    Testing if a page of parts is inserted, changed parts are updated and unchanged parts are left alone
+    """
+    session = parts_db(tmp_path, monkeypatch)
+    counts = validator.parse_and_insert_response_parts([api_part("a1", "STM32F103C8T6"), api_part("a2", "NE555P")])
+    assert counts == {"inserted": 2, "updated": 0, "unchanged": 0}
+    updated_at = session.query(Part.updated_at).filter(Part.aisler_id == "a2").scalar()
+
+    counts = validator.parse_and_insert_response_parts([
+        api_part("a1", "STM32F103C8T6", datasheet="https://example.com/new.pdf"), api_part("a2", "NE555P"),
+        api_part("a3", "LM358DR"), api_part("a3", "LM358DR")
+    ])
+    assert counts == {"inserted": 1, "updated": 1, "unchanged": 1}
+    assert validator.parse_and_insert_response_parts([]) == {"inserted": 0, "updated": 0, "unchanged": 0}
+
+    session.expire_all()
+    assert session.query(Part).filter(Part.aisler_id == "a1").one().datasheet == "https://example.com/new.pdf"
+    assert session.query(Part.updated_at).filter(Part.aisler_id == "a2").scalar() == updated_at
+    assert session.query(Part).count() == len(MPNS) + 3
+    session.close()
@@ -13,26 +13,49 @@ future, it might be better to immediately validate with DK, if we can get a big
 """
 
 import argparse
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
 import json
+import multiprocessing
 import pickle
 from configparser import ConfigParser
 import os
 from datetime import datetime, timedelta
 import requests
-from sqlalchemy import create_engine
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy import create_engine, bindparam, func, or_, text, DateTime
 from sqlalchemy.orm import sessionmaker, scoped_session
 from tqdm import tqdm
 import time
-import jellyfish
 import signal
 
-from models.base import Base
+from models.base import Base, add_missing_columns
 from models.files import File
 from models.items import Item
 from models.part import Part
+from libs.search_index import create_search_index
+from libs.ResultCache import bump_generation
+from libs.part_matching import rank_parts, match_values, match_values_read_only
+from libs.Checkpoint import Checkpoint
 
 graceful_exit = False
+
+# Distinct item values matched (and committed) together
+VALIDATE_BATCH = 500
+
+# Fields of the parts that are refreshed from the AISLER API
+PART_FIELDS = ("mpn", "manufacturer", "datasheet", "description")
+
+# Inserts a part or updates the stored part with the same AISLER id
+upsert_parts = text(
+    f"INSERT INTO parts (aisler_id, {', '.join(PART_FIELDS)}, updated_at) "
+    f"VALUES (:aisler_id, {', '.join(':' + name for name in PART_FIELDS)}, :updated_at) "
+    f"ON CONFLICT (aisler_id) DO UPDATE SET {', '.join(f'{name} = excluded.{name}' for name in PART_FIELDS)}, "
+    f"updated_at = excluded.updated_at"
+).bindparams(bindparam("updated_at", type_=DateTime()))
+
+# Progress of validate_parts (the last written value), a killed run resumes there
+VALIDATE_CHECKPOINT = "validator_progress.checkpoint"
+
 original_sigint_handler = signal.getsignal(signal.SIGINT)
 original_sigterm_handler = signal.getsignal(signal.SIGTERM)
 
@@ -89,70 +112,86 @@ try:
 except KeyError:
     AISLER_AUTH_TOKEN = config['AISLER_API']['Authorization']
 
-# Initialize SQL session
-Session = None
-try:
-    # Init SQLAlchemy
-    engine = create_engine(config["DATABASE"]["database-uri"])
-    Base.metadata.create_all(engine)
-    session_factory = sessionmaker(bind=engine)
-    Session = scoped_session(session_factory)
-except Exception as e:
-    print("Failed to initialize SQL Session")
-    print(e)
-    exit(-4)
+# SQL sessions, bound to the configured database by init_database()
+session_factory = sessionmaker()
+Session = scoped_session(session_factory)
 
 
-def parse_and_insert_response_parts(parts):
+def init_database():
     """
-    Parse the response parts and insert into DB
+    Initializes the SQL session: creates (or migrates) the configured database and binds the Session to it. Not done
+    on import, as the spawned workers of validate_parts import this module (as __mp_main__ when it is run as a
+    script) and must not write to the database.
 
-    :param parts: Parts JSON form API
     :return: -
     """
+    try:
+        # Init SQLAlchemy
+        engine = create_engine(config["DATABASE"]["database-uri"])
+        Base.metadata.create_all(engine)
+        add_missing_columns(engine)
+        create_search_index(engine)
+        session_factory.configure(bind=engine)
+    except Exception as e:
+        print("Failed to initialize SQL Session")
+        print(e)
+        exit(-4)
 
-    # iterate though the parts in response
-    for part in parts:
-        aisler_part = {}
 
-        # aisler_part["uuid"] = str(uuid.uuid4())
-        aisler_part["aisler_id"] = part["id"]
-        aisler_part["mpn"] = part["attributes"]["mpn"]
-        aisler_part["manufacturer"] = part["attributes"]["manufacturer"]
-        aisler_part["datasheet"] = part["attributes"]["datasheet"]
-        aisler_part["description"] = part["attributes"]["description"]
+def parse_and_insert_response_parts(parts):
+    """
+    Parse the response parts and insert into DB. The parts of a page are written with one upsert statement in a single
+    transaction: new parts are inserted, parts whose fields have changed are updated and unchanged parts are left
+    alone (so their updated_at stays, see the incremental validation).
 
-        session = Session()
+    :param parts: Parts JSON form API
+    :return: dict with the number of inserted, updated and unchanged parts
+    """
+    # the last one wins if a part is listed twice
+    rows = {}
+    for part in parts or []:
+        rows[str(part["id"])] = {
+            "aisler_id": str(part["id"]),
+            "mpn": part["attributes"]["mpn"],
+            "manufacturer": part["attributes"]["manufacturer"],
+            "datasheet": part["attributes"]["datasheet"],
+            "description": part["attributes"]["description"]
+        }
 
-        try:
-            db_part = Part(
-                # uuid=aisler_part["uuid"],
-                aisler_id=aisler_part["aisler_id"],
-                mpn=aisler_part["mpn"],
-                manufacturer=aisler_part["manufacturer"],
-                description=aisler_part["description"],
-                datasheet=aisler_part["datasheet"]
-            )
+    counts = {"inserted": 0, "updated": 0, "unchanged": 0}
+    if not rows:
+        return counts
 
-            # get items from db that have the same aisler ID (there should only be one hence use first)
-            in_db = session.query(Part).filter(Part.aisler_id == db_part.aisler_id).first()
+    session = Session()
 
-            # if a part in the DB has been found, update it accordingly, else add
-            if in_db is not None:
-                # Note: sqlalchemy seems to be already so clever and updates the part if we assign it...
-                in_db = db_part
+    try:
+        stored = {row.aisler_id: row for row in session.query(
+            Part.aisler_id, *(Part.__table__.c[name] for name in PART_FIELDS)
+        ).filter(Part.aisler_id.in_(list(rows)))}
+
+        changed = []
+        for aisler_id, row in rows.items():
+            if aisler_id not in stored:
+                counts["inserted"] += 1
+            elif any(getattr(stored[aisler_id], name) != row[name] for name in PART_FIELDS):
+                counts["updated"] += 1
             else:
-                # add part to db
-                session.add(db_part)
+                counts["unchanged"] += 1
+                continue
+            changed.append(dict(row, updated_at=datetime.utcnow()))
+
+        if changed:
+            session.execute(upsert_parts, changed)
+            # invalidate cached search results
+            bump_generation(session)
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        raise e
+    finally:
+        session.close()
 
-            # commit changes
-            session.commit()
-        except IntegrityError:
-            print("Part already in DB.")
-        except Exception as e:
-            raise e
-        finally:
-            session.close()
+    return counts
 
 
 def save_status(next_urls, meta, finished=False):
@@ -298,7 +337,8 @@ def build_parts_db():
                 next_urls.append(next_url)
 
         try:
-            parse_and_insert_response_parts(response_data)
+            counts = parse_and_insert_response_parts(response_data)
+            print(f"Parts: {counts['inserted']} inserted, {counts['updated']} updated, {counts['unchanged']} unchanged")
         except Exception as e:
             print(e)
             exit(-7)
@@ -316,62 +356,222 @@ def build_parts_db():
         save_status(next_urls, meta)
 
 
-def match_parts(query_item, related_parts):
+def match_parts(value, related_parts):
     """
-    Matching algorithm to match found parts to an kicad module item
+    Matching algorithm to match found parts to an kicad module item, see libs/part_matching.py
 
-    :param query_item: the item to be matched
-    :param related_parts: list of possible parts that match
-    :return: best matching Part
+    :param value: the value of the item to be matched
+    :param related_parts: list of (id, mpn) of possible parts that match
+    :return: (id, confidence) of the best matching Part or None
     """
-    best = {"part": None, "dist": None}
-    for related_part in related_parts:
-        # use levenshtein distance to measure how far apart the query term is to the mpn
-        dist = jellyfish.levenshtein_distance(query_item.Item.value, related_part.mpn)
+    return rank_parts(value, related_parts)
 
-        if best["dist"] is None or dist < best["dist"]:
-            best["part"] = related_part
-            best["dist"] = dist
-    return best["part"]
 
+def distinct_values(session, after=None, limit=None):
+    """
+    Reads the next distinct values of the items (in files) in order, so that the values are read page by page instead
+    of loading all items.
 
-def validate_parts():
+    :param session: database session
+    :param after: (optional) last value of the previous page
+    :param limit: max. number of values (default: VALIDATE_BATCH)
+    :return: list of values
     """
-    Validate found Items by matching them with possible parts.
+    query = session.query(Item.value).filter(Item.file_id == File.id).filter(Item.value != "")
+    if after is not None:
+        query = query.filter(Item.value > after)
+    return [value for value, in query.distinct().order_by(Item.value).limit(limit or VALIDATE_BATCH)]
 
+
+def validate_parts(workers=1, restart=False, incremental=False):
+    """
+    Validate found Items by matching them with possible parts. Every distinct value is matched once, the matches of a
+    page of values are written with one statement and committed together. With several workers, the pages are matched
+    by a pool of processes reading the database, while this process writes the matches in order. A killed run resumes
+    after the last written page (see VALIDATE_CHECKPOINT).
+
+    :param workers: number of processes matching the values
+    :param restart: ignore the progress of an earlier run and start with the first value
+    :param incremental: only validate the values of new items and of items that may match a part added or updated
+                        since they were validated (see stale_values). Needs no checkpoint, validated items are not
+                        part of the delta anymore
     :return: -
     """
     print("Validating Parts against local DB...")
     session = Session()
-
-    queried_items = session.query(Item, File).filter(Item.file_id == File.id).all()
+    # parts added while the validator runs are newer than this and are considered by the next run
+    started = datetime.utcnow()
+    assign_part = Item.__table__.update().where(Item.value == bindparam("item_value")) \
+        .where(or_(Item.part_id.is_(None), Item.part_id != bindparam("part_id"), Item.part_confidence.is_(None),
+                   Item.part_confidence != bindparam("confidence"))) \
+        .values(part_id=bindparam("part_id"), part_confidence=bindparam("confidence"))
+    # values without a candidate anymore, e.g. the MPN of their part has been changed
+    clear_part = Item.__table__.update().where(Item.value.in_(bindparam("values", expanding=True))) \
+        .where(Item.part_id.isnot(None)).values(part_id=None, part_confidence=None)
+    mark_validated = Item.__table__.update().where(Item.value.in_(bindparam("values", expanding=True))) \
+        .values(validated_at=started)
+
+    checkpoint = None
+    if not incremental:
+        checkpoint = Checkpoint(VALIDATE_CHECKPOINT, interval=1)
+        after = (checkpoint.load() if not restart else None) or None
+        if after is not None:
+            print(f"Resuming after value {after!r}")
+
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) \
+        if workers > 1 else None
+    matched = None
 
     try:
-        for item in tqdm(queried_items):
-            related_parts = session.query(Part).filter(
-                Part.mpn.ilike(f"%{item.Item.value}%")
-            ).all()
-
-            if len(related_parts) > 0:
-                best_match = match_parts(item, related_parts)
-                item.Item.part_id = best_match.id
+        if incremental:
+            stale = stale_values(session)
+            pages = (stale[start:start + VALIDATE_BATCH] for start in range(0, len(stale), VALIDATE_BATCH))
+            total = len(stale)
+        else:
+            pages = value_pages(session, after)
+            query = session.query(Item.value).filter(Item.file_id == File.id).filter(Item.value != "")
+            if after is not None:
+                query = query.filter(Item.value > after)
+            total = query.distinct().count()
+        progress = tqdm(total=total, desc="Values Validated")
+
+        matched = matched_pages(session, pages, pool, workers)
+        for values, matches in matched:
+            if matches:
+                session.execute(assign_part, matches)
+            unmatched = set(values).difference(match["item_value"] for match in matches)
+            if unmatched:
+                session.execute(clear_part, {"values": sorted(unmatched)})
+            session.execute(mark_validated, {"values": values})
+            bump_generation(session)
+            session.commit()
 
-                session.commit()
+            if checkpoint is not None:
+                checkpoint.advance(values[-1])
+            progress.update(len(values))
+        progress.close()
+        if checkpoint is not None:
+            # the next run starts with the first value again
+            checkpoint.reset()
     except Exception as e:
+        session.rollback()
         raise e
     finally:
+        if matched is not None:
+            # pages that have not been started are not matched anymore, e.g. after an error
+            matched.close()
+        if pool is not None:
+            pool.shutdown(wait=True)
         session.close()
 
 
+def value_pages(session, after=None):
+    """
+    Reads all distinct values page by page, see distinct_values.
+
+    :param session: database session
+    :param after: (optional) value to start after
+    :return: generator of lists of values
+    """
+    values = distinct_values(session, after)
+    while values:
+        yield values
+        values = distinct_values(session, after=values[-1])
+
+
+def stale_values(session):
+    """
+    Finds the values that have to be validated (again): the values of items that have not been validated yet (e.g.
+    added by the parser), the values contained in the MPN of a part (i.e. the part is a candidate of the value) that
+    has been added or updated since an item of the value was validated, and the values of items whose part has been
+    updated since (e.g. its MPN does not contain the value anymore).
+
+    :param session: database session
+    :return: sorted list of values
+    """
+    rows = session.query(Item.value, func.min(Item.validated_at), func.count() - func.count(Item.validated_at)) \
+        .filter(Item.file_id == File.id).filter(Item.value != "").group_by(Item.value)
+
+    stale = set()
+    validated = defaultdict(list)
+    oldest = None
+    for value, validated_at, unvalidated in rows:
+        if unvalidated:
+            stale.add(value)
+            continue
+        # the candidates are found case-insensitively
+        validated[value.lower()].append((value, validated_at))
+        oldest = validated_at if oldest is None else min(oldest, validated_at)
+
+    if oldest is not None:
+        matched = session.query(Item.value).join(Part, Item.part_id == Part.id).filter(Item.file_id == File.id) \
+            .filter(Item.value != "").filter(Part.updated_at > Item.validated_at).distinct()
+        stale.update(value for value, in matched)
+
+        # only the substrings of the MPNs with the length of a validated value are looked up
+        lengths = sorted({len(value) for value in validated})
+        changed = session.query(Part.mpn, Part.updated_at).filter(Part.updated_at > oldest).filter(Part.mpn != "")
+        for mpn, updated_at in changed:
+            mpn = mpn.lower()
+            for start in range(len(mpn)):
+                for length in lengths:
+                    if start + length > len(mpn):
+                        break
+                    for value, validated_at in validated.get(mpn[start:start + length], ()):
+                        if validated_at < updated_at:
+                            stale.add(value)
+    return sorted(stale)
+
+
+def matched_pages(session, pages, pool=None, workers=1):
+    """
+    Matches pages of values. With a process pool, up to two pages per worker are matched ahead of the consumer. The
+    pages that have not been started are cancelled when the generator is closed.
+
+    :param session: database session
+    :param pages: iterable of lists of values, e.g. value_pages
+    :param pool: (optional) ProcessPoolExecutor
+    :param workers: number of processes of the pool
+    :return: generator of (values, matches) tuples in the order of the pages, see match_values
+    """
+    if pool is None:
+        for values in pages:
+            yield values, match_values(session, values)
+        return
+
+    database = os.path.abspath(session.get_bind().url.database)
+    pending = deque()
+    pages = iter(pages)
+    values = next(pages, None)
+    try:
+        while values or pending:
+            while values and len(pending) < 2 * workers:
+                pending.append((values, pool.submit(match_values_read_only, database, values)))
+                values = next(pages, None)
+            page, future = pending.popleft()
+            yield page, future.result()
+    finally:
+        # ProcessPoolExecutor.shutdown() only cancels them itself since Python 3.9
+        for _, future in pending:
+            future.cancel()
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Crawler for Parts DB and validator of found parts.')
     parser.add_argument('--validate-only', "-v", action="store_true",
                         help='Skip DB creation and validate only!')
+    parser.add_argument('--workers', "-w", type=int, default=1,
+                        help='number of processes matching the parts (default: 1)')
+    parser.add_argument('--restart', action='store_true',
+                        help='validates all parts instead of resuming the last run')
+    parser.add_argument('--incremental', "-i", action='store_true',
+                        help='only validates new items and items that may match parts added or updated since')
     args = parser.parse_args()
 
+    init_database()
     if not args.validate_only:
         register_graceful_exit()
         build_parts_db()
         deregister_graceful_exit()
 
-    validate_parts()
+    validate_parts(workers=args.workers, restart=args.restart, incremental=args.incremental)